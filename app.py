@@ -3,11 +3,20 @@
 import datetime
 import functools
 import importlib
+import itertools
 import logging
 import urllib.parse
 from xml.etree import ElementTree
 
-from flask import abort, Flask, redirect, render_template, request
+from flask import (
+  abort,
+  Flask,
+  redirect,
+  render_template,
+  request,
+  Response,
+  stream_with_context,
+)
 from google.protobuf.json_format import MessageToDict
 import flask_caching
 import flask_gae_static
@@ -37,8 +46,7 @@ from granary import (
   as1,
   as2,
   atom,
-  bluesky,
-  farcaster,
+  convert,
   jsonfeed,
   microformats2,
   nostr,
@@ -135,6 +143,18 @@ CACHE_CONTROL = {
 }
 
 
+class StreamingResponse(Response):
+  """Streamed response that can still be stored in the response cache.
+
+  flask-caching pickles responses to store them, which doesn't work with a
+  generator body, so we buffer the rest of the body when we're pickled.
+  Responses that skip the cache, eg with ``cache=false``, stay streamed.
+  """
+  def __getstate__(self):
+    self.make_sequence()
+    return self.__dict__
+
+
 app = Flask(__name__, static_folder=None)
 app.template_folder = './granary/templates'
 app.json.compact = False
@@ -300,11 +320,11 @@ def url():
     if input in ('as1', 'activitystreams'):
       activities = body_items
     elif input == 'as2':
-      activities = [as2.to_as1(obj) for obj in body_items]
+      activities = convert.convert_many(body_items, 'as2', 'as1')
     elif input == 'atom':
       activities = atom.atom_to_activities(resp.text)
     elif input == 'bluesky':
-      activities = [bluesky.to_as1(obj) for obj in body_items]
+      activities = convert.convert_many(body_items, 'bluesky', 'as1')
     elif input == 'html':
       activities = microformats2.html_to_activities(resp, url=final_url,
                                                     id=fragment, actor=actor)
@@ -418,7 +438,7 @@ def make_response(response, actor=None, url=None, title=None, hfeed=None):
 
     elif format == 'as2':
       response.update({
-        'items': [as2.from_as1(a) for a in activities],
+        'items': convert.convert_many(activities, 'as1', 'as2'),
         'totalItems': response.pop('totalResults', None),
         'updated': response.pop('updatedSince', None),
         'filtered': None,
@@ -427,11 +447,12 @@ def make_response(response, actor=None, url=None, title=None, hfeed=None):
       return util.trim_nulls(response), headers
 
     elif format == 'bluesky':
-      return {'feed': [bluesky.from_as1(a) for a in activities]}, headers
+      return {'feed': convert.convert_many(activities, 'as1', 'bluesky')}, headers
 
     elif format == 'farcaster':
       return {
-        'items': [MessageToDict(farcaster.from_as1(a)) for a in activities],
+        'items': [MessageToDict(msg) for msg in
+                  convert.convert_many(activities, 'as1', 'farcaster')],
       }, headers
 
     elif format == 'atom':
@@ -451,7 +472,11 @@ def make_response(response, actor=None, url=None, title=None, hfeed=None):
         link_hub = urllib.parse.quote(hub, safe=':/?&=')
         headers['Link'].append(f'<{link_hub}>; rel="hub"')
 
-      return atom.activities_to_atom(
+      # stream entries as they're rendered so that big feeds don't have to be
+      # fully built in memory first. from_as1_iter prepares every activity
+      # before it yields the header, so pulling that here turns conversion
+      # errors into HTTP 400s instead of truncated 200s.
+      chunks = atom.from_as1_iter(
         activities, actor,
         host_url=url or request.host_url + '/',
         request_url=request.url,
@@ -459,7 +484,10 @@ def make_response(response, actor=None, url=None, title=None, hfeed=None):
         title=title,
         rels={'hub': hub} if hub else None,
         reader=(reader == 'true'),
-      ), headers
+      )
+      first = next(chunks)
+      return StreamingResponse(
+        stream_with_context(itertools.chain([first], chunks)), headers=headers)
 
     elif format == 'rss':
       if not title:
@@ -477,7 +505,7 @@ def make_response(response, actor=None, url=None, title=None, hfeed=None):
 
     elif format in ('mf2-json', 'json-mf2'):
       return {
-        'items': [microformats2.activity_to_json(a) for a in activities],
+        'items': convert.convert_many(activities, 'as1', 'mf2-json'),
       }, headers
 
     elif format == 'jsonfeed':
@@ -490,7 +518,7 @@ def make_response(response, actor=None, url=None, title=None, hfeed=None):
 
     elif format == 'nostr':
       return {
-        'items': [nostr.from_as1(a) for a in activities],
+        'items': convert.convert_many(activities, 'as1', 'nostr'),
       }, headers
 
     else:
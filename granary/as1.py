@@ -5,6 +5,7 @@
 """
 import collections
 import copy
+from functools import cached_property, lru_cache
 import logging
 from operator import itemgetter
 import re
@@ -86,6 +87,10 @@ HASHTAG_RE = re.compile(r'(^|\s)[#＃](\w+)\b', re.UNICODE)
 
 AT_MENTION_RE = re.compile(r'(?:^|\W)(@[\w._-]+)(?:$|\W)')
 
+# max number of distinct content strings to cache analyses for. see
+# analyze_content
+CONTENT_CACHE_SIZE = 1000
+
 
 def object_type(obj):
   """Returns the object type, or the verb if it's an activity object.
@@ -240,6 +245,49 @@ def merge_by_id(obj, field, new):
   obj[field] = sorted(merged.values(), key=itemgetter('id'))
 
 
+def copy_object(obj, fields=None):
+  """Returns a copy of an AS1 object that's safe to modify.
+
+  Much cheaper than :func:`copy.deepcopy`. Only copies dicts, lists, and tuples;
+  everything else, eg strings and numbers, is immutable in JSON-compatible
+  objects, so it's shared with ``obj``. Assumes ``obj`` has no reference cycles.
+
+  If ``fields`` is provided, only those top-level fields are copied; all other
+  values are shared with ``obj``. Use this when you'll only modify those fields,
+  so that subtrees you won't touch aren't copied at all.
+
+  Args:
+    obj (dict): AS1 object or activity
+    fields (sequence of str): optional, top-level fields to copy
+
+  Returns:
+    dict:
+  """
+  if fields is None:
+    return _copy_json(obj)
+
+  copied = dict(obj)
+  for field in fields:
+    if field in copied:
+      copied[field] = _copy_json(copied[field])
+  return copied
+
+
+def _copy_json(val):
+  """Recursive helper for :func:`copy_object`."""
+  type_ = type(val)
+  if type_ is dict:
+    return {k: _copy_json(v) for k, v in val.items()}
+  elif type_ is list:
+    return [_copy_json(v) for v in val]
+  elif type_ is tuple:
+    return tuple(_copy_json(v) for v in val)
+  elif isinstance(val, (dict, list, set)):
+    # subclass, eg defaultdict or OrderedDict. rare, so fall back to deepcopy
+    return copy.deepcopy(val)
+  return val
+
+
 def is_public(obj, unlisted=True):
   """Returns True if the object is public, False if private, None if unknown.
 
@@ -745,6 +793,87 @@ def mentions(obj):
           if t.get('url') and t.get('objectType') == 'mention']
 
 
+class ContentAnalysis:
+  """Parse-once analysis of a ``content`` string.
+
+  Get instances from :func:`analyze_content`, which caches them by content
+  string, so that each distinct content is only analyzed once no matter how
+  many times, or from where, it's analyzed. Attributes are computed lazily, on
+  first access. Only the extracted results are kept, not the parsed HTML tree,
+  since trees are much bigger.
+
+  Attributes:
+    content (str)
+    is_html (bool): whether content is HTML, sniffed from tags and entities
+    links (tuple of (str, str) tuples): ``(text, href)`` for each ``<a>``
+      element, in document order. ``href`` is None if the element doesn't have
+      one.
+    text (str): plain text rendering, from :func:`source.html_to_text`
+    text_with_link_placeholders (str, tuple of (str, str) tuples): ``(text,
+      links)``, where ``text`` is the plain text rendering with each link
+      that has text and a URL replaced by a
+      ``%%GRANARY_LINK_PLACEHOLDER_[N]%%`` token, and ``links`` are ``(text,
+      url)`` for each placeholder, in order. This avoids the markdown
+      intermediary; html2text produces ``[text](url)``, which breaks when text
+      contains ``]`` characters. Computed from the same parse as ``links``.
+  """
+  def __init__(self, content):
+    self.content = content
+
+  @cached_property
+  def is_html(self):
+    # first, cheap substring check to avoid the full HTML parse if possible
+    if '<' not in self.content and '&' not in self.content:
+      return False
+
+    # use html.parser to require HTML tags, not add them by default
+    # https://www.crummy.com/software/BeautifulSoup/bs4/doc/#differences-between-parsers
+    return (bool(util.parse_html(self.content, features='html.parser').find())
+            or bool(source.HTML_ENTITY_RE.search(self.content)))
+
+  @property
+  def links(self):
+    return self._links_and_placeholders[0]
+
+  @property
+  def text_with_link_placeholders(self):
+    return self._links_and_placeholders[1:]
+
+  @cached_property
+  def text(self):
+    return source.html_to_text(self.content)
+
+  @cached_property
+  def _links_and_placeholders(self):
+    parsed = util.parse_html(self.content)
+    links = []
+    extracted = []
+    for a in parsed.find_all('a'):
+      text = a.get_text()
+      url = a.get('href')
+      links.append((text, url))
+      if text and url and util.is_url(url):
+        # don't strip text, preserve whitespace
+        extracted.append((text, url))
+        a.replace_with(f'%%GRANARY_LINK_PLACEHOLDER_{len(extracted) - 1}%%')
+
+    text = source.html_to_text(str(parsed), ignore_links=True)
+    return tuple(links), text, tuple(extracted)
+
+
+@lru_cache(maxsize=CONTENT_CACHE_SIZE)
+def analyze_content(content):
+  """Returns the cached :class:`ContentAnalysis` for a ``content`` string.
+
+  Args:
+    content (str)
+
+  Returns:
+    ContentAnalysis:
+  """
+  return ContentAnalysis(content)
+
+
 def is_content_html(obj):
   """Returns True if ``obj.content`` is HTML, False otherwise.
 
@@ -754,17 +883,11 @@ def is_content_html(obj):
   if (is_html := obj.get('content_is_html')) is not None:
     return is_html
 
-  if not (content := obj.get('content')):
-    return False
-
-  # first, cheap substring check to avoid the full HTML parse if possible
-  if '<' not in content and '&' not in content:
+  content = obj.get('content')
+  if not content or not isinstance(content, str):
     return False
 
-  # use html.parser to require HTML tags, not add them by default
-  # https://www.crummy.com/software/BeautifulSoup/bs4/doc/#differences-between-parsers
-  return (bool(util.parse_html(content, features='html.parser').find())
-          or source.HTML_ENTITY_RE.search(content))
+  return analyze_content(content).is_html
 
 
 def expand_tags(obj):
@@ -920,22 +1043,8 @@ def _handle_html_content(obj, to_plain_text=False):
   in_reply_tos = get_ids(obj, 'inReplyTo')
   existing_tags = {}  # maps string displayName to dict tag object
 
-  # Extract <a href> links from HTML before converting to plain text, using
-  # placeholder tokens to preserve link text positions. This avoids the
-  # markdown intermediary (html2text produces [text](url) which breaks when
-  # text contains ] characters).
-  parsed = util.parse_html(obj.get('content', ''))
-  extracted = []  # ordered list of (text, url)
-  for a in parsed.find_all('a', href=True):
-    text = a.get_text()
-    url = a['href']
-    if text and url and util.is_url(url) and url not in in_reply_tos:
-      # don't strip text, preserve whitespace
-      extracted.append((text, url))
-      # can't use enumerate() above since we don't add placeholders for all links
-      a.replace_with(f'%%GRANARY_LINK_PLACEHOLDER_{len(extracted) - 1}%%')
-
-  content = source.html_to_text(str(parsed), ignore_links=True)
+  content, extracted = analyze_content(
+    obj.get('content') or '').text_with_link_placeholders
 
   for tag in tags:
     # normalize and store tag names we already have. for @-@ webfinger addresses,
@@ -961,7 +1070,8 @@ def _handle_html_content(obj, to_plain_text=False):
 
     content = content[:start] + orig_text + content[start + len(placeholder):]
 
-    if not (text := orig_text.strip()):
+    # links to the object we're replying to don't get tags
+    if url in in_reply_tos or not (text := orig_text.strip()):
       continue
 
     type = 'link'
@@ -8,7 +8,6 @@
    * http://activitystrea.ms/specs/json/1.0/
    * http://activitystrea.ms/specs/json/schema/activity-schema.html
 """
-import copy
 import datetime
 import html
 import logging
@@ -17,10 +16,9 @@ import re
 from urllib.parse import urlparse
 
 from webutil import util
-from webutil.util import json_dumps, json_loads
 
 from . import as1
-from .source import html_to_text, Source
+from .source import Source
 
 logger = logging.getLogger(__name__)
 
@@ -218,7 +216,7 @@ def from_as1(obj, type=None, context=tuple(CONTEXT), top_level=True, multiple=Fa
   elif not isinstance(obj, dict):
     raise ValueError(f'Expected dict, got {obj!r}')
 
-  obj = copy.deepcopy(obj)
+  obj = as1.copy_object(obj)
   actor = obj.get('actor')
   verb = obj.pop('verb', None)
   obj_type = obj.pop('objectType', None)
@@ -298,7 +296,7 @@ def from_as1(obj, type=None, context=tuple(CONTEXT), top_level=True, multiple=Fa
         })
         util.add(obj['@context'], MISSKEY_QUOTE_CONTEXT)
         content = obj.get('content') or ''
-        if not QUOTE_RE_SUFFIX.search(html_to_text(content)):
+        if not QUOTE_RE_SUFFIX.search(as1.analyze_content(content).text):
           # the inline RE: ... link is rendered into content later, in
           # render_content, so that it isn't HTML-escaped along with content
           quote['name'] = f'RE: {url or id}'
@@ -508,10 +506,9 @@ def to_as1(obj, use_type=True, get_fn=None):
   elif not isinstance(obj, dict):
     raise ValueError(f'Expected dict, got {obj!r}')
 
-  # JSON round trip: same as copy.deepcopy for these JSON-safe AS2 objects, but
-  # ~2x faster, and this is a CPU hot spot
+  # much faster than copy.deepcopy, and this is a CPU hot spot
   # https://github.com/snarfed/bridgy-fed/issues/2488
-  obj = json_loads(json_dumps(obj))
+  obj = as1.copy_object(obj)
   for field in '@context', 'discoverable', 'indexable':
     obj.pop(field, None)
 
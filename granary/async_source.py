@@ -0,0 +1,108 @@
+"""Async wrapper for :class:`Source` instances.
+
+Sources do blocking I/O, eg with :func:`webutil.util.requests_get`,
+:class:`lexrpc.Client`, websockets sync clients, or gRPC stubs.
+:class:`AsyncSource` wraps a source and runs its I/O methods on a thread pool,
+so that an asyncio event loop can poll many accounts concurrently::
+
+    sources = [AsyncSource(Mastodon(...)) for ...]
+    results = await asyncio.gather(*(src.get_activities() for src in sources))
+
+Conversion code isn't duplicated. Everything other than the async methods below
+is delegated to the wrapped source, eg ``AsyncSource(mastodon).NAME`` or
+``AsyncSource(bluesky).post_url(...)``.
+
+Works with any :class:`Source` subclass, including
+:class:`granary.mastodon.Mastodon`, :class:`granary.bluesky.Bluesky`,
+:class:`granary.nostr.Nostr`, and :class:`granary.farcaster.Farcaster`.
+"""
+import asyncio
+import functools
+import logging
+
+from .source import Source
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSource:
+  """Wraps a :class:`Source` and makes its I/O methods async.
+
+  Each call runs the wrapped source's sync method in a thread, either in
+  ``executor`` or, by default, via :func:`asyncio.to_thread` in the event
+  loop's default executor. The number of calls that actually run at once is
+  limited by that executor's size and by ``max_concurrency``.
+
+  Attributes:
+    source (Source): the wrapped source
+  """
+  def __init__(self, source, executor=None, max_concurrency=None):
+    """Constructor.
+
+    Args:
+      source (Source): the source to wrap
+      executor (concurrent.futures.Executor): optional, runs the wrapped
+        source's methods. Defaults to the event loop's default executor.
+      max_concurrency (int): optional, maximum number of this instance's calls
+        to run at once. Others wait for a slot.
+    """
+    assert isinstance(source, Source), source
+    self.source = source
+    self.executor = executor
+    self.max_concurrency = max_concurrency
+    # created lazily, inside the event loop
+    self._semaphore = None
+
+  def __getattr__(self, name):
+    # only called for attributes that aren't found on this object
+    return getattr(self.source, name)
+
+  def __repr__(self):
+    return f'{self.__class__.__name__}({self.source!r})'
+
+  async def _run(self, fn, *args, **kwargs):
+    """Runs a sync function in a thread and returns its result."""
+    if self.max_concurrency:
+      if self._semaphore is None:
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+      async with self._semaphore:
+        return await self._run_in_thread(fn, *args, **kwargs)
+    return await self._run_in_thread(fn, *args, **kwargs)
+
+  async def _run_in_thread(self, fn, *args, **kwargs):
+    if self.executor:
+      return await asyncio.get_running_loop().run_in_executor(
+        self.executor, functools.partial(fn, *args, **kwargs))
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+  async def get_activities_response(self, *args, **kwargs):
+    """See :meth:`Source.get_activities_response`."""
+    return await self._run(self.source.get_activities_response, *args, **kwargs)
+
+  async def get_activities(self, *args, **kwargs):
+    """See :meth:`Source.get_activities`."""
+    return (await self.get_activities_response(*args, **kwargs))['items']
+
+  async def get_actor(self, *args, **kwargs):
+    """See :meth:`Source.get_actor`."""
+    return await self._run(self.source.get_actor, *args, **kwargs)
+
+  async def get_comment(self, *args, **kwargs):
+    """See :meth:`Source.get_comment`."""
+    return await self._run(self.source.get_comment, *args, **kwargs)
+
+  async def create(self, *args, **kwargs):
+    """See :meth:`Source.create`."""
+    return await self._run(self.source.create, *args, **kwargs)
+
+  async def preview_create(self, *args, **kwargs):
+    """See :meth:`Source.preview_create`."""
+    return await self._run(self.source.preview_create, *args, **kwargs)
+
+  async def update(self, *args, **kwargs):
+    """See :meth:`Source.update`."""
+    return await self._run(self.source.update, *args, **kwargs)
+
+  async def delete(self, *args, **kwargs):
+    """See :meth:`Source.delete`."""
+    return await self._run(self.source.delete, *args, **kwargs)
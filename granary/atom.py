@@ -14,11 +14,14 @@ from webutil import util
 
 from . import as1
 from . import microformats2
+from . import source
 from .source import Source
 
 CONTENT_TYPE = 'application/atom+xml; charset=utf-8'
 FEED_TEMPLATE = 'user_feed.atom'
 ENTRY_TEMPLATE = 'entry.atom'
+# bytes to read at a time from file-like objects in to_as1_iter
+READ_SIZE = 64 * 1024
 # stolen from django.utils.html
 UNENCODED_AMPERSANDS_RE = re.compile(r'&(?!(\w+|#\d+);)')
 NAMESPACES = {
@@ -136,44 +139,112 @@ def from_as1(input, actor=None, title=None, request_url=None, host_url=None,
     str: Atom XML
   """
 
-  single = False
   if isinstance(input, dict):
     input = [input]
-    single = True
+    if not actor:
+      actor = {}
+    _prepare_actor(actor)
+    _prepare_activity(input[0], reader=reader)
+    return jinja_env.get_template(ENTRY_TEMPLATE).render(
+      actor=Defaulter(actor),
+      activity=Defaulter(input[0]),
+      **_template_vars(input, actor, title=title, request_url=request_url,
+                       host_url=host_url, xml_base=xml_base, rels=rels))
+
+  return ''.join(from_as1_iter(
+    input, actor=actor, title=title, request_url=request_url,
+    host_url=host_url, xml_base=xml_base, rels=rels, reader=reader))
+
+
+def from_as1_iter(input, actor=None, title=None, request_url=None,
+                  host_url=None, xml_base=None, rels=None, reader=True):
+  """Converts ActivityStreams 1 activities to an Atom feed, incrementally.
+
+  Generator. Yields the feed header, then one chunk per ``<entry>``. The last
+  chunk also closes the ``<feed>``. Every activity is prepared before the
+  header is yielded, so conversion errors are raised by the first ``next()``,
+  before a caller has sent anything. After that, only rendering is
+  incremental, so callers can start sending the feed before it's fully
+  rendered, eg in a streaming HTTP response. ``''.join()`` of the chunks is
+  identical to :func:`from_as1`'s output.
 
-  # Strip query params from URLs so that we don't include access tokens, etc
-  host_url = (_remove_query_params(host_url) if host_url
-              else 'https://github.com/snarfed/granary')
-  if request_url is None:
-    request_url = host_url
+  Args:
+    input (iterable of dict): ActivityStreams activities. Modified in place.
+    actor, title, request_url, host_url, xml_base, rels, reader: see
+      :func:`from_as1`
 
+  Yields:
+    str: Atom XML chunks
+  """
   if not actor:
-      actor = {}
+    actor = {}
   _prepare_actor(actor)
 
+  input = list(input)
   for a in input:
     _prepare_activity(a, reader=reader)
 
+  # Jinja renders lazily and pulls from items() just before each entry, so
+  # that's when we flush the previous entry.
+  at_entry = False
+
+  def items():
+    nonlocal at_entry
+    for a in input:
+      at_entry = True
+      yield Defaulter(a)
+
+  chunk = []
+  for piece in jinja_env.get_template(FEED_TEMPLATE).generate(
+      actor=Defaulter(actor),
+      items=items(),
+      **_template_vars(input, actor, title=title,
+                       request_url=request_url, host_url=host_url,
+                       xml_base=xml_base, rels=rels)):
+    if at_entry:
+      at_entry = False
+      if chunk:
+        yield ''.join(chunk)
+      chunk = []
+    chunk.append(piece)
+
+  if chunk:
+    yield ''.join(chunk)
+
+
+def _template_vars(input, actor, title=None, request_url=None, host_url=None,
+                   xml_base=None, rels=None):
+  """Returns the Jinja template variables shared by feeds and entries.
+
+  Args:
+    input (list of dict): prepared ActivityStreams activities. Only the first
+      is used, for ``updated``.
+    actor (dict): prepared ActivityStreams actor
+    title, request_url, host_url, xml_base, rels: see :func:`from_as1`
+
+  Returns:
+    dict:
+  """
+  # Strip query params from URLs so that we don't include access tokens, etc
+  host_url = (_remove_query_params(host_url) if host_url
+              else 'https://github.com/snarfed/granary')
+  if request_url is None:
+    request_url = host_url
+
   updated = (as1.get_object(input[0]).get('published', '')
              if input else '')
 
-  if actor is None:
-    actor = {}
-
-  return jinja_env.get_template(ENTRY_TEMPLATE if single else FEED_TEMPLATE).render(
-    actor=Defaulter(actor or {}),
-    activity=Defaulter(input[0] if single else {}),  # for ENTRY_TEMPLATE
-    items=[Defaulter(a) for a in input],  # for FEED_TEMPLATE
-    host_url=host_url,
-    mimetypes=mimetypes,
-    rels=rels or {},
-    request_url=request_url,
-    title=title or 'User feed for ' + as1.actor_name(actor),
-    updated=updated,
-    VERBS_WITH_OBJECT=as1.VERBS_WITH_OBJECT,
-    xml_base=xml_base,
-    as1=as1,
-  )
+  return {
+    'host_url': host_url,
+    'mimetypes': mimetypes,
+    'rels': rels or {},
+    'request_url': request_url,
+    'title': title or 'User feed for ' + as1.actor_name(actor),
+    'updated': updated,
+    'VERBS_WITH_OBJECT': as1.VERBS_WITH_OBJECT,
+    'xml_base': xml_base,
+    'as1': as1,
+  }
 
 
 activities_to_atom = from_as1
@@ -205,6 +276,59 @@ def to_as1(atom):
   raise ValueError(f'Expected root feed or entry tag; got {top.tag}')
 
 
+def to_as1_iter(atom):
+  """Converts an Atom feed or entry to ActivityStreams 1 activities, incrementally.
+
+  Generator. Parses the document incrementally and yields each activity as soon
+  as its ``<entry>`` has been parsed, then discards that entry, so memory use
+  doesn't grow with the number of entries.
+
+  The feed-level ``<author>`` is only used as the default author for entries
+  that come after it, which is where it usually is. :func:`to_as1` uses it for
+  all entries.
+
+  Args:
+    atom (str, bytes, file-like object, or iterable of str or bytes): Atom
+      document with top-level ``<feed>`` or ``<entry>`` element. File-like
+      objects are read in chunks of :const:`READ_SIZE`. Iterables, eg
+      :meth:`requests.Response.iter_content`, should yield chunks.
+
+  Yields:
+    dict: ActivityStreams activity
+
+  Raises:
+    ElementTree.ParseError: if the document isn't valid XML
+    ValueError: if the top-level element isn't ``<feed>`` or ``<entry>``
+  """
+  parser = ElementTree.XMLPullParser(events=('start', 'end'))
+  top = None
+  feed_author = None
+  depth = 0
+
+  for chunk in source.iter_chunks(atom, READ_SIZE):
+    parser.feed(chunk)
+    for event, elem in parser.read_events():
+      if event == 'start':
+        depth += 1
+        if top is None:
+          top = elem
+          if _tag(top) not in ('feed', 'entry'):
+            raise ValueError(f'Expected root feed or entry tag; got {top.tag}')
+        continue
+
+      depth -= 1
+      if depth == 0 and _tag(elem) == 'entry':
+        yield _to_as1(elem)
+      elif depth == 1 and _tag(top) == 'feed':
+        if _tag(elem) == 'author':
+          feed_author = _to_as1_actor(top)
+        elif _tag(elem) == 'entry':
+          yield _to_as1(elem, feed_author=feed_author)
+          top.remove(elem)
+
+  parser.close()
+
+
 atom_to_activities = to_as1
 """Deprecated! Use :meth:`to_as1` instead."""
 
@@ -0,0 +1,326 @@
+"""Performance benchmarks for granary's AS1 converters.
+
+Builds a corpus of realistic AS1 objects and activities from the unit test
+fixtures in ``granary/tests/testdata``, then times each converter module in both
+directions, ``from_as1`` and ``to_as1``. Inputs for the ``to_as1`` direction are
+generated by running ``from_as1`` over the corpus.
+
+For each benchmark, reports throughput (ops/sec), p50 and p99 latency, and peak
+memory allocated per op, and compares the results with a stored baseline JSON
+file so that regressions can fail a local run.
+
+Run with ``python -m granary.benchmarks``. See ``--help`` for options.
+"""
+import copy
+import glob
+import logging
+import os
+import time
+import tracemalloc
+
+from webutil.util import json_dumps, json_loads
+
+from .. import (
+  as2,
+  atom,
+  bluesky,
+  farcaster,
+  jsonfeed,
+  microformats2,
+  nostr,
+  rss,
+)
+
+logger = logging.getLogger(__name__)
+
+TESTDATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'tests', 'testdata')
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# fraction that throughput can drop, or allocations can grow, before we call it
+# a regression
+DEFAULT_TOLERANCE = .25
+
+ACTOR = {
+  'objectType': 'person',
+  'displayName': 'Alice',
+  'url': 'https://example.com/alice',
+  'image': {'url': 'https://example.com/alice.jpg'},
+}
+FEED_URL = 'https://example.com/feed'
+# only used to sign Nostr events so that nostr.to_as1 accepts them
+NOSTR_PRIVKEY = nostr.bech32_encode(
+  'nsec', '1fb759a121ece5e22da48cb20989813fddfc9b2896a4e0207b4ffdd9a0bd189b')
+
+
+def _wrap(obj):
+  """Wraps a bare AS1 object in a ``post`` activity, for feed converters."""
+  return obj if obj.get('verb') else {'verb': 'post', 'object': obj}
+
+
+# maps format name to (from_as1, to_as1) functions. each takes and returns a
+# single AS1 object or activity.
+CONVERTERS = {
+  'as2': (as2.from_as1, as2.to_as1),
+  'atom': (
+    lambda obj: atom.from_as1([_wrap(obj)], actor=ACTOR, request_url=FEED_URL,
+                              host_url=FEED_URL),
+    atom.to_as1,
+  ),
+  'bluesky': (bluesky.from_as1, bluesky.to_as1),
+  'farcaster': (farcaster.from_as1, farcaster.to_as1),
+  'jsonfeed': (
+    lambda obj: jsonfeed.from_as1([_wrap(obj)], actor=ACTOR, feed_url=FEED_URL),
+    jsonfeed.to_as1,
+  ),
+  'microformats2': (microformats2.from_as1, microformats2.to_as1),
+  'nostr': (
+    lambda obj: nostr.from_as1(obj, privkey=NOSTR_PRIVKEY),
+    nostr.to_as1,
+  ),
+  'rss': (
+    lambda obj: rss.from_as1([_wrap(obj)], actor=ACTOR, title='Feed',
+                             feed_url=FEED_URL),
+    rss.to_as1,
+  ),
+}
+
+# other hot spots that aren't whole converters. maps name to function that
+# takes a single AS1 object.
+EXTRAS = {
+  'as2.render_content': lambda obj: as2.render_content(as2.from_as1(obj)),
+  'microformats2.render_content': microformats2.render_content,
+}
+
+
+def load_corpus(dir=TESTDATA_DIR):
+  """Loads AS1 objects and activities from test fixture files.
+
+  Includes notes with tags, replies, quote posts, attachments, actors, events,
+  and more. Skips files that don't parse or aren't a single JSON object.
+
+  Args:
+    dir (str): directory with ``*.as.json`` and ``*.as-from-*.json`` files
+
+  Returns:
+    list of (str, dict) tuples: (filename, AS1 object)
+  """
+  corpus = []
+  for filename in sorted(glob.glob(os.path.join(dir, '*.as.json')) +
+                         glob.glob(os.path.join(dir, '*.as-from-*.json'))):
+    try:
+      with open(filename, encoding='utf-8') as f:
+        obj = json_loads(f.read())
+    except ValueError as e:
+      logger.debug(f"Skipping {filename}, couldn't parse: {e}")
+      continue
+
+    if isinstance(obj, dict) and (obj.get('objectType') or obj.get('verb')):
+      corpus.append((os.path.basename(filename), obj))
+
+  return corpus
+
+
+def _supported(fn, inputs):
+  """Returns (input, output) tuples for the inputs that fn handles without raising.
+  """
+  ok = []
+  for input in inputs:
+    try:
+      output = fn(copy.deepcopy(input))
+    except Exception as e:  # converters raise all sorts of things
+      logger.debug(f'{fn} raised {e.__class__.__name__}: {e}')
+      continue
+    ok.append((input, output))
+  return ok
+
+
+def benchmarks(corpus, names=None):
+  """Builds the benchmarks to run.
+
+  Args:
+    corpus (list of (str, dict) tuples): from :func:`load_corpus`
+    names (sequence of str): optional benchmark names or format names to
+      include, eg ``as2`` or ``bluesky.to_as1``. Defaults to all.
+
+  Returns:
+    dict: maps str benchmark name, eg ``as2.from_as1``, to
+    ``(function, list of inputs)`` tuple
+  """
+  def wanted(name):
+    return not names or name in names or name.split('.')[0] in names
+
+  objs = [obj for _, obj in corpus]
+  benches = {}
+
+  for format, (from_fn, to_fn) in CONVERTERS.items():
+    from_name = f'{format}.from_as1'
+    to_name = f'{format}.to_as1'
+    if not (wanted(from_name) or wanted(to_name)):
+      continue
+
+    converted = _supported(from_fn, objs)
+    if wanted(from_name):
+      benches[from_name] = (from_fn, [input for input, _ in converted])
+    if wanted(to_name):
+      outputs = [output for _, output in converted if output]
+      benches[to_name] = (to_fn, [input for input, _ in _supported(to_fn, outputs)])
+
+  for name, fn in EXTRAS.items():
+    if wanted(name):
+      benches[name] = (fn, [input for input, _ in _supported(fn, objs)])
+
+  return {name: bench for name, bench in benches.items() if bench[1]}
+
+
+def _percentile(sorted_vals, pct):
+  """Returns the given percentile, 0-100, from a sorted list of numbers."""
+  if not sorted_vals:
+    return 0
+  index = min(len(sorted_vals) - 1, int(len(sorted_vals) * pct / 100))
+  return sorted_vals[index]
+
+
+def run_one(fn, inputs, iterations=10):
+  """Times a single benchmark.
+
+  Each op is one call to ``fn`` with a fresh copy of one input. Copying happens
+  outside the timed region.
+
+  Args:
+    fn (callable): takes one input
+    inputs (list): inputs to pass to ``fn``
+    iterations (int): number of passes over ``inputs``
+
+  Returns:
+    dict: with keys ``ops``, ``ops_per_sec``, ``p50_us``, ``p99_us``, and
+    ``alloc_kb``, the mean peak memory allocated per op
+  """
+  # warm up caches, lazy imports, etc
+  for input in inputs:
+    fn(copy.deepcopy(input))
+
+  latencies = []
+  for _ in range(iterations):
+    for input in inputs:
+      arg = copy.deepcopy(input)
+      start = time.perf_counter_ns()
+      fn(arg)
+      latencies.append(time.perf_counter_ns() - start)
+
+  # separate pass for allocations since tracemalloc slows everything down
+  peaks = []
+  tracing = tracemalloc.is_tracing()
+  if not tracing:
+    tracemalloc.start()
+  try:
+    for input in inputs:
+      arg = copy.deepcopy(input)
+      tracemalloc.reset_peak()
+      base = tracemalloc.get_traced_memory()[0]
+      fn(arg)
+      peaks.append(tracemalloc.get_traced_memory()[1] - base)
+  finally:
+    if not tracing:
+      tracemalloc.stop()
+
+  latencies.sort()
+  total_s = sum(latencies) / 1e9
+  return {
+    'ops': len(latencies),
+    'ops_per_sec': round(len(latencies) / total_s, 1) if total_s else 0,
+    'p50_us': round(_percentile(latencies, 50) / 1000, 1),
+    'p99_us': round(_percentile(latencies, 99) / 1000, 1),
+    'alloc_kb': round(sum(peaks) / len(peaks) / 1024, 1) if peaks else 0,
+  }
+
+
+def run(names=None, iterations=10, corpus=None):
+  """Runs benchmarks.
+
+  Args:
+    names (sequence of str): optional, see :func:`benchmarks`
+    iterations (int): number of passes over each benchmark's inputs
+    corpus (list of (str, dict) tuples): optional, defaults to
+      :func:`load_corpus`
+
+  Returns:
+    dict: maps str benchmark name to result dict from :func:`run_one`
+  """
+  if corpus is None:
+    corpus = load_corpus()
+
+  results = {}
+  for name, (fn, inputs) in sorted(benchmarks(corpus, names=names).items()):
+    logger.info(f'Running {name} over {len(inputs)} inputs')
+    results[name] = run_one(fn, inputs, iterations=iterations)
+    results[name]['inputs'] = len(inputs)
+
+  return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+  """Compares benchmark results with a baseline.
+
+  Args:
+    results (dict): from :func:`run`
+    baseline (dict): from :func:`run`, usually loaded from :const:`BASELINE_FILE`
+    tolerance (float): fraction that throughput can drop, or allocations can
+      grow, before it counts as a regression
+
+  Returns:
+    list of str: human-readable regression descriptions, empty if none
+  """
+  regressions = []
+  for name, got in sorted(results.items()):
+    if not (base := baseline.get(name)):
+      continue
+
+    if (base['ops_per_sec']
+        and got['ops_per_sec'] < base['ops_per_sec'] * (1 - tolerance)):
+      regressions.append(
+        f"{name}: {got['ops_per_sec']} ops/sec, baseline {base['ops_per_sec']}")
+
+    if base['alloc_kb'] and got['alloc_kb'] > base['alloc_kb'] * (1 + tolerance):
+      regressions.append(
+        f"{name}: {got['alloc_kb']} KB allocated/op, baseline {base['alloc_kb']}")
+
+  return regressions
+
+
+def load_baseline(filename=BASELINE_FILE):
+  """Loads a baseline JSON file. Returns ``{}`` if it doesn't exist."""
+  try:
+    with open(filename, encoding='utf-8') as f:
+      return json_loads(f.read())
+  except FileNotFoundError:
+    return {}
+
+
+def save_baseline(results, filename=BASELINE_FILE):
+  """Writes benchmark results to a baseline JSON file."""
+  with open(filename, 'w', encoding='utf-8') as f:
+    f.write(json_dumps(results, indent=2, sort_keys=True))
+    f.write('\n')
+
+
+def format_results(results, baseline=None):
+  """Formats benchmark results as a plain text table.
+
+  Args:
+    results (dict): from :func:`run`
+    baseline (dict): optional, from :func:`run`. If provided, includes each
+      benchmark's throughput change relative to it.
+
+  Returns:
+    str:
+  """
+  lines = [f"{'benchmark':<30} {'inputs':>6} {'ops/sec':>10} {'p50 us':>9} "
+           f"{'p99 us':>9} {'KB/op':>8} {'vs base':>8}"]
+  for name, r in sorted(results.items()):
+    change = ''
+    if baseline and (base := baseline.get(name)) and base['ops_per_sec']:
+      change = f"{(r['ops_per_sec'] / base['ops_per_sec'] - 1) * 100:+.0f}%"
+    lines.append(f"{name:<30} {r['inputs']:>6} {r['ops_per_sec']:>10} "
+                 f"{r['p50_us']:>9} {r['p99_us']:>9} {r['alloc_kb']:>8} "
+                 f"{change:>8}")
+  return '\n'.join(lines)
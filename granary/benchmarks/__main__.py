@@ -0,0 +1,63 @@
+"""Command line entry point for granary's converter benchmarks.
+
+Usage::
+
+  python -m granary.benchmarks [--iterations N] [--baseline FILE]
+                               [--save] [--tolerance FRACTION] [NAME ...]
+
+NAMEs can be formats, eg ``as2``, or individual benchmarks, eg
+``bluesky.to_as1``. Exits with status 1 if any benchmark regressed relative
+to the baseline.
+"""
+import argparse
+import logging
+import sys
+
+from . import (
+  BASELINE_FILE,
+  compare,
+  DEFAULT_TOLERANCE,
+  format_results,
+  load_baseline,
+  run,
+  save_baseline,
+)
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(
+    prog='python -m granary.benchmarks',
+    description="Benchmarks granary's AS1 converters.")
+  parser.add_argument('names', nargs='*', metavar='NAME',
+                      help='formats or benchmarks to run, default all')
+  parser.add_argument('--iterations', type=int, default=10,
+                      help='passes over each corpus, default %(default)s')
+  parser.add_argument('--baseline', default=BASELINE_FILE,
+                      help='baseline JSON file, default %(default)s')
+  parser.add_argument('--save', action='store_true',
+                      help='write these results to the baseline file')
+  parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                      help='allowed fractional regression, default %(default)s')
+  parser.add_argument('-v', '--verbose', action='store_true')
+  args = parser.parse_args(argv)
+
+  logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+  results = run(names=args.names, iterations=args.iterations)
+  baseline = load_baseline(args.baseline)
+  print(format_results(results, baseline=baseline))
+
+  if args.save:
+    save_baseline({**baseline, **results}, args.baseline)
+    print(f'Wrote {args.baseline}')
+    return 0
+
+  if regressions := compare(results, baseline, tolerance=args.tolerance):
+    print('\nRegressions:', *regressions, sep='\n  ')
+    return 1
+
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -4,18 +4,23 @@
 * https://atproto.com/lexicons/app-bsky-actor
 * https://github.com/bluesky-social/atproto/tree/main/lexicons/app/bsky
 """
+import concurrent.futures
 import copy
 from datetime import datetime, timezone
+import heapq
 import html
+import itertools
 import json
 import logging
 from pathlib import Path
 import re
 import string
+import threading
 import urllib.parse
 from urllib.parse import urlparse, urlunparse
 
 from bs4 import BeautifulSoup
+from cachetools import LRUCache, TLRUCache, TTLCache
 from io import BytesIO
 from lexrpc import Client
 from lexrpc.base import AT_URI_RE, Base, LANG_RE
@@ -27,7 +32,8 @@ from requests_oauth2client import OAuth2AccessTokenAuth, TokenSerializer
 from webutil import util
 from webutil.util import trim_nulls
 
-from . import as1
+from . import as1, transport
+from .cache import get_multi, set_multi
 from .as2 import QUOTE_RE_SUFFIX
 from .source import (
   creation_result,
@@ -174,6 +180,40 @@ LEXRPC = Base(truncate=True, validate=False)
 
 ELLIPSIS = ' […]'
 
+HANDLE_CACHE_SIZE = 10000
+HANDLE_CACHE_TIME = 60 * 60  # 1 hour expiration, in seconds
+# handles that don't resolve are cached for less time, since they may be new
+HANDLE_NEGATIVE_CACHE_TIME = 5 * 60
+MAX_HANDLE_RESOLVE_CONCURRENCY = 10
+
+STRONG_REF_CACHE_SIZE = 5000
+# app.bsky.feed.getPosts accepts up to this many URIs per call
+GET_POSTS_BATCH_SIZE = 25
+MAX_RECORD_FETCH_CONCURRENCY = 10
+
+BLOB_CACHE_SIZE = 1000
+# PDSes garbage collect uploaded blobs that no record references after a while,
+# so don't reuse them for too long
+BLOB_CACHE_TIME = 30 * 60
+
+# maps lower case handle to DID, or None if it doesn't resolve
+handle_cache = TLRUCache(
+  HANDLE_CACHE_SIZE,
+  lambda handle, did, now: now + (HANDLE_CACHE_TIME if did
+                                  else HANDLE_NEGATIVE_CACHE_TIME))
+handle_cache_lock = threading.RLock()
+
+# maps DID-based at:// URI to record dict with uri, cid, and value, as returned
+# by com.atproto.repo.getRecord
+strong_ref_cache = LRUCache(STRONG_REF_CACHE_SIZE)
+strong_ref_cache_lock = threading.RLock()
+
+# maps (str DID or handle, str media URL) to (dict blob, (int width, int height)
+# aspect ratio or None) tuple. blobs belong to the repo they were uploaded to,
+# so they're only reused for the same account.
+blob_cache = TTLCache(BLOB_CACHE_SIZE, BLOB_CACHE_TIME)
+blob_cache_lock = threading.RLock()
+
 
 def url_to_did_web(url):
   """Converts a URL to a ``did:web``.
@@ -324,10 +364,303 @@ def web_url_to_at_uri(url, handle=None, did=None):
   return f'at://{id}/{collection}/{rkey}'
 
 
+def resolve_handle(handle, client):
+  """Resolves a handle to a DID with ``com.atproto.identity.resolveHandle``.
+
+  Results are cached in :data:`handle_cache`, including handles that don't
+  resolve.
+
+  Args:
+    handle (str)
+    client (Bluesky or lexrpc.Client)
+
+  Returns:
+    str: DID, or None if the handle doesn't resolve
+
+  Raises:
+    requests.RequestException: on connection failures and HTTP 5xx errors,
+      which aren't cached
+  """
+  if isinstance(client, Bluesky):
+    client = client._client
+
+  key = handle.lower()
+  with handle_cache_lock:
+    if key in handle_cache:
+      return handle_cache[key]
+
+  try:
+    did = client.com.atproto.identity.resolveHandle(handle=handle)['did']
+  except BaseException as e:
+    code, _ = util.interpret_http_exception(e)
+    if not code or int(code) // 100 == 5:
+      raise
+    logger.info(f"Couldn't resolve handle {handle}: {code}")
+    did = None
+
+  with handle_cache_lock:
+    handle_cache[key] = did
+  return did
+
+
+def resolve_handles(handles, client):
+  """Resolves multiple handles to DIDs concurrently.
+
+  Uses and populates :data:`handle_cache`. Logs and omits handles that fail to
+  resolve because of a connection failure or server error.
+
+  Args:
+    handles (iterable of str)
+    client (Bluesky or lexrpc.Client)
+
+  Returns:
+    dict: maps str handle to str DID, or None if the handle doesn't resolve
+  """
+  handles = list(dict.fromkeys(handles))
+  with handle_cache_lock:
+    resolved = {h: handle_cache[h.lower()] for h in handles
+                if h.lower() in handle_cache}
+
+  def resolve(handle):
+    try:
+      return resolve_handle(handle, client)
+    except BaseException as e:
+      logger.info(f"Couldn't resolve handle {handle}: {e}")
+      return e
+
+  to_resolve = [h for h in handles if h not in resolved]
+  results = _map_concurrently(resolve, to_resolve, MAX_HANDLE_RESOLVE_CONCURRENCY)
+  for handle, did in zip(to_resolve, results):
+    if not isinstance(did, BaseException):
+      resolved[handle] = did
+
+  return resolved
+
+
+def prefetch_handles(obj, client):
+  """Resolves all handles in an AS1 object tree concurrently, ahead of conversion.
+
+  Collects the handles in mention tags and in ``at://`` URIs and ``bsky.app``
+  URLs anywhere in ``obj``, and resolves them with :func:`resolve_handles`, so
+  that :func:`from_as1` and :func:`from_as1_to_strong_ref` find them in
+  :data:`handle_cache` instead of resolving them one at a time.
+
+  Args:
+    obj (dict): AS1 object or activity
+    client (Bluesky or lexrpc.Client)
+
+  Returns:
+    dict: maps str handle to str DID, or None if the handle doesn't resolve
+  """
+  handles = []
+
+  def collect(val):
+    if isinstance(val, dict):
+      if val.get('objectType') == 'mention':
+        handles.append(_mention_user(
+          val.get('displayName', '').strip().lstrip('@#'), val.get('url') or ''))
+      for v in val.values():
+        collect(v)
+    elif isinstance(val, list):
+      for v in val:
+        collect(v)
+    elif isinstance(val, str):
+      if match := AT_URI_RE.fullmatch(val):
+        handles.append(match['repo'])
+      elif match := BSKY_APP_URL_RE.fullmatch(val):
+        handles.append(match['id'])
+
+  collect(obj)
+  return resolve_handles([h for h in handles if h and not h.startswith('did:')
+                          and HANDLE_RE.fullmatch(h)], client)
+
+
+def resolve_strong_refs(uris, client):
+  """Fetches the records for multiple ``at://`` URIs in bulk, eg for strong refs.
+
+  Uses and populates :data:`strong_ref_cache`. Fetches posts with
+  ``app.bsky.feed.getPosts``, :const:`GET_POSTS_BATCH_SIZE` at a time, and
+  other records with concurrent ``com.atproto.repo.getRecord`` calls. Resolves
+  handles in URIs with :func:`resolve_handles`.
+
+  Args:
+    uris (iterable of str): ``at://`` URIs
+    client (Bluesky or lexrpc.Client)
+
+  Returns:
+    dict: maps str input URI to record dict with ``uri``, ``cid``, and
+    ``value``. URIs that can't be parsed, resolved, or fetched are omitted.
+  """
+  if isinstance(client, Bluesky):
+    client = client._client
+
+  uris = list(dict.fromkeys(uris))
+
+  # parse URIs and resolve handles to DIDs
+  matches = {uri: match for uri in uris if (match := AT_URI_RE.fullmatch(uri))}
+  dids = resolve_handles([m['repo'] for m in matches.values()
+                          if not m['repo'].startswith('did:')], client)
+
+  did_uris = {}  # maps input URI to DID-based URI
+  for uri, match in matches.items():
+    repo = match['repo']
+    did = repo if repo.startswith('did:') else dids.get(repo)
+    if did:
+      # only replace first instance of handle in case it's also in collection or rkey
+      did_uris[uri] = uri.replace(repo, did, 1)
+
+  with strong_ref_cache_lock:
+    records = {did_uri: strong_ref_cache[did_uri] for did_uri in did_uris.values()
+               if did_uri in strong_ref_cache}
+
+  # fetch posts in bulk
+  to_fetch = list(dict.fromkeys(u for u in did_uris.values() if u not in records))
+  posts = [u for u in to_fetch
+           if AT_URI_RE.fullmatch(u)['collection'] == 'app.bsky.feed.post']
+  for i in range(0, len(posts), GET_POSTS_BATCH_SIZE):
+    batch = posts[i:i + GET_POSTS_BATCH_SIZE]
+    try:
+      resp = client.app.bsky.feed.getPosts(uris=batch)
+    except BaseException as e:
+      code, _ = util.interpret_http_exception(e)
+      if not code:
+        raise
+      logger.info(f'getPosts failed, falling back to getRecord: {e}')
+      continue
+    for post in resp.get('posts', []):
+      if post.get('uri') in batch and post.get('cid'):
+        records[post['uri']] = {
+          'uri': post['uri'],
+          'cid': post['cid'],
+          'value': post.get('record'),
+        }
+
+  # fetch everything else individually
+  def get_record(uri):
+    match = AT_URI_RE.fullmatch(uri)
+    try:
+      return client.com.atproto.repo.getRecord(
+        repo=match['repo'], collection=match['collection'], rkey=match['rkey'])
+    except requests.RequestException as e:
+      logger.info(e)
+
+  remaining = [u for u in to_fetch if u not in records]
+  for uri, record in zip(remaining, _map_concurrently(
+      get_record, remaining, MAX_RECORD_FETCH_CONCURRENCY)):
+    if record and record.get('cid'):
+      records[uri] = record
+
+  with strong_ref_cache_lock:
+    for uri in to_fetch:
+      if uri in records:
+        strong_ref_cache[uri] = records[uri]
+
+  return {uri: copy.deepcopy(records[did_uri])
+          for uri, did_uri in did_uris.items() if did_uri in records}
+
+
+def prefetch_strong_refs(objs, client):
+  """Fetches the CIDs of every record that AS1 objects refer to, ahead of conversion.
+
+  Collects the reply parents, like and repost subjects, and quoted posts in
+  ``objs`` and fetches them with :func:`resolve_strong_refs`, so that
+  :func:`from_as1` and :func:`from_as1_to_strong_ref` find them in
+  :data:`strong_ref_cache` instead of fetching them one at a time. Reply roots
+  come from their parents' records, so they don't need separate fetches.
+
+  Args:
+    objs (dict or sequence of dict): AS1 objects or activities
+    client (Bluesky or lexrpc.Client)
+
+  Returns:
+    dict: maps str ``at://`` URI to record dict, as returned by
+    :func:`resolve_strong_refs`
+  """
+  if isinstance(objs, dict):
+    objs = [objs]
+
+  uris = []
+
+  def collect(obj):
+    if not isinstance(obj, dict):
+      return
+    elif obj.get('objectType') == 'activity' and obj.get('verb') in ('post', 'update'):
+      collect(as1.get_object(obj))
+      return
+
+    if base := Bluesky.base_object(obj):
+      uris.append(_strong_ref_uri(base))
+    for att in util.get_list(obj, 'attachments'):
+      if isinstance(att, dict) and att.get('objectType') in ('article', 'link', 'note'):
+        uris.append(_strong_ref_uri(att))
+
+  for obj in objs:
+    collect(obj)
+
+  return resolve_strong_refs([u for u in uris if u], client)
+
+
+def _strong_ref_uri(obj):
+  """Returns the ``at://`` URI for an AS1 object's ``id`` or ``url``, or ``''``.
+
+  Args:
+    obj (dict or str): AS1 object or id
+
+  Returns:
+    str:
+  """
+  id = (obj.get('id') or as1.get_url(obj)) if isinstance(obj, dict) else obj
+  if id and AT_URI_RE.fullmatch(id):
+    return id
+  return Bluesky.post_id(id) or ''
+
+
+def _map_concurrently(fn, args, max_workers):
+  """Calls a function on each arg on a thread pool, serially if there's only one.
+
+  Args:
+    fn (callable): takes one arg
+    args (sequence)
+    max_workers (int)
+
+  Returns:
+    list: return values of ``fn``, in the same order as ``args``
+  """
+  if len(args) <= 1:
+    return [fn(arg) for arg in args]
+
+  with concurrent.futures.ThreadPoolExecutor(
+      max_workers=min(len(args), max_workers)) as pool:
+    return list(pool.map(fn, args))
+
+
+def _mention_user(name, tag_url):
+  """Extracts the DID or handle from a mention tag's name and URL.
+
+  Args:
+    name (str): tag's ``displayName``, without leading ``@``
+    tag_url (str): tag's ``url``
+
+  Returns:
+    str: DID or handle. Not guaranteed to be valid.
+  """
+  if tag_url.startswith('did:'):
+    return tag_url
+  elif match := AT_URI_RE.fullmatch(tag_url):
+    return match.group('repo')
+  elif match := BSKY_APP_URL_RE.fullmatch(tag_url):
+    return match.group('id')
+  else:
+    return name.lstrip('@')
+
+
 def from_as1_to_strong_ref(obj, client=None, value=False, raise_=False):
   """Converts an AS1 object to an ATProto ``com.atproto.repo.strongRef``.
 
-  Uses AS1 ``id`` or ``url`, which should be an ``at://`` URI.
+  Uses AS1 ``id`` or ``url`, which should be an ``at://`` URI. Handles are
+  resolved to DIDs with :func:`resolve_handle`. Fetched records are cached in
+  :data:`strong_ref_cache`. To fetch many records in bulk, use
+  :func:`prefetch_strong_refs` first.
 
   Args:
     obj (dict): AS1 object or activity
@@ -349,11 +682,8 @@ def from_as1_to_strong_ref(obj, client=None, value=False, raise_=False):
     assert not raise_
 
   id = (obj.get('id') or as1.get_url(obj)) if isinstance(obj, dict) else obj
-  if match := AT_URI_RE.fullmatch(id):
-    at_uri = id
-  else:
-    at_uri = Bluesky.post_id(id) or ''
-    match = AT_URI_RE.fullmatch(at_uri)
+  at_uri = _strong_ref_uri(id)
+  match = AT_URI_RE.fullmatch(at_uri)
 
   if not match or not client:
     if not match and raise_:
@@ -366,16 +696,31 @@ def from_as1_to_strong_ref(obj, client=None, value=False, raise_=False):
   repo = match['repo']
   if not repo.startswith('did:'):
     handle = repo
-    repo = client.com.atproto.identity.resolveHandle(handle=handle)['did']
+    repo = resolve_handle(handle, client)
+    if not repo:
+      if raise_:
+        raise ValueError(f"Couldn't resolve handle {handle}")
+      return {
+        'uri': at_uri,
+        'cid': '',
+      }
     # only replace first instance of handle in case it's also in collection or rkey
     at_uri = at_uri.replace(handle, repo, 1)
 
-  try:
-    record = client.com.atproto.repo.getRecord(
-      repo=repo, collection=match['collection'], rkey=match['rkey'])
-  except requests.RequestException as e:
-    logger.info(e)
-    record = {}
+  with strong_ref_cache_lock:
+    record = copy.deepcopy(strong_ref_cache.get(at_uri))
+
+  if not record:
+    try:
+      record = client.com.atproto.repo.getRecord(
+        repo=repo, collection=match['collection'], rkey=match['rkey'])
+    except requests.RequestException as e:
+      logger.info(e)
+      record = {}
+
+    if record.get('cid'):
+      with strong_ref_cache_lock:
+        strong_ref_cache[at_uri] = copy.deepcopy(record)
 
   if not record and raise_:
     raise ValueError(f"Couldn't load {at_uri}")
@@ -485,7 +830,7 @@ def from_as1(obj, out_type=None, blobs=None, aspects=None, client=None,
   if not type:
     raise ValueError(f"Missing objectType or verb")
 
-  obj = copy.deepcopy(obj)
+  obj = as1.copy_object(obj)
   actor = as1.get_object(activity, 'actor')
   if blobs is None:
     blobs = {}
@@ -943,6 +1288,15 @@ def from_as1(obj, out_type=None, blobs=None, aspects=None, client=None,
         }
       })
 
+    # resolve all mentioned handles at once
+    if client:
+      mentions = [_mention_user(tag.get('displayName', '').strip().lstrip('@#'),
+                                tag.get('url') or '')
+                  for tag in tags if tag.get('objectType') == 'mention']
+      resolve_handles([m for m in mentions
+                       if not m.startswith('did:') and HANDLE_RE.fullmatch(m)],
+                      client)
+
     # convert tags to facets
     hashtag_facets = set()  # contains string displayNames, lower cased
     for tag in tags:
@@ -985,21 +1339,14 @@ def from_as1(obj, out_type=None, blobs=None, aspects=None, client=None,
 
       elif tag_type == 'mention':
         # extract and resolve DID
-        if tag_url.startswith('did:'):
-          user = tag_url
-        elif match := AT_URI_RE.fullmatch(tag_url):
-          user = match.group('repo')
-        elif match := BSKY_APP_URL_RE.fullmatch(tag_url):
-          user = match.group('id')
-        else:
-          user = name.lstrip('@')
+        user = _mention_user(name, tag_url)
 
         did = None
         if user.startswith('did:'):
           did = user
         elif client and HANDLE_RE.fullmatch(user):
           try:
-            did = client.com.atproto.identity.resolveHandle(handle=user)['did']
+            did = resolve_handle(user, client)
           except BaseException as e:
             code, _ = util.interpret_http_exception(e)
             if not code:
@@ -1972,6 +2319,10 @@ class Bluesky(Source):
     handle (str)
     did (str)
     client (lexrpc.Client)
+    MAX_PAGES (int): maximum number of pages of likes and reposts to fetch for
+      each post in :meth:`get_activities_response`
+    MAX_REPLY_DEPTH (int): maximum depth of replies to include from a thread
+    MAX_REPLIES (int): maximum number of replies to include from a thread
   """
   DOMAIN = 'bsky.app'
   BASE_URL = 'https://bsky.app'
@@ -1986,12 +2337,18 @@ class Bluesky(Source):
     'follow': 'follow',
   }
 
+  MAX_PAGES = 1
+  # getPostThread's own maximum depth
+  MAX_REPLY_DEPTH = 1000
+  MAX_REPLIES = 10000
+
   _client = None
   _app_password = None
 
   def __init__(self, handle, pds_url=None, did=None, access_token=None,
                refresh_token=None, app_password=None, auth=None,
-               session_callback=None, **requests_kwargs):
+               session_callback=None, max_concurrency=None, max_pages=None,
+               **requests_kwargs):
     """Constructor.
 
     Args:
@@ -2004,6 +2361,11 @@ class Bluesky(Source):
       auth (requests.auth.AuthBase): optional, used to authenticate XRPC requests
       session_callback (callable, dict => None): passed to :class:`lexrpc.Client`
         constructor, called when a new session is created or refreshed
+      max_concurrency (int): optional, maximum number of likes, reposts, and
+        replies requests to make at once in :meth:`get_activities_response`,
+        and media to upload at once in :meth:`create`. Defaults to
+        :attr:`Source.MAX_CONCURRENCY`.
+      max_pages (int): optional, overrides :attr:`MAX_PAGES`
       requests_kwargs (dict): passed to :func:`requests.get`/:func:`requests.post`
     """
     assert not ((access_token or refresh_token) and auth)
@@ -2011,6 +2373,10 @@ class Bluesky(Source):
     self.handle = handle
     self.did = did
     self._app_password = app_password
+    if max_concurrency is not None:
+      self.MAX_CONCURRENCY = max_concurrency
+    if max_pages is not None:
+      self.MAX_PAGES = max_pages
 
     headers = {'User-Agent': util.user_agent}
     self._client = Client(pds_url, access_token=access_token,
@@ -2136,15 +2502,23 @@ class Bluesky(Source):
                               fetch_likes=False, fetch_shares=False,
                               include_shares=True, fetch_mentions=False,
                               search_query=None, start_index=None, count=None,
-                              cache=None, **kwargs):
+                              min_id=None, cache=None, **kwargs):
     """Fetches posts and converts them to AS1 activities.
 
     See :meth:`Source.get_activities_response` for more information.
 
     Bluesky-specific details:
 
+    Likes, reposts, and replies are fetched for up to :attr:`MAX_CONCURRENCY`
+    posts at once. Likes and reposts follow cursors for up to :attr:`MAX_PAGES`
+    pages.
+
     Args:
       activity_id (str): an ``at://`` URI
+      min_id (str): ISO 8601 ``indexedAt`` timestamp. Feed items indexed at or
+        before it are skipped before they're converted or their likes,
+        reposts, and replies are fetched. Reposts use their ``reason``'s
+        ``indexedAt``.
     """
     assert not start_index
 
@@ -2152,13 +2526,21 @@ class Bluesky(Source):
     if count is not None:
       params['limit'] = count
 
+    # compare as datetimes, not strings, since precision and time zone
+    # designators vary, eg ...05Z vs ...05.000Z
+    min_dt = util.as_utc(util.parse_iso8601(min_id)) if min_id else None
+
     posts = None
+    thread = None
     handle = self.handle
     if activity_id:
       if not activity_id.startswith('at://'):
         raise ValueError(f'Expected activity_id to be at:// URI; got {activity_id}')
-      resp = self.client.app.bsky.feed.getPostThread({}, uri=activity_id, depth=1)
-      posts = [resp.get('thread', {})]
+      # if we need replies, fetch the whole thread now and reuse it below
+      depth = {} if fetch_replies else {'depth': 1}
+      resp = self.client.app.bsky.feed.getPostThread({}, uri=activity_id, **depth)
+      thread = resp.get('thread', {})
+      posts = [thread]
 
     elif group_id in (None, FRIENDS):
       resp = self.client.app.bsky.feed.getTimeline({}, **params)
@@ -2177,60 +2559,97 @@ class Bluesky(Source):
 
     activities = []
 
+    # (AS1 object, Bluesky post) tuples to fetch likes, reposts, and replies for
+    to_fetch = []
+
     for post in posts:
       reason = post.get('reason')
       is_repost = reason and reason.get('$type') == 'app.bsky.feed.defs#reasonRepost'
       if is_repost and not include_shares:
         continue
 
+      if min_dt:
+        indexed_at = (reason if is_repost else post.get('post', {})).get('indexedAt')
+        if indexed_at and util.as_utc(util.parse_iso8601(indexed_at)) <= min_dt:
+          continue
+
       activity = self.postprocess_activity(self._post_to_activity(post))
       if not activity:
         continue
 
       activities.append(activity)
       obj = activity['object']
-      id = obj.get('id')
-      tags = obj.setdefault('tags', [])
+      obj.setdefault('tags', [])
 
       if is_repost:
         # If it's a repost we're not interested in responses to it.
         continue
       bs_post = post.get('post')
-      if bs_post and id:
-        # Likes
-        like_count = bs_post.get('likeCount')
-        if fetch_likes and like_count and like_count != cache.get('ABL ' + id):
-          likers = self.client.app.bsky.feed.getLikes({}, uri=bs_post.get('uri'))
-          tags.extend(self._make_like(bs_post, l.get('actor')) for l in likers.get('likes'))
-          cache['ABL ' + id] = like_count
-
-        # Reposts
-        repost_count = bs_post.get('repostCount')
-        if fetch_shares and repost_count and repost_count != cache.get('ABRP ' + id):
-          reposters = self.client.app.bsky.feed.getRepostedBy({}, uri=bs_post.get('uri'))
-          tags.extend(self._make_share(bs_post, r) for r in reposters.get('repostedBy'))
-          cache['ABRP ' + id] = repost_count
-
-        # Replies
-        reply_count = bs_post.get('replyCount')
-        if fetch_replies and reply_count and reply_count != cache.get('ABR ' + id):
-          replies = []
-          for r in self._get_replies(bs_post.get('uri')):
-            try:
-              reply = to_as1(r)
-            except ValueError as e:
-              logger.warning(f'skipping a reply: {e}')
-              continue
-            if reply:
-              replies.append(reply)
-
-          for r in replies:
-            r['id'] = self.tag_uri(r['id'])
-          obj['replies'] = {
-            'items': replies,
-          }
-          cache['ABR ' + id] = reply_count
+      if bs_post and obj.get('id'):
+        to_fetch.append((obj, bs_post))
+
+    # read all cached counts at once
+    cached = get_multi(cache, [f'{prefix} {obj["id"]}' for obj, _ in to_fetch
+                               for prefix in ('ABL', 'ABRP', 'ABR')])
+    updates = {}
+
+    # (cache key prefix, AS1 object, Bluesky post) tuples for likes, reposts,
+    # and replies that have changed
+    tasks = []
+    for obj, bs_post in to_fetch:
+      id = obj['id']
+      for prefix, fetch, count_field in (
+          ('ABL', fetch_likes, 'likeCount'),
+          ('ABRP', fetch_shares, 'repostCount'),
+          ('ABR', fetch_replies, 'replyCount'),
+      ):
+        count = bs_post.get(count_field)
+        if fetch and count and count != cached.get(f'{prefix} {id}'):
+          tasks.append((prefix, obj, bs_post))
+
+    # log in, if necessary, before fanning out
+    client = self.client
+
+    def fetch(task):
+      prefix, _, bs_post = task
+      uri = bs_post.get('uri')
+      if prefix == 'ABL':
+        return self._get_pages(client.app.bsky.feed.getLikes, 'likes', uri=uri)
+      elif prefix == 'ABRP':
+        return self._get_pages(client.app.bsky.feed.getRepostedBy, 'repostedBy',
+                               uri=uri)
+      else:
+        return self._get_replies(uri, thread=thread)
+
+    for (prefix, obj, bs_post), results in zip(
+        tasks, self._concurrent_map(fetch, tasks)):
+      if prefix == 'ABL':
+        obj['tags'].extend(self._make_like(bs_post, l.get('actor')) for l in results)
+        updates['ABL ' + obj['id']] = bs_post.get('likeCount')
+
+      elif prefix == 'ABRP':
+        obj['tags'].extend(self._make_share(bs_post, r) for r in results)
+        updates['ABRP ' + obj['id']] = bs_post.get('repostCount')
 
+      else:
+        replies = []
+        for r in results:
+          try:
+            reply = to_as1(r)
+          except ValueError as e:
+            logger.warning(f'skipping a reply: {e}')
+            continue
+          if reply:
+            replies.append(reply)
+
+        for r in replies:
+          r['id'] = self.tag_uri(r['id'])
+        obj['replies'] = {
+          'items': replies,
+        }
+        updates['ABR ' + obj['id']] = bs_post.get('replyCount')
+
+    set_multi(cache, updates)
     resp = self.make_activities_base_response(util.trim_nulls(activities))
     return resp
 
@@ -2331,40 +2750,91 @@ class Bluesky(Source):
       'author': author,
     }
 
-  def _get_replies(self, uri):
+  def _get_pages(self, method, field, **params):
+    """Calls a paginated XRPC query and follows its cursors.
+
+    Fetches up to :attr:`MAX_PAGES` pages.
+
+    Args:
+      method (callable): :class:`lexrpc.Client` query method, eg
+        ``client.app.bsky.feed.getLikes``
+      field (str): output field with the items, eg ``likes``
+      params: passed to ``method``
+
+    Returns: list, items from all pages
+    """
+    items = []
+    cursor = None
+    for _ in range(max(self.MAX_PAGES, 1)):
+      if cursor:
+        params['cursor'] = cursor
+      resp = method({}, **params)
+      items.extend(resp.get(field) or [])
+      cursor = resp.get('cursor')
+      if not cursor:
+        break
+
+    return items
+
+  def _get_replies(self, uri, thread=None):
     """
     Gets the replies to a specific post and returns them
     in ascending order of creation. Does not include the original post.
 
+    Fetches the thread eagerly, but walks it lazily with :meth:`_walk_replies`.
+
     Args:
       uri: string, post uri
+      thread: dict, optional app.bsky.feed.defs#threadViewPost for this post,
+        already fetched. If not provided, it's fetched.
 
-    Returns: list, Bluesky app.bsky.feed.defs#threadViewPost
+    Returns: iterator, Bluesky app.bsky.feed.defs#threadViewPost
     """
-    ret = []
-    resp = self.client.app.bsky.feed.getPostThread({}, uri=uri)
-    thread = resp.get('thread')
-    if thread:
-      ret = self._recurse_replies(thread)
-    return sorted(ret, key = lambda thread:
-                    thread.get('post', {}).get('record', {}).get('createdAt') or '')
-
-  # TODO this ought to take a depth limit. hellthread, anyone?
-  def _recurse_replies(self, thread):
+    if not thread:
+      resp = self.client.app.bsky.feed.getPostThread({}, uri=uri)
+      thread = resp.get('thread')
+    return self._walk_replies(thread) if thread else iter(())
+
+  def _walk_replies(self, thread, max_depth=None, max_count=None):
     """
-    Recurses through a Bluesky app.bsky.feed.defs#threadViewPost
-    and returns its replies as a list.
+    Walks a Bluesky app.bsky.feed.defs#threadViewPost and yields its replies
+    in ascending order of creation.
+
+    Iterative, not recursive. Uses a heap keyed on ``createdAt``, seeded with
+    the thread's direct replies. Each reply's own replies are pushed when it's
+    yielded, which works because replies are created after their parents.
 
     Args:
       thread: dict, Bluesky app.bsky.feed.defs#threadViewPost
+      max_depth: int, optional, defaults to :attr:`MAX_REPLY_DEPTH`. Direct
+        replies are depth 1.
+      max_count: int, optional, defaults to :attr:`MAX_REPLIES`
 
-    Returns: list, Bluesky app.bsky.feed.defs#threadViewPost
+    Yields: dict, Bluesky app.bsky.feed.defs#threadViewPost
     """
-    ret = []
-    for r in thread.get('replies', []):
-      ret += [r]
-      ret += self._recurse_replies(r)
-    return ret
+    if max_depth is None:
+      max_depth = self.MAX_REPLY_DEPTH
+    if max_count is None:
+      max_count = self.MAX_REPLIES
+
+    # (createdAt, tiebreaker, depth, threadViewPost) tuples
+    heap = []
+    counter = itertools.count()
+
+    def push(parent, depth):
+      if depth > max_depth:
+        return
+      for r in parent.get('replies') or []:
+        created = r.get('post', {}).get('record', {}).get('createdAt') or ''
+        heapq.heappush(heap, (created, next(counter), depth, r))
+
+    push(thread, 1)
+    for _ in range(max_count):
+      if not heap:
+        return
+      _, _, depth, reply = heapq.heappop(heap)
+      yield reply
+      push(reply, depth + 1)
 
   def get_followers(self, user_id=None):
     """Returns the current user's followers.
@@ -2659,6 +3129,8 @@ class Bluesky(Source):
 
       else:
         blobs, aspects = self.upload_media(images)
+        # fetch the reply parent and quoted post together, in one getPosts call
+        prefetch_strong_refs(obj, self.client)
         post_atp = from_as1(obj, blobs=blobs, aspects=aspects, client=self)
         post_atp['text'] = content
 
@@ -2753,7 +3225,7 @@ class Bluesky(Source):
         if not (ids := util.get_list(base, 'id') + util.get_list(base, 'url')):
           continue
 
-        base = copy.deepcopy(base)
+        base = as1.copy_object(base)
         for id in ids:
           if id.startswith('https://bsky.app/'):
             base.setdefault('id', web_url_to_at_uri(id))
@@ -2775,40 +3247,76 @@ class Bluesky(Source):
     return {}
 
   def upload_media(self, media):
-    """
+    """Uploads images and videos from web URLs as blobs.
+
+    Downloads and uploads up to :attr:`MAX_CONCURRENCY` files at once, each in
+    its own thread, so that one file's upload overlaps with the others'
+    downloads. Reuses blobs in :data:`blob_cache` that this account uploaded
+    recently from the same URL.
+
     Args:
       media (sequence of dict AS1 objects)
 
     Returns:
       (dict mapping string URL to dict blob, dict mapping string URL to (int width, int height)) tuple:
     """
-    blobs = {}
-    aspects = {}
-
+    urls = []
     for obj in media:
       url = util.get_url(obj, key='stream') or util.get_url(obj)
-      if not url or url in blobs:
-        continue
+      if url and url not in urls:
+        urls.append(url)
 
-      with util.requests_get(url, stream=True) as fetch:
-        fetch.raise_for_status()
-        data = BytesIO(util.FileLimiter(fetch.raw, MAX_MEDIA_SIZE_BYTES).read())
-        content_type = fetch.headers.get('Content-Type', '')
-        if content_type.startswith("image/"):
-          media_info = MediaInfo.parse(data)
-          tracks = media_info.video_tracks or media_info.image_tracks
-          if tracks:
-            aspects[url] = (tracks[0].width, tracks[0].height)
-          data.seek(0)
-        upload = self.client.com.atproto.repo.uploadBlob(
-          input=data,
-          headers={'Content-Type': content_type}
-        )
-
-      blobs[url] = upload['blob']
+    blobs = {}
+    aspects = {}
+    for url, (blob, aspect) in zip(urls, self._concurrent_map(self._upload_blob, urls)):
+      blobs[url] = blob
+      if aspect:
+        aspects[url] = aspect
 
     return blobs, aspects
 
+  def _upload_blob(self, url):
+    """Downloads a file from a web URL and uploads it as a blob.
+
+    Uses and populates :data:`blob_cache`.
+
+    Args:
+      url (str)
+
+    Returns:
+      (dict blob, (int width, int height) or None aspect ratio) tuple:
+    """
+    key = (self.did or self.handle, url)
+    with blob_cache_lock:
+      cached = blob_cache.get(key)
+    if cached:
+      logger.debug(f'Reusing cached blob for {url}')
+      return copy.deepcopy(cached)
+
+    aspect = None
+    with transport.host_limit(url), util.requests_get(url, stream=True) as fetch:
+      fetch.raise_for_status()
+      data = util.FileLimiter(fetch.raw, MAX_MEDIA_SIZE_BYTES)
+      content_type = fetch.headers.get('Content-Type', '')
+      if content_type.startswith("image/"):
+        # MediaInfo needs the whole file to find the dimensions. other types go
+        # straight to lexrpc, which reads them itself.
+        data = BytesIO(data.read())
+        media_info = MediaInfo.parse(data)
+        tracks = media_info.video_tracks or media_info.image_tracks
+        if tracks:
+          aspect = (tracks[0].width, tracks[0].height)
+        data.seek(0)
+      upload = self.client.com.atproto.repo.uploadBlob(
+        input=data,
+        headers={'Content-Type': content_type}
+      )
+
+    result = (upload['blob'], aspect)
+    with blob_cache_lock:
+      blob_cache[key] = copy.deepcopy(result)
+    return result
+
   def truncate(self, *args, type=None, **kwargs):
     """Thin wrapper around :meth:`Source.truncate` that sets default kwargs."""
     if type == 'dm':
@@ -0,0 +1,324 @@
+"""Cache backends for :meth:`Source.get_activities_response`'s ``cache`` kwarg.
+
+Sources use ``cache`` to remember per-activity metadata like reply, like, and
+share counts across polls, so that they can skip API calls when those counts
+haven't changed. It can be a plain :class:`dict`, but then the caller has to
+load and store the whole thing themselves. The :class:`Cache` implementations
+here persist it instead:
+
+* :class:`MemoryCache`: in process, LRU with optional TTL
+* :class:`SqliteCache`: on disk, in a SQLite database, with optional TTL
+* :class:`SharedMemoryCache`: in memory, shared across processes
+
+Sources read all of the keys they need for one call with a single
+:meth:`Cache.get_multi` and write all of their updates with a single
+:meth:`Cache.set_multi`. :func:`get_multi` and :func:`set_multi` do the same
+for any mapping, including plain dicts.
+
+Values must be JSON-serializable for :class:`SqliteCache` and picklable for
+:class:`SharedMemoryCache`.
+"""
+from collections.abc import MutableMapping
+import logging
+from multiprocessing.managers import BaseManager
+import sqlite3
+import threading
+import time
+
+from cachetools import LRUCache, TTLCache
+from webutil.util import json_dumps, json_loads
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAXSIZE = 10000
+
+# SQLite's default SQLITE_MAX_VARIABLE_NUMBER is 999 in older versions
+SQLITE_MAX_VARS = 500
+
+
+def get_multi(cache, keys):
+  """Reads multiple keys from a cache.
+
+  Args:
+    cache (Cache or dict): uses :meth:`Cache.get_multi` if available
+    keys (iterable of str)
+
+  Returns:
+    dict: maps str key to value, only for keys that are in the cache
+  """
+  if isinstance(cache, Cache):
+    return cache.get_multi(keys)
+
+  return {key: cache[key] for key in keys if key in cache}
+
+
+def set_multi(cache, values):
+  """Writes multiple keys to a cache.
+
+  Args:
+    cache (Cache or dict): uses :meth:`Cache.set_multi` if available
+    values (dict): maps str key to value
+  """
+  if not values:
+    return
+  elif isinstance(cache, Cache):
+    cache.set_multi(values)
+  else:
+    cache.update(values)
+
+
+class Cache(MutableMapping):
+  """Abstract base class for caches.
+
+  Subclasses must implement the :class:`collections.abc.MutableMapping`
+  abstract methods and should override :meth:`get_multi` and
+  :meth:`set_multi` with bulk implementations.
+  """
+  def get_multi(self, keys):
+    """Reads multiple keys.
+
+    Args:
+      keys (iterable of str)
+
+    Returns:
+      dict: maps str key to value, only for keys that are in the cache
+    """
+    ret = {}
+    for key in keys:
+      try:
+        ret[key] = self[key]
+      except KeyError:
+        pass
+    return ret
+
+  def set_multi(self, values):
+    """Writes multiple keys.
+
+    Args:
+      values (dict): maps str key to value
+    """
+    for key, val in values.items():
+      self[key] = val
+
+
+class MemoryCache(Cache):
+  """In-memory LRU cache with optional TTL. Thread safe.
+
+  Attributes:
+    maxsize (int): maximum number of keys. Least recently used keys are evicted
+      first.
+    ttl (float): optional, seconds until each key expires
+  """
+  def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=None):
+    """Constructor.
+
+    Args:
+      maxsize (int)
+      ttl (float): optional
+    """
+    self.maxsize = maxsize
+    self.ttl = ttl
+    self._cache = (TTLCache(maxsize, ttl) if ttl else LRUCache(maxsize))
+    self._lock = threading.RLock()
+
+  def __getitem__(self, key):
+    with self._lock:
+      return self._cache[key]
+
+  def __setitem__(self, key, val):
+    with self._lock:
+      self._cache[key] = val
+
+  def __delitem__(self, key):
+    with self._lock:
+      del self._cache[key]
+
+  def __iter__(self):
+    with self._lock:
+      return iter(list(self._cache))
+
+  def __len__(self):
+    with self._lock:
+      return len(self._cache)
+
+  def get_multi(self, keys):
+    with self._lock:
+      return super().get_multi(keys)
+
+  def set_multi(self, values):
+    with self._lock:
+      super().set_multi(values)
+
+
+class SqliteCache(Cache):
+  """On-disk cache stored in a SQLite database, with optional TTL. Thread safe.
+
+  Values are stored as JSON. Expired keys are ignored on read and deleted on
+  write.
+
+  Attributes:
+    path (str): database file path, or ``:memory:``
+    ttl (float): optional, seconds until each key expires
+  """
+  def __init__(self, path, ttl=None, table='granary_cache'):
+    """Constructor.
+
+    Args:
+      path (str)
+      ttl (float): optional
+      table (str): table name. Created if it doesn't already exist.
+    """
+    self.path = path
+    self.ttl = ttl
+    self._table = table
+    self._lock = threading.RLock()
+    self._db = sqlite3.connect(path, check_same_thread=False)
+    with self._lock, self._db:
+      self._db.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+          key TEXT PRIMARY KEY,
+          value TEXT NOT NULL,
+          expires REAL
+        )""")
+
+  def _live(self):
+    """Returns a SQL condition and args that exclude expired rows."""
+    return '(expires IS NULL OR expires > ?)', [time.time()]
+
+  def __getitem__(self, key):
+    if (got := self.get_multi([key])):
+      return got[key]
+    raise KeyError(key)
+
+  def __setitem__(self, key, val):
+    self.set_multi({key: val})
+
+  def __delitem__(self, key):
+    with self._lock, self._db:
+      cursor = self._db.execute(f'DELETE FROM {self._table} WHERE key = ?',
+                                [key])
+    if not cursor.rowcount:
+      raise KeyError(key)
+
+  def __iter__(self):
+    live, args = self._live()
+    with self._lock:
+      rows = self._db.execute(f'SELECT key FROM {self._table} WHERE {live}',
+                              args).fetchall()
+    return iter(key for key, in rows)
+
+  def __len__(self):
+    live, args = self._live()
+    with self._lock:
+      return self._db.execute(
+        f'SELECT COUNT(*) FROM {self._table} WHERE {live}', args).fetchone()[0]
+
+  def get_multi(self, keys):
+    keys = list(keys)
+    live, live_args = self._live()
+    ret = {}
+
+    with self._lock:
+      for i in range(0, len(keys), SQLITE_MAX_VARS):
+        batch = keys[i:i + SQLITE_MAX_VARS]
+        placeholders = ','.join('?' * len(batch))
+        rows = self._db.execute(
+          f'SELECT key, value FROM {self._table} '
+          f'WHERE key IN ({placeholders}) AND {live}',
+          batch + live_args)
+        ret.update((key, json_loads(value)) for key, value in rows)
+
+    return ret
+
+  def set_multi(self, values):
+    now = time.time()
+    expires = now + self.ttl if self.ttl else None
+    rows = [(key, json_dumps(val), expires) for key, val in values.items()]
+
+    with self._lock, self._db:
+      self._db.executemany(
+        f'INSERT OR REPLACE INTO {self._table} (key, value, expires) '
+        'VALUES (?, ?, ?)', rows)
+      self._db.execute(f'DELETE FROM {self._table} WHERE expires <= ?', [now])
+
+  def close(self):
+    """Closes the database connection."""
+    with self._lock:
+      self._db.close()
+
+
+class _SharedStore(MemoryCache):
+  """:class:`MemoryCache` that lives in a :class:`_Manager` server process."""
+  def list_keys(self):
+    return list(self)
+
+
+class _Manager(BaseManager):
+  pass
+
+
+_Manager.register('SharedStore', _SharedStore, exposed=(
+  '__getitem__', '__setitem__', '__delitem__', '__len__', 'list_keys',
+  'get_multi', 'set_multi'))
+
+
+class SharedMemoryCache(Cache):
+  """In-memory LRU cache with optional TTL, shared across processes.
+
+  The data lives in a :class:`multiprocessing.managers.BaseManager` server
+  process that this instance starts. Instances can be pickled and passed to
+  other processes, eg in a :class:`multiprocessing.Pool`, and they'll all
+  share the same data. Each :meth:`get_multi` and :meth:`set_multi` is a
+  single round trip to the server process.
+
+  Call :meth:`shutdown` on the original instance when done.
+
+  Attributes:
+    maxsize (int): maximum number of keys. Least recently used keys are evicted
+      first.
+    ttl (float): optional, seconds until each key expires
+  """
+  def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=None):
+    """Constructor.
+
+    Args:
+      maxsize (int)
+      ttl (float): optional
+    """
+    self.maxsize = maxsize
+    self.ttl = ttl
+    self._manager = _Manager()
+    self._manager.start()
+    self._store = self._manager.SharedStore(maxsize=maxsize, ttl=ttl)
+
+  def __getstate__(self):
+    # the manager can't be pickled, and only the original instance should shut
+    # it down anyway
+    return {**self.__dict__, '_manager': None}
+
+  def __getitem__(self, key):
+    return self._store.__getitem__(key)
+
+  def __setitem__(self, key, val):
+    self._store.__setitem__(key, val)
+
+  def __delitem__(self, key):
+    self._store.__delitem__(key)
+
+  def __iter__(self):
+    return iter(self._store.list_keys())
+
+  def __len__(self):
+    return self._store.__len__()
+
+  def get_multi(self, keys):
+    return self._store.get_multi(list(keys))
+
+  def set_multi(self, values):
+    self._store.set_multi(dict(values))
+
+  def shutdown(self):
+    """Shuts down the server process. The cache can't be used afterward."""
+    if self._manager:
+      self._manager.shutdown()
+      self._manager = None
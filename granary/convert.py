@@ -0,0 +1,149 @@
+"""Converts batches of objects between formats.
+
+:func:`convert_many` converts a whole batch of objects from one format to
+another, via AS1. It looks up converters once per batch instead of once per
+object, converts each distinct object only once even if it appears in the
+batch multiple times, and can optionally spread large batches across a process
+pool.
+
+Only supports formats with per-object converters, not feed formats like Atom,
+RSS, and JSON Feed, which convert whole feeds at once.
+"""
+import concurrent.futures
+import copy
+from functools import partial
+import logging
+
+from . import as1, as2, bluesky, farcaster, microformats2, nostr
+
+logger = logging.getLogger(__name__)
+
+# maps format name to (to_as1, from_as1) functions. None means the objects are
+# already AS1.
+FORMATS = {
+  'activitystreams': (None, None),
+  'as1': (None, None),
+  'as2': (as2.to_as1, as2.from_as1),
+  'bluesky': (bluesky.to_as1, bluesky.from_as1),
+  'farcaster': (farcaster.to_as1, farcaster.from_as1),
+  'json-mf2': (microformats2.to_as1, microformats2.activity_to_json),
+  'mf2-json': (microformats2.to_as1, microformats2.activity_to_json),
+  'nostr': (nostr.to_as1, nostr.from_as1),
+}
+
+# batches smaller than this are always converted in the current process, since
+# process pool overhead would outweigh the parallelism
+MIN_PROCESS_POOL_BATCH = 100
+
+
+def convert_many(objects, from_format, to_format, processes=None, **kwargs):
+  """Converts a batch of objects from one format to another.
+
+  Returns a list of converted objects in the same order as ``objects``. If
+  ``objects`` has duplicates, each distinct object is only converted once, and
+  the duplicates get their own copies of its output. Duplicates are found by a
+  cheap identity key, eg ``id``, and then confirmed with ``==``, so objects
+  without one, eg dicts with no ``id``, are always converted.
+
+  Args:
+    objects (sequence): objects in ``from_format``
+    from_format (str): input format, a key in :const:`FORMATS`
+    to_format (str): output format, a key in :const:`FORMATS`
+    processes (int): optional. If set, and the batch has at least
+      :const:`MIN_PROCESS_POOL_BATCH` distinct objects, converts them in a pool
+      of this many processes. ``objects`` and ``kwargs`` must be picklable.
+    kwargs: passed through to ``to_format``'s ``from_as1`` function, eg
+      ``client`` for :func:`bluesky.from_as1`
+
+  Returns:
+    list: converted objects
+
+  Raises:
+    ValueError: if ``from_format`` or ``to_format`` isn't supported. Also
+      raises whatever the underlying converters raise.
+  """
+  for format in from_format, to_format:
+    if format not in FORMATS:
+      raise ValueError(f'Unsupported format {format}, expected one of {sorted(FORMATS)}')
+
+  objects = list(objects)
+
+  # dedupe. only compare objects whose keys match.
+  unique = []
+  indices = []  # maps each input object's index to its index in unique
+  seen = {}  # maps key to list of indices in unique
+  for obj in objects:
+    key = _key(obj) if len(objects) > 1 else None
+    candidates = seen.setdefault(key, []) if key is not None else []
+    for i in candidates:
+      if unique[i] == obj:
+        indices.append(i)
+        break
+    else:
+      candidates.append(len(unique))
+      indices.append(len(unique))
+      unique.append(obj)
+
+  if len(unique) < len(objects):
+    logger.debug(f'Converting {len(unique)} distinct objects out of {len(objects)}')
+
+  if processes and len(unique) >= MIN_PROCESS_POOL_BATCH:
+    chunk_size = -(-len(unique) // (processes * 4))  # ceil
+    chunks = [unique[i:i + chunk_size] for i in range(0, len(unique), chunk_size)]
+    convert = partial(_convert_chunk, from_format=from_format,
+                      to_format=to_format, kwargs=kwargs)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as pool:
+      converted = [out for chunk in pool.map(convert, chunks) for out in chunk]
+  else:
+    converted = _convert_chunk(unique, from_format, to_format, kwargs)
+
+  # give duplicates their own copies
+  ret = []
+  used = set()
+  for i in indices:
+    out = converted[i]
+    if i in used:
+      out = (as1.copy_object(out) if isinstance(out, dict)
+             else copy.deepcopy(out))
+    used.add(i)
+    ret.append(out)
+
+  return ret
+
+
+def _key(obj):
+  """Returns a cheap hashable key for finding an input object's duplicates.
+
+  Objects with the same key aren't necessarily equal, so callers should
+  compare them too.
+
+  Args:
+    obj: input object
+
+  Returns:
+    hashable, or None if the object has no cheap key
+  """
+  if isinstance(obj, dict):
+    id = obj.get('id')
+    return id if isinstance(id, str) else None
+  elif isinstance(obj, str):
+    return obj
+  elif msg_hash := getattr(obj, 'hash', None):  # eg Farcaster protobuf messages
+    return type(obj).__name__, msg_hash
+
+
+def _convert_chunk(objects, from_format, to_format, kwargs):
+  """Converts a list of objects. Module-level so that process pools can pickle it.
+  """
+  to_as1 = FORMATS[from_format][0]
+  from_as1 = FORMATS[to_format][1]
+
+  converted = []
+  for obj in objects:
+    if to_as1:
+      obj = to_as1(obj)
+    if from_as1:
+      obj = from_as1(obj, **kwargs)
+    converted.append(obj)
+
+  return converted
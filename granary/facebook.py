@@ -19,6 +19,7 @@ from webutil.util import json_dumps, json_loads
 
 from . import as1
 from . import source
+from . import transport
 
 logger = logging.getLogger(__name__)
 
@@ -2555,7 +2556,8 @@ class Facebook(source.Source):
       url = API_BASE + url
     if self.access_token:
       url = util.add_query_params(url, [('access_token', self.access_token)])
-    resp = util.urlopen(urllib.request.Request(url, **kwargs))
+    with transport.host_limit(url):
+      resp = util.urlopen(urllib.request.Request(url, **kwargs))
 
     if _as is None:
       return resp
@@ -14,7 +14,6 @@ TODO:
   (it's a geo:... URL string, https://tools.ietf.org/html/rfc5870, in
   USER_DATA_TYPE_LOCATION)
 """
-import copy
 from datetime import datetime, timedelta, timezone
 from itertools import zip_longest
 import logging
@@ -120,6 +119,11 @@ CACHE_TTL = timedelta(hours=6)
 
 logger = logging.getLogger(__name__)
 
+# maps str host:port to grpc.Channel. gRPC channels multiplex concurrent RPCs
+# over one HTTP/2 connection, so Farcaster instances share them.
+channels = {}
+channels_lock = threading.Lock()
+
 
 def to_timestamp(dt):
   """Converts a datetime to a Farcaster timestamp.
@@ -356,7 +360,7 @@ def hash_and_sign(msg, privkey):
   return msg
 
 
-def to_as1(msg, client=None):
+def to_as1(msg, client=None, actors=None):
   """Converts a Farcaster protobuf to an ActivityStreams 1 object or actor.
 
   Ids are farcaster:// URIs: https://github.com/farcasterxyz/protocol/discussions/123
@@ -366,6 +370,9 @@ def to_as1(msg, client=None):
       Farcaster Message protobuf or MessagesResponse (user data messages)
     client (Farcaster): optional; if provided, this will be used to fetch
       mentioned users' usernames. Otherwise, mentions use their numeric FIDs.
+    actors (dict): optional, maps int FID to AS1 actor, eg from
+      :meth:`Farcaster.get_actors`. Used for mentioned users' usernames
+      instead of fetching them with ``client``.
 
   Returns:
     dict: AS1 activity, object, or actor
@@ -446,12 +453,15 @@ def to_as1(msg, client=None):
       text = cast.text.encode()
       content = ''
       last = 0
+      if actors is None:
+        actors = client.get_actors(cast.mentions) if client else {}
       for mention_fid, pos in zip_longest(cast.mentions, cast.mentions_positions):
         if not mention_fid:
           continue
         if pos is None:
           pos = len(text)
-        mention = f'@{client.get_actor(mention_fid).get("username") if client else mention_fid}'
+        username = actors.get(mention_fid, {}).get('username')
+        mention = f'@{username or mention_fid}'
         content += text[last:pos].decode()
         obj['tags'].append({
           'objectType': 'mention',
@@ -574,7 +584,7 @@ def from_as1(obj, username=None):
     message_pb2.Message or list of message_pb2.Message: Farcaster Message
       protobuf, or list of Messages if ``obj`` is an actor
   """
-  obj = copy.deepcopy(obj)
+  obj = as1.copy_object(obj)
 
   type = as1.object_type(obj)
   if type in ('post', 'update'):
@@ -785,9 +795,12 @@ class Farcaster(source.Source):
     assert port
 
     addr = f'{host}:{port}'
-    logger.info(f'Connecting to Farcaster Snapchain node {addr}')
-
-    channel = grpc.secure_channel(addr, grpc.ssl_channel_credentials())
+    with channels_lock:
+      channel = channels.get(addr)
+      if not channel:
+        logger.info(f'Connecting to Farcaster Snapchain node {addr}')
+        channel = channels[addr] = grpc.secure_channel(
+          addr, grpc.ssl_channel_credentials())
 
     if log_requests_responses:
       interceptor = util.GrpcLoggingInterceptor(logger=logger, level=logging.DEBUG)
@@ -821,6 +834,31 @@ class Farcaster(source.Source):
     resp = self.hub.GetUserDataByFid(FidRequest(fid=fid))
     return to_as1(resp)
 
+  def get_actors(self, fids):
+    """Fetches multiple Farcaster users as AS1 actors.
+
+    Issues all of the ``GetUserDataByFid`` RPCs at once, concurrently, one per
+    distinct FID.
+
+    Args:
+      fids (sequence of int): Farcaster user IDs
+
+    Returns:
+      dict: maps int FID to AS1 actor dict. FIDs whose RPCs fail are logged
+      and omitted, so one bad user doesn't lose the rest of the batch.
+    """
+    futures = {fid: self.hub.GetUserDataByFid.future(FidRequest(fid=fid))
+               for fid in dict.fromkeys(fids)}
+
+    actors = {}
+    for fid, future in futures.items():
+      try:
+        actors[fid] = to_as1(future.result())
+      except grpc.RpcError as e:
+        logger.info(f'GetUserDataByFid({fid}) failed: {e}')
+
+    return actors
+
   @cached(TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL.total_seconds()),
           lock=threading.Lock())
   def get_fid(self, username):
@@ -849,12 +887,14 @@ class Farcaster(source.Source):
                               fetch_likes=False, fetch_shares=False,
                               include_shares=True, fetch_events=False,
                               fetch_mentions=False, search_query=None,
-                              start_index=0, count=0, **kwargs):
+                              start_index=0, count=0, min_id=None, **kwargs):
     """Fetches casts and reactions and returns them as AS1 activities.
 
     See :meth:`Source.get_activities_response` for details. ``group_id``,
     ``fetch_replies``, ``fetch_events``, and ``search_query`` are not yet supported.
-    ``user_id`` is a Farcaster FID (integer or string).
+    ``user_id`` is a Farcaster FID (integer or string). ``min_id`` is a Farcaster
+    timestamp (see :func:`to_timestamp`), int or str; messages at or before it
+    are skipped without being converted.
     """
     if user_id and not util.is_int(user_id):
       raise ValueError(f'user_id must be a Farcaster FID (integer), got {user_id!r}')
@@ -865,10 +905,13 @@ class Farcaster(source.Source):
     page_kwargs = {'reverse': True}
     if count:
       page_kwargs['page_size'] = count
+    min_timestamp = int(min_id) if min_id is not None else None
     activities = []
 
     def add_activities(resp):
       for msg in resp.messages:
+        if min_timestamp is not None and msg.data.timestamp <= min_timestamp:
+          continue
         obj = to_as1(msg)
         if obj.get('objectType') != 'activity':
           obj = {
@@ -880,24 +923,32 @@ class Farcaster(source.Source):
         activities.append(self.postprocess_activity(obj))
 
     if fid:
+      # issue all RPCs at once, then wait for them in order
+      futures = []
       if activity_id:
         cast_hash = bytes.fromhex(activity_id.removeprefix('farcaster:cast:'))
-        add_activities(MessagesResponse(
-          messages=[self.hub.GetCast(CastId(fid=fid, hash=cast_hash))]))
+        futures.append(self.hub.GetCast.future(CastId(fid=fid, hash=cast_hash)))
       else:
-        add_activities(self.hub.GetCastsByFid(FidRequest(fid=fid, **page_kwargs)))
+        futures.append(self.hub.GetCastsByFid.future(
+          FidRequest(fid=fid, **page_kwargs)))
 
       if fetch_mentions:
-        add_activities(self.hub.GetCastsByMention(FidRequest(fid=fid, **page_kwargs)))
+        futures.append(self.hub.GetCastsByMention.future(
+          FidRequest(fid=fid, **page_kwargs)))
 
       if fetch_likes:
-        add_activities(self.hub.GetReactionsByFid(ReactionsByFidRequest(
+        futures.append(self.hub.GetReactionsByFid.future(ReactionsByFidRequest(
           fid=fid, reaction_type=REACTION_TYPE_LIKE, **page_kwargs)))
 
       if fetch_shares:
-        add_activities(self.hub.GetReactionsByFid(
-          ReactionsByFidRequest(
-            fid=fid, reaction_type=REACTION_TYPE_RECAST, **page_kwargs)))
+        futures.append(self.hub.GetReactionsByFid.future(ReactionsByFidRequest(
+          fid=fid, reaction_type=REACTION_TYPE_RECAST, **page_kwargs)))
+
+      for future in futures:
+        resp = future.result()
+        if isinstance(resp, Message):  # GetCast
+          resp = MessagesResponse(messages=[resp])
+        add_activities(resp)
 
     return self.make_activities_base_response(
       activities, activity_id=activity_id, start_index=start_index)
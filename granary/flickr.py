@@ -20,9 +20,21 @@ from webutil import util
 
 from . import as1
 from . import source
+from . import transport
 
 logger = logging.getLogger(__name__)
 
+# used for per-host limits in the transport module. flickr_auth makes the
+# actual API calls.
+FLICKR_API_BASE = 'https://api.flickr.com/services/rest'
+
+# for flickr.activity.userPhotos, used by get_activities_response's
+# use_activity_feed kwarg.
+# https://www.flickr.com/services/api/flickr.activity.userPhotos.html
+ACTIVITY_FEED_TIMEFRAME = '30d'
+ACTIVITY_FEED_PAGE_SIZE = 50  # max allowed
+ACTIVITY_FEED_MAX_PAGES = 10
+
 
 class Flickr(source.Source):
   """Flickr source class. See file docstring and Source class for details."""
@@ -58,8 +70,9 @@ class Flickr(source.Source):
   def call_api_method(self, method, params=None):
     """Call a Flickr API method.
     """
-    return flickr_auth.call_api_method(
-      method, params or {}, self.access_token_key, self.access_token_secret)
+    with transport.host_limit(FLICKR_API_BASE):
+      return flickr_auth.call_api_method(
+        method, params or {}, self.access_token_key, self.access_token_secret)
 
   def upload(self, params, file):
     """Upload a photo or video via the Flickr API.
@@ -377,13 +390,23 @@ class Flickr(source.Source):
                               etag=None, min_id=None, cache=None,
                               fetch_replies=False, fetch_likes=False,
                               fetch_shares=False, fetch_events=False,
-                              fetch_mentions=False, search_query=None, **kwargs):
+                              fetch_mentions=False, search_query=None,
+                              use_activity_feed=False, **kwargs):
     """Fetches Flickr photos and converts them to ActivityStreams activities.
 
     See :meth:`Source.get_activities_response` for details.
 
     Mentions are not fetched or included because they don't exist in Flickr.
     https://github.com/snarfed/bridgy/issues/523#issuecomment-155523875
+
+    Args:
+      use_activity_feed (bool): only for ``group_id`` ``@self`` and the
+        current user. If True, and ``fetch_replies`` or ``fetch_likes`` is
+        True, fetches comments and faves for all photos at once from the
+        user's activity feed, ``flickr.activity.userPhotos``, instead of
+        calling ``flickr.photos.comments.getList`` and
+        ``flickr.photos.getFavorites`` for each photo. Only includes comments
+        and faves from the last :const:`ACTIVITY_FEED_TIMEFRAME`.
     """
     if user_id is None:
       user_id = 'me'
@@ -418,13 +441,22 @@ class Flickr(source.Source):
     else:
       photos = photos_resp.get('photos', {}).get('photo', [])
 
+    # maps photo id to list of events from the activity feed
+    events = None
+    if (use_activity_feed and (fetch_replies or fetch_likes) and photos
+        and not activity_id and group_id == source.SELF
+        and (user_id == 'me' or user_id == self.user_id())):
+      events = self._get_activity_feed_events()
+
     for photo in photos:
       activity = self.photo_to_activity(photo)
 
-      # TODO consider using 'flickr.activity.userPhotos' when group_id=@self,
-      # gives all recent comments and faves, instead of hitting the API for
-      # each photo
-      if fetch_replies:
+      if events is not None:
+        self._add_activity_feed_events(
+          activity, events.get(photo.get('id'), []),
+          fetch_replies=fetch_replies, fetch_likes=fetch_likes)
+
+      elif fetch_replies:
         comments_resp = self.call_api_method('flickr.photos.comments.getList', {
           'photo_id': photo.get('id'),
         })
@@ -437,7 +469,7 @@ class Flickr(source.Source):
           'totalItems': len(replies),
         }
 
-      if fetch_likes:
+      if fetch_likes and events is None:
         faves_resp = self.call_api_method('flickr.photos.getFavorites', {
           'photo_id': photo.get('id'),
         })
@@ -449,6 +481,77 @@ class Flickr(source.Source):
 
     return util.trim_nulls(result)
 
+  def _get_activity_feed_events(self):
+    """Fetches recent comments and faves on the current user's photos.
+
+    https://www.flickr.com/services/api/flickr.activity.userPhotos.html
+
+    Returns:
+      dict: maps str photo id to list of dict Flickr activity feed events
+    """
+    events = {}
+    page = pages = 1
+    while page <= min(pages, ACTIVITY_FEED_MAX_PAGES):
+      resp = self.call_api_method('flickr.activity.userPhotos', {
+        'timeframe': ACTIVITY_FEED_TIMEFRAME,
+        'per_page': ACTIVITY_FEED_PAGE_SIZE,
+        'page': page,
+      })
+      items = resp.get('items', {})
+      for item in items.get('item', []):
+        if item.get('type') == 'photo':
+          events.setdefault(item.get('id'), []).extend(
+            item.get('activity', {}).get('event', []))
+      pages = int(items.get('pages') or 1)
+      page += 1
+
+    return events
+
+  def _add_activity_feed_events(self, activity, events, fetch_replies=False,
+                                fetch_likes=False):
+    """Converts activity feed events and adds them to a photo activity.
+
+    Args:
+      activity (dict): ActivityStreams activity for the photo
+      events (list of dict): Flickr activity feed events for the photo
+      fetch_replies (bool): whether to add comments
+      fetch_likes (bool): whether to add faves
+    """
+    photo_id = activity.get('flickr_id')
+    obj = activity['object']
+
+    if fetch_replies:
+      replies = []
+      for event in events:
+        if event.get('type') == 'comment':
+          comment_id = event.get('commentid') or ''
+          replies.append(self.comment_to_as1({
+            'id': comment_id,
+            'author': event.get('user'),
+            'authorname': event.get('username'),
+            'realname': event.get('realname'),
+            'iconserver': event.get('iconserver'),
+            'iconfarm': event.get('iconfarm'),
+            'datecreate': event.get('dateadded'),
+            'permalink': f'{obj.get("url")}#comment{comment_id.split("-")[-1]}',
+            '_content': event.get('_content'),
+          }, photo_id))
+      obj['replies'] = {
+        'items': replies,
+        'totalItems': len(replies),
+      }
+
+    if fetch_likes:
+      for event in events:
+        if event.get('type') == 'fave':
+          obj.setdefault('tags', []).append(self.like_to_as1({
+            'nsid': event.get('user'),
+            'username': event.get('username'),
+            'realname': event.get('realname'),
+            'iconserver': event.get('iconserver'),
+            'iconfarm': event.get('iconfarm'),
+          }, activity))
+
   def get_actor(self, user_id=None):
     """Get an ActivityStreams object of type ``person`` given a user's nsid.
     If no ``user_id`` is provided, this method will make another API request to
@@ -19,6 +19,7 @@ from webutil.util import json_dumps, json_loads
 
 from . import as1
 from . import source
+from . import transport
 
 logger = logging.getLogger(__name__)
 
@@ -247,13 +248,18 @@ class GitHub(source.Source):
   }
   OPTIMIZED_COMMENTS = True
 
-  def __init__(self, access_token=None):
+  def __init__(self, access_token=None, max_concurrency=None):
     """Constructor.
 
     Args:
       access_token (str): optional OAuth access token
+      max_concurrency (int): optional, maximum number of REST API calls to make
+        at once, eg when fetching issues, comments, and reactions for
+        notifications. Overrides :attr:`Source.MAX_CONCURRENCY`.
     """
     self.access_token = access_token
+    if max_concurrency is not None:
+      self.MAX_CONCURRENCY = max_concurrency
 
   def user_url(self, username):
     return self.BASE_URL + username
@@ -283,11 +289,12 @@ class GitHub(source.Source):
     """
     escaped = {k: (email.utils.quote(v) if isinstance(v, str) else v)
                for k, v in kwargs.items()}
-    resp = util.requests_post(
-      GRAPHQL_BASE, json={'query': graphql % escaped},
-      headers={
-        'Authorization': f'bearer {self.access_token}',
-      })
+    with transport.host_limit(GRAPHQL_BASE):
+      resp = util.requests_post(
+        GRAPHQL_BASE, json={'query': graphql % escaped},
+        headers={
+          'Authorization': f'bearer {self.access_token}',
+        })
     resp.raise_for_status()
     result = resp.json()
 
@@ -317,10 +324,11 @@ class GitHub(source.Source):
       'Authorization': f'token {self.access_token}',
     })
 
-    if data is None:
-      resp = util.requests_get(url, **kwargs)
-    else:
-      resp = util.requests_post(url, json=data, **kwargs)
+    with transport.host_limit(url):
+      if data is None:
+        resp = util.requests_get(url, **kwargs)
+      else:
+        resp = util.requests_post(url, json=data, **kwargs)
     resp.raise_for_status()
 
     return resp.json() if parse_json else resp
@@ -386,6 +394,7 @@ class GitHub(source.Source):
       etag = resp.headers.get('Last-Modified')
       notifs = [] if resp.status_code == 304 else resp.json()
 
+      to_fetch = []
       for notif in notifs:
         id = notif.get('id')
         subject_url = notif.get('subject').get('url')
@@ -398,15 +407,22 @@ class GitHub(source.Source):
             'Skipping thread %s with subject %s, only issues and PRs right now',
             id, subject_url)
           continue
+        to_fetch.append(notif)
 
+      def fetch_issue(notif):
         try:
-          issue = self.rest(subject_url)
+          return self.rest(notif['subject']['url'])
         except requests.HTTPError as e:
           if e.response.status_code in HTTP_NON_FATAL_CODES:
             util.interpret_http_exception(e)
-            continue
+            return None
           raise
 
+      for notif, issue in zip(to_fetch,
+                              self._concurrent_map(fetch_issue, to_fetch)):
+        if issue is None:
+          continue
+
         obj = self.issue_to_object(issue)
 
         private = notif.get('repository', {}).get('private')
@@ -419,26 +435,36 @@ class GitHub(source.Source):
         issues.append(issue)
         activities.append(obj)
 
-    # add comments and reactions, if requested
+    # add comments and reactions, if requested. each element is (URL, function
+    # that takes the API response)
     assert len(issues) == len(activities)
+    extras = []
     for issue, obj in zip(issues, activities):
       comments_url = issue.get('comments_url')
       if fetch_replies and comments_url:
         if since:
           comments_url += f'?since={since.isoformat()}' + 'Z'
-        comments = self.rest(comments_url)
-        comment_objs = list(util.trim_nulls(
-          self.comment_to_object(c) for c in comments))
-        obj['replies'] = {
-          'items': comment_objs,
-          'totalItems': len(comment_objs),
-        }
+
+        def add_comments(comments, obj=obj):
+          comment_objs = list(util.trim_nulls(
+            self.comment_to_object(c) for c in comments))
+          obj['replies'] = {
+            'items': comment_objs,
+            'totalItems': len(comment_objs),
+          }
+        extras.append((comments_url, add_comments))
 
       if fetch_likes:
         issue_url = issue['url'].replace('pulls', 'issues')
-        reactions = self.rest(issue_url + '/reactions')
-        obj.setdefault('tags', []).extend(
-          self.reaction_to_object(r, obj) for r in reactions)
+
+        def add_reactions(reactions, obj=obj):
+          obj.setdefault('tags', []).extend(
+            self.reaction_to_object(r, obj) for r in reactions)
+        extras.append((issue_url + '/reactions', add_reactions))
+
+    resps = self._concurrent_map(self.rest, [url for url, _ in extras])
+    for (_, handle), resp in zip(extras, resps):
+      handle(resp)
 
     response = self.make_activities_base_response(util.trim_nulls(activities))
     response['etag'] = etag
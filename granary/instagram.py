@@ -23,6 +23,8 @@ from webutil.util import json_dumps, json_loads
 
 from . import as1
 from . import source
+from . import transport
+from .cache import get_multi, set_multi
 
 logger = logging.getLogger(__name__)
 
@@ -126,9 +128,10 @@ class Instagram(source.Source):
     if self.access_token:
       # TODO add access_token to the data parameter for POST requests
       url = util.add_query_params(url, [('access_token', self.access_token)])
-    resp = util.urlopen(urllib.request.Request(url, **kwargs))
-    return (resp if kwargs.get('data')
-            else source.load_json(resp.read(), url).get('data'))
+    with transport.host_limit(url):
+      resp = util.urlopen(urllib.request.Request(url, **kwargs))
+      return (resp if kwargs.get('data')
+              else source.load_json(resp.read(), url).get('data'))
 
   @classmethod
   def user_url(cls, username):
@@ -353,16 +356,21 @@ class Instagram(source.Source):
         # for convenience, throwaway object just for this method
         cache = {}
 
-      for i, activity in enumerate(activities):
+      # read all cached counts at once
+      ids = [util.parse_tag_uri(activity['id'])[1] for activity in activities]
+      cached = get_multi(cache, [f'{prefix} {id}' for id in ids
+                                 for prefix in ('AIL', 'AIC')])
+      updates = {}
+
+      for i, (activity, id) in enumerate(zip(activities, ids)):
         obj = activity['object']
-        _, id = util.parse_tag_uri(activity['id'])
         likes = obj.get('ig_like_count') or 0
         comments = obj.get('replies', {}).get('totalItems') or 0
         likes_key = f'AIL {id}'
         comments_key = f'AIC {id}'
 
-        if (likes and likes != cache.get(likes_key) or
-            comments and comments != cache.get(comments_key)):
+        if (likes and likes != cached.get(likes_key) or
+            comments and comments != cached.get(comments_key)):
           if not activity_id and not shortcode:
             url = activity['url'].replace(self.BASE_URL, HTML_BASE_URL)
             resp = util.requests_get(url, **get_kwargs)
@@ -373,7 +381,9 @@ class Instagram(source.Source):
             resp.text, cookie=cookie, count=count, fetch_extras=fetch_extras)
           if full_activity:
             activities[i] = full_activity[0]
-            cache.update({likes_key: likes, comments_key: comments})
+            updates.update({likes_key: likes, comments_key: comments})
+
+      set_multi(cache, updates)
 
     resp = self.make_activities_base_response(activities)
     resp['actor'] = actor
@@ -7,16 +7,18 @@ https://docs.joinmastodon.org/api/
 May also be used for services with Mastodon-compatible APIs, eg Pleroma:
 https://docs-develop.pleroma.social/backend/API/differences_in_mastoapi_responses/
 """
+import copy
 import itertools
 import logging
 import re
-from urllib.parse import quote, unquote, urljoin
+from urllib.parse import quote, unquote, urlencode, urljoin
 
 from requests import HTTPError, JSONDecodeError, RequestException
 from webutil import util
 from webutil.util import json_dumps, json_loads
 
-from . import as1, as2, source
+from . import as1, as2, source, transport
+from .cache import get_multi, set_multi
 
 logger = logging.getLogger(__name__)
 
@@ -260,7 +262,8 @@ class Mastodon(source.Source):
   TRUNCATE_URL_LENGTH = 23
 
   def __init__(self, instance, access_token, user_id=None,
-               truncate_text_length=None, **requests_kwargs):
+               truncate_text_length=None, max_concurrency=None,
+               **requests_kwargs):
     """Constructor.
 
     If ``user_id`` is not provided, it will be fetched via the API.
@@ -272,6 +275,9 @@ class Mastodon(source.Source):
       access_token (str): OAuth access token
       truncate_text_length (int): optional character limit for toots, overrides
         the default of 500
+      max_concurrency (int): optional, maximum number of API calls to make at
+        once, eg when fetching replies, likes, and shares or uploading media.
+        Overrides :attr:`Source.MAX_CONCURRENCY`.
       requests_kwargs (dict): passed to :func:`requests.get`/:func:`requests.post`
     """
     assert instance
@@ -282,6 +288,8 @@ class Mastodon(source.Source):
     self.TRUNCATE_TEXT_LENGTH = (
       truncate_text_length if truncate_text_length is not None
       else DEFAULT_TRUNCATE_TEXT_LENGTH)
+    if max_concurrency is not None:
+      self.MAX_CONCURRENCY = max_concurrency
     self.DOMAIN = util.domain_from_link(instance)
 
     if user_id:
@@ -308,7 +316,8 @@ class Mastodon(source.Source):
 
     url = urljoin(self.instance, path)
     kwargs = {**self.requests_kwargs, **kwargs}
-    resp = fn(url, *args, **kwargs)
+    with transport.host_limit(url):
+      resp = fn(url, *args, **kwargs)
     try:
       resp.raise_for_status()
     except BaseException as e:
@@ -321,6 +330,18 @@ class Mastodon(source.Source):
     if fn == util.requests_delete:
       return {}
 
+    return self._json(resp)
+
+  @staticmethod
+  def _json(resp):
+    """Parses and returns an API response's JSON body.
+
+    Args:
+      resp (requests.Response)
+
+    Raises:
+      requests.HTTPError: if the body isn't JSON or is an API error
+    """
     content_type = resp.headers.get('Content-Type', '')
     if content_type.split(';')[0] != 'application/json':
       # Truth Social returns text/plain;charset=UTF-8
@@ -365,10 +386,20 @@ class Mastodon(source.Source):
                               fetch_likes=False, fetch_shares=False,
                               include_shares=True, fetch_events=False,
                               fetch_mentions=False, search_query=None,
-                              start_index=0, count=0, cache=None, **kwargs):
+                              start_index=0, count=0, etag=None, min_id=None,
+                              cache=None, **kwargs):
     """Fetches toots and converts them to ActivityStreams activities.
 
-    See :meth:`Source.get_activities_response` for details.
+    See :meth:`Source.get_activities_response` for details. ``min_id`` is
+    translated to Mastodon's ``since_id``; it's ignored for ``activity_id`` and
+    ``@search``.
+
+    Timeline and account status fetches are conditional requests. Their
+    validators, ``ETag`` or ``Last-Modified``, are returned in ``etag`` and
+    also stored in ``cache``, if provided, along with the resulting activities.
+    If the instance then responds ``304 Not Modified``, this returns the stored
+    activities without reconverting them or fetching their replies, likes, or
+    shares. (Mentions are always fetched.)
     """
     if user_id and group_id in (source.FRIENDS, source.ALL):
       raise ValueError(f"{self.NAME} doesn't support group_id {group_id} with user_id")
@@ -382,10 +413,16 @@ class Mastodon(source.Source):
     if count:
       params['limit'] = count + start_index
 
+    if cache is None:
+      # for convenience, throwaway object just for this method
+      cache = {}
+
+    # set for polling endpoints that support conditional requests
+    conditional_key = None
+    not_modified = False
+
     if activity_id:
       statuses = [self._get(API_STATUS % activity_id)]
-    elif group_id in (None, source.FRIENDS):
-      statuses = self._get(API_TIMELINE, params=params)
     elif group_id == source.SEARCH:
       if not search_query:
         raise ValueError('search requires search_query parameter')
@@ -395,16 +432,45 @@ class Mastodon(source.Source):
         'offset': start_index,
         **params,
       }).get('statuses', [])
-    else:  # eg group_id SELF
-      statuses = self._get(API_ACCOUNT_STATUSES % user_id, params=params)
+    else:
+      path = (API_TIMELINE if group_id in (None, source.FRIENDS)
+              else API_ACCOUNT_STATUSES % user_id)  # eg group_id SELF
+      if min_id is not None:
+        params['since_id'] = min_id
+      # the stored activities depend on these options too, not just the URL
+      options = {
+        'start_index': start_index,
+        'include_shares': include_shares,
+        'fetch_replies': fetch_replies,
+        'fetch_likes': fetch_likes,
+        'fetch_shares': fetch_shares,
+        'fetch_mentions': fetch_mentions,
+      }
+      conditional_key = (f'{self.user_id} {urljoin(self.instance, path)}?'
+                         f'{urlencode(params)} {urlencode(options)}')
+      etag, cached_activities = self._load_conditional(
+        cache, conditional_key, etag=etag)
+      resp = self._get(path, params=params, return_json=False,
+                       headers=source.conditional_headers(etag))
+      if resp.status_code == 304:
+        not_modified = True
+        statuses = []
+      else:
+        statuses = self._json(resp)
+        etag = source.response_validator(resp)
 
     activities = []
 
-    if cache is None:
-      # for convenience, throwaway object just for this method
-      cache = {}
+    # read all cached counts at once
+    cached = get_multi(cache, [f'{prefix} {status["id"]}'
+                               for status in statuses[start_index:]
+                               if status.get('id')
+                               for prefix in ('AMRE', 'AMF', 'AMRB')])
+
+    # extra API calls to make for replies, likes, and shares. each element is
+    # (cache key, count, API path, function that takes the API response)
+    extras = []
 
-    # fetch extras if necessary
     for status in statuses[start_index:]:
       if not include_shares and status.get('reblog'):
         continue
@@ -417,26 +483,43 @@ class Mastodon(source.Source):
 
       obj = activity['object']
       count = status.get('replies_count')
-      if fetch_replies and count and count != cache.get('AMRE ' + id):
-        context = self._get(API_CONTEXT % id)
-        obj['replies'] = {
-          'items': [self.status_to_as1_activity(reply)
-                    for reply in context.get('descendants', [])]
-        }
-        cache['AMRE ' + id] = count
+      if fetch_replies and count and count != cached.get('AMRE ' + id):
+        def add_replies(context, obj=obj):
+          obj['replies'] = {
+            'items': [self.status_to_as1_activity(reply)
+                      for reply in context.get('descendants', [])]
+          }
+        extras.append(('AMRE ' + id, count, API_CONTEXT % id, add_replies))
 
       tags = obj.setdefault('tags', [])
       count = status.get('favourites_count')
-      if fetch_likes and count and count != cache.get('AMF ' + id):
-        likers = self._get(API_FAVORITED_BY % id)
-        tags.extend(self._make_like(status, l) for l in likers)
-        cache['AMF ' + id] = count
+      if fetch_likes and count and count != cached.get('AMF ' + id):
+        def add_likes(likers, status=status, tags=tags):
+          tags.extend(self._make_like(status, l) for l in likers)
+        extras.append(('AMF ' + id, count, API_FAVORITED_BY % id, add_likes))
 
       count = status.get('reblogs_count')
-      if fetch_shares and count and count != cache.get('AMRB ' + id):
-        sharers = self._get(API_REBLOGGED_BY % id)
-        tags.extend(self._make_share(status, s) for s in sharers)
-        cache['AMRB ' + id] = count
+      if fetch_shares and count and count != cached.get('AMRB ' + id):
+        def add_shares(sharers, status=status, tags=tags):
+          tags.extend(self._make_share(status, s) for s in sharers)
+        extras.append(('AMRB ' + id, count, API_REBLOGGED_BY % id, add_shares))
+
+    # fetch extras, concurrently if MAX_CONCURRENCY allows
+    resps = self._concurrent_map(self._get, [path for _, _, path, _ in extras])
+    updates = {}
+    for (key, count, _, handle), resp in zip(extras, resps):
+      handle(resp)
+      updates[key] = count
+
+    if not_modified:
+      activities = cached_activities or []
+    elif conditional_key and etag:
+      updates[source.CONDITIONAL_CACHE_PREFIX + conditional_key] = {
+        'etag': etag,
+        'activities': copy.deepcopy(activities),
+      }
+
+    set_multi(cache, updates)
 
     if fetch_mentions:
       # https://docs.joinmastodon.org/methods/notifications/
@@ -449,6 +532,8 @@ class Mastodon(source.Source):
                         if n.get('status') and n.get('type') == 'mention')
 
     resp = self.make_activities_base_response(util.trim_nulls(activities))
+    if conditional_key:
+      resp['etag'] = etag
     return resp
 
   def get_actor(self, user_id=None):
@@ -1019,30 +1104,41 @@ class Mastodon(source.Source):
     Returns:
       list of str: media ids for uploaded files
     """
-    uploaded = set()  # URLs uploaded so far; for de-duping
-    ids = []
-
+    # de-dupe by URL
+    to_upload = {}
     for obj in media:
       url = util.get_url(obj, key='stream') or util.get_url(obj)
-      if not url or url in uploaded:
-        continue
+      if url and url not in to_upload:
+        to_upload[url] = obj
 
-      data = {}
-      alt = obj.get('displayName')
-      if alt:
-        data['description'] = util.ellipsize(alt, chars=MAX_ALT_LENGTH)
+    # upload concurrently if MAX_CONCURRENCY allows. media ids can only be
+    # attached to one status, so unlike Bluesky blobs, they're never reused.
+    return list(self._concurrent_map(self._upload_one_media,
+                                     list(to_upload.items())))
 
-      # TODO: mime type check?
-      with util.requests_get(url, stream=True) as fetch:
-        fetch.raise_for_status()
-        upload = self._post(API_MEDIA, files={'file': fetch.raw}, data=data)
+  def _upload_one_media(self, url_and_obj):
+    """Downloads a file from a web URL and uploads it to :const:`API_MEDIA`.
 
-      logger.info(f'Got: {upload}')
-      media_id = upload['id']
-      ids.append(media_id)
-      uploaded.add(url)
+    Args:
+      url_and_obj (tuple): (str URL, dict AS image or stream object)
 
-    return ids
+    Returns:
+      str: media id
+    """
+    url, obj = url_and_obj
+
+    data = {}
+    alt = obj.get('displayName')
+    if alt:
+      data['description'] = util.ellipsize(alt, chars=MAX_ALT_LENGTH)
+
+    # TODO: mime type check?
+    with transport.host_limit(url), util.requests_get(url, stream=True) as fetch:
+      fetch.raise_for_status()
+      upload = self._post(API_MEDIA, files={'file': fetch.raw}, data=data)
+
+    logger.info(f'Got: {upload}')
+    return upload['id']
 
   def delete(self, id):
     """Deletes a toot. The authenticated user must have authored it.
@@ -494,8 +494,8 @@ def to_as1(mf2, actor=None, fetch_mf2=False, rel_urls=None):
     # *is* a photo. so, special case photo type to fall through to underlying
     # mf2 type without photo.
     # https://github.com/snarfed/bridgy/issues/702
-    without_photo = copy.deepcopy(mf2)
-    without_photo.get('properties', {}).pop('photo', None)
+    without_photo = {**mf2, 'properties': {
+      k: v for k, v in mf2.get('properties', {}).items() if k != 'photo'}}
     mf2_type = mf2util.post_type_discovery(without_photo)
 
   as_type, as_verb = MF2_TO_AS_TYPE_VERB.get(mf2_type, (None, None))
@@ -823,7 +823,7 @@ def json_to_html(obj, parent_props=None):
   if 'h-card' in types:
     return hcard_to_html(obj, parent_props)
 
-  props = copy.deepcopy(obj.get('properties', {}))
+  props = as1.copy_object(obj.get('properties', {}))
 
   links = []
   for prop in 'in-reply-to', 'tag-of':
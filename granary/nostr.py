@@ -38,8 +38,9 @@ TODO:
 * 46: "Nostr Connect," signing proxy that holds user's keys
 * 73: external content ids
 """
-import copy
+import concurrent.futures
 from datetime import datetime, timezone
+from functools import lru_cache
 from hashlib import sha256
 import itertools
 import logging
@@ -47,11 +48,13 @@ import urllib.parse
 import mimetypes
 import re
 import secrets
+import threading
 
 import bech32
 from bs4 import BeautifulSoup
 import secp256k1
 from websockets.exceptions import ConnectionClosedOK
+from websockets.protocol import State
 from webutil import util
 from webutil.util import (
   HTTP_TIMEOUT,
@@ -121,6 +124,13 @@ PLATFORMS = {
   'mastodon': 'https://',
 }
 
+# number of parsed secp256k1 public keys to cache for verifying signatures
+PUBKEY_CACHE_SIZE = 5000
+
+# batches smaller than this are always verified in the current process, since
+# process pool overhead would outweigh the parallelism
+MIN_PROCESS_POOL_BATCH = 100
+
 def id_for(event):
   """Generates an id for a Nostr event.
 
@@ -373,30 +383,143 @@ def verify(event):
     ValueError: if the signature is invalid, or if the ``id`` or ``sig`` or
       ``pubkey`` fields are missing, or if ``id`` is not the event's correct hash
   """
+  _verify_sig(*_verify_id(event))
+
+
+def verify_many(events, processes=None):
+  """Verifies a batch of Nostr events' signatures, eg a relay's query results.
+
+  Computes each event's id once, and checks each distinct signature only once,
+  eg if multiple relays returned the same event. Invalid events are logged and
+  omitted.
+
+  Args:
+    events (sequence of dict)
+    processes (int): optional. If set, and the batch has at least
+      :const:`MIN_PROCESS_POOL_BATCH` events, verifies them in a pool of this
+      many processes.
+
+  Returns:
+    list of dict: the valid events, in the same order as ``events``
+  """
+  events = list(events)
+
+  if processes and len(events) >= MIN_PROCESS_POOL_BATCH:
+    chunk_size = -(-len(events) // (processes * 4))  # ceil
+    chunks = [events[i:i + chunk_size] for i in range(0, len(events), chunk_size)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as pool:
+      errors = [err for chunk in pool.map(_verify_chunk, chunks) for err in chunk]
+  else:
+    errors = _verify_chunk(events)
+
+  valid = []
+  for event, error in zip(events, errors):
+    if error:
+      logger.warning(f'Invalid event {event.get("id")}: {error}')
+    else:
+      valid.append(event)
+
+  return valid
+
+
+def _verify_chunk(events):
+  """Verifies a list of events. Module-level so that process pools can pickle it.
+
+  Returns:
+    list of str: error message for each event, or None if it's valid
+  """
+  sig_errors = {}  # maps (id, pubkey, sig) to error message or None
+  errors = []
+
+  for event in events:
+    try:
+      key = _verify_id(event)
+    except ValueError as e:
+      errors.append(str(e))
+      continue
+
+    if key not in sig_errors:
+      try:
+        _verify_sig(*key)
+        sig_errors[key] = None
+      except ValueError as e:
+        sig_errors[key] = str(e)
+
+    errors.append(sig_errors[key])
+
+  return errors
+
+
+def _verify_id(event):
+  """Checks that an event has the required fields and that its id is correct.
+
+  Args:
+    event (dict)
+
+  Returns:
+    (str id, str pubkey, str sig) tuple
+
+  Raises:
+    ValueError
+  """
   if (not (sig := event.get('sig'))
       or not (id := event.get('id'))
       or not (pubkey := event.get('pubkey'))):
     raise ValueError(f'Missing id or sig or pubkey: {event}')
+  elif not all(isinstance(val, str) for val in (id, pubkey, sig)):
+    raise ValueError(f'id, sig, and pubkey must be strings: {event}')
 
-  if id != id_for(event):
-    raise ValueError(f'id mismatch: expected {id_for(event)}, got {id}')
+  try:
+    expected = id_for(event)
+  except (AttributeError, TypeError) as e:
+    raise ValueError(f"Couldn't compute id: {e}") from e
+  if id != expected:
+    raise ValueError(f'id mismatch: expected {expected}, got {id}')
 
-  # secp256k1-py generates and expects 33-byte public keys, not 32. the difference
-  # seems to be a prefix byte that's always either 0x02 or 0x03. not sure why, but it
-  # doesn't seem to matter, we can just arbitrarily tack 0x02 onto a 32-byte key and
-  # it still generates and verifies signatures fine.
-  # https://github.com/snarfed/bridgy-fed/issues/446#issuecomment-2925960330
   if len(pubkey) != 64:
     raise ValueError(f'pubkey must be 64 hex chars, got {len(pubkey)}: {pubkey}')
 
+  return id, pubkey, sig
+
+
+def _verify_sig(id, pubkey, sig):
+  """Verifies a Schnorr signature of an event id.
+
+  Args:
+    id (str): hex event id
+    pubkey (str): 64-character hex public key
+    sig (str): hex signature
+
+  Raises:
+    ValueError
+  """
   try:
-    key = secp256k1.PublicKey(bytes.fromhex('02' + pubkey), raw=True)
-    if not key.schnorr_verify(bytes.fromhex(id), bytes.fromhex(sig), None, raw=True):
+    if not _public_key(pubkey).schnorr_verify(bytes.fromhex(id), bytes.fromhex(sig),
+                                              None, raw=True):
       raise ValueError(f'Signature verification failed for event {id}')
   except (TypeError, ValueError) as e:
     raise ValueError(f'Signature verification failed: {e}') from e
 
 
+@lru_cache(maxsize=PUBKEY_CACHE_SIZE)
+def _public_key(pubkey):
+  """Parses a 64-character hex public key. Cached.
+
+  secp256k1-py generates and expects 33-byte public keys, not 32. the difference
+  seems to be a prefix byte that's always either 0x02 or 0x03. not sure why, but it
+  doesn't seem to matter, we can just arbitrarily tack 0x02 onto a 32-byte key and
+  it still generates and verifies signatures fine.
+  https://github.com/snarfed/bridgy-fed/issues/446#issuecomment-2925960330
+
+  Args:
+    pubkey (str)
+
+  Returns:
+    secp256k1.PublicKey:
+  """
+  return secp256k1.PublicKey(bytes.fromhex('02' + pubkey), raw=True)
+
+
 def pubkey_from_privkey(privkey):
   """Returns the hex-encoded public key for a hex-encoded private key.
 
@@ -438,8 +561,13 @@ def from_as1(obj, privkey=None, remote_relay='', proxy_tag=None, multiple=False)
     dict: Nostr event
 
   """
-  obj = copy.deepcopy(obj)
   type = as1.object_type(obj)
+  if type in ('post', 'update'):
+    return from_as1(as1.get_object(obj), privkey=privkey,
+                    remote_relay=remote_relay, proxy_tag=proxy_tag)
+
+  # we only modify content and tags, below
+  obj = as1.copy_object(obj, fields=('tags',))
   id = obj.get('id')
   inner_obj = as1.get_object(obj)
   inner_hex_id = uri_to_id(inner_obj.get('id'))
@@ -505,10 +633,6 @@ def from_as1(obj, privkey=None, remote_relay='', proxy_tag=None, multiple=False)
             event['tags'].append(
               ['i', f'{platform}:{url.removeprefix(base_url)}', '-'])
 
-  elif type in ('post', 'update'):
-    return from_as1(inner_obj, privkey=privkey, remote_relay=remote_relay,
-                    proxy_tag=proxy_tag)
-
   elif type in ('article', 'comment', 'note'):
     if type == 'article':
       event['kind'] = KIND_ARTICLE
@@ -913,29 +1037,328 @@ def to_as1(event, id_format='hex', nostr_uri_ids=True):
   return Source.postprocess_object(obj)
 
 
+class Relay:
+  """A long-lived websocket connection to a Nostr relay. Thread safe.
+
+  Connects lazily, on first use. Multiplexes concurrent ``REQ`` subscriptions
+  and ``EVENT`` publishes over the one connection. There's no background reader
+  thread; instead, whichever caller is waiting for a message reads the next one
+  and routes it to the subscription or event id it's for. Answers each NIP-42
+  ``AUTH`` challenge once per connection.
+
+  Attributes:
+    url (str): relay websocket URL
+    closed (bool): whether the connection has closed or failed. Closed
+      relays aren't reused.
+  """
+  def __init__(self, url, privkey=None, websocket=None):
+    """Constructor.
+
+    Args:
+      url (str)
+      privkey (str): optional bech32-encoded private key, used to answer
+        ``AUTH`` challenges
+      websocket (websockets.sync.client.ClientConnection): optional, already
+        open connection to use. The caller is responsible for closing it.
+    """
+    self.url = url
+    self.privkey = privkey
+    self.hex_pubkey = pubkey_from_privkey(uri_to_id(privkey)) if privkey else None
+    self.websocket = websocket
+    self.closed = False
+
+    self._cm = None
+    self._connect_lock = threading.Lock()
+    # guards _reading, _inboxes, and closed
+    self._cond = threading.Condition()
+    self._reading = False
+    # maps subscription id or event id to list of messages for it that another
+    # caller read
+    self._inboxes = {}
+    self._challenges = set()
+
+  def _connect(self):
+    with self._connect_lock:
+      if self.websocket is None:
+        logger.debug(f'connecting to {self.url}')
+        self._cm = websocket_connect(self.url,
+                                     open_timeout=HTTP_TIMEOUT,
+                                     close_timeout=HTTP_TIMEOUT)
+        self.websocket = self._cm.__enter__()
+      return self.websocket
+
+  def close(self):
+    """Closes the connection, if this relay opened it."""
+    with self._cond:
+      self.closed = True
+      self._cond.notify_all()
+
+    with self._connect_lock:
+      if self._cm:
+        try:
+          self._cm.__exit__(None, None, None)
+        except BaseException as e:
+          logger.info(f'closing {self.url}: {e}')
+        self._cm = None
+
+  @property
+  def open(self):
+    """Whether this relay is usable, ie it hasn't closed or failed.
+
+    Also checks the websocket's own state, if it's connected, since the relay
+    may have dropped an idle connection without us noticing.
+    """
+    if self.closed:
+      return False
+    elif self.websocket is None:
+      return True
+
+    state = getattr(self.websocket, 'state', None)
+    if state is None:
+      state = getattr(getattr(self.websocket, 'protocol', None), 'state', None)
+    return state is None or state == State.OPEN
+
+  def _send(self, msg):
+    try:
+      websocket = self._connect()
+      logger.debug(f'{websocket.remote_address} <= {msg}')
+      websocket.send(json_dumps(msg))
+    except BaseException:
+      self.close()
+      raise
+
+  def _recv(self, key):
+    """Returns the next message for a subscription or event id.
+
+    Reads from the websocket if no other caller is, routing messages for other
+    keys to their inboxes, and answers ``AUTH`` challenges along the way.
+
+    Args:
+      key (str): subscription id or event id
+
+    Returns:
+      list: decoded message
+
+    Raises:
+      websockets.exceptions.ConnectionClosed: if the connection closes
+    """
+    while True:
+      with self._cond:
+        while True:
+          inbox = self._inboxes.get(key)
+          if inbox:
+            return inbox.pop(0)
+          elif self.closed:
+            raise ConnectionClosedOK(None, None)
+          elif not self._reading:
+            self._reading = True
+            break
+          self._cond.wait(HTTP_TIMEOUT)
+
+      try:
+        websocket = self._connect()
+        msg = websocket.recv(timeout=HTTP_TIMEOUT)
+      except BaseException:
+        self.close()
+        raise
+      finally:
+        with self._cond:
+          self._reading = False
+          self._cond.notify_all()
+
+      logger.debug(f'{websocket.remote_address} => {msg}')
+      resp = json_loads(msg)
+
+      if resp[0] == 'AUTH' and len(resp) >= 2:
+        self._auth(resp[1])
+        continue
+
+      target = resp[1] if len(resp) >= 2 else None
+      if target == key:
+        return resp
+
+      with self._cond:
+        if target in self._inboxes:
+          self._inboxes[target].append(resp)
+          self._cond.notify_all()
+        else:
+          logger.debug(f'No subscription for {resp}, dropping')
+
+  def _auth(self, challenge):
+    """Answers a NIP-42 ``AUTH`` challenge, if we haven't already."""
+    if not self.privkey:
+      logger.info(f'No private key, ignoring AUTH {challenge} from relay')
+      return
+    elif challenge in self._challenges:
+      return
+
+    self._challenges.add(challenge)
+    self._send(['AUTH', id_and_sign({
+      'kind': KIND_AUTH,
+      'pubkey': self.hex_pubkey,
+      'content': '',
+      'tags': [
+        ['relay', f'wss://{self._connect().remote_address[0]}/'],
+        ['challenge', challenge],
+      ],
+    }, self.privkey)])
+
+  def query(self, filter):
+    """Runs a Nostr ``REQ`` query.
+
+    Sends the query, collects the responses, and closes the ``REQ`` subscription.
+    If ``limit`` is not set on the filter, it defaults to 20.
+
+    Args:
+      filter (dict):  NIP-01 ``REQ`` filter
+
+    Returns:
+      list of dict: Nostr events
+    """
+    limit = filter.setdefault('limit', 20)
+
+    subscription = secrets.token_urlsafe(16)
+    with self._cond:
+      self._inboxes[subscription] = []
+
+    events = []  # verified
+    unverified = []
+    try:
+      try:
+        self._send(['REQ', subscription, filter])
+      except ConnectionClosedOK as err:
+        logger.warning(err)
+        return []
+
+      while True:
+        resp = self._recv(subscription)
+        if resp[:3] == ['OK', subscription, False]:
+          break
+        elif resp[:2] == ['EVENT', subscription]:
+          unverified.append(resp[2])
+          continue
+
+        # only valid events count toward the limit, so verify the ones we
+        # have so far before checking it
+        if unverified and len(events) + len(unverified) >= limit:
+          events.extend(verify_many(unverified))
+          unverified = []
+
+        if (len(events) >= limit or resp[:2] == ['EOSE', subscription]
+            or resp[:2] == ['CLOSED', subscription]):
+          break
+
+      self._send(['CLOSE', subscription])
+
+    except ConnectionClosedOK as err:
+      logger.warning(err)
+
+    finally:
+      with self._cond:
+        self._inboxes.pop(subscription, None)
+
+    return events + verify_many(unverified)
+
+  def publish(self, event):
+    """Sends an event to the relay and waits for its ``OK``.
+
+    Args:
+      event (dict): signed Nostr event
+
+    Returns:
+      list: the relay's ``OK`` message, or None if the connection closed first
+    """
+    id = event['id']
+    with self._cond:
+      self._inboxes[id] = []
+
+    try:
+      self._send(['EVENT', event])
+      while True:
+        resp = self._recv(id)
+        if resp[0] == 'OK':
+          return resp
+    except ConnectionClosedOK as cc:
+      logger.warning(cc)
+    finally:
+      with self._cond:
+        self._inboxes.pop(id, None)
+
+
+class RelayPool:
+  """Long-lived :class:`Relay` connections, shared across callers. Thread safe.
+
+  Keeps one connection per relay URL and private key, since relays
+  authenticate connections with NIP-42, not individual requests. Replaces
+  connections that have closed, including ones that the relay dropped.
+  """
+  def __init__(self):
+    # maps (str URL, str privkey) to Relay
+    self._relays = {}
+    self._lock = threading.Lock()
+
+  def get(self, url, privkey=None):
+    """Returns the open :class:`Relay` for a URL and private key.
+
+    Args:
+      url (str)
+      privkey (str): optional bech32-encoded private key
+
+    Returns:
+      Relay:
+    """
+    with self._lock:
+      relay = self._relays.get((url, privkey))
+      if relay is None or not relay.open:
+        if relay:
+          relay.close()
+        relay = self._relays[(url, privkey)] = Relay(url, privkey=privkey)
+      return relay
+
+  def close_all(self):
+    """Closes and forgets all connections."""
+    with self._lock:
+      relays = list(self._relays.values())
+      self._relays.clear()
+
+    for relay in relays:
+      relay.close()
+
+
+# default pool for Nostr instances
+relay_pool = RelayPool()
+
+
 class Nostr(Source):
   """Nostr source class. See file docstring and :class:`Source` for details.
 
+  Queries all relays in parallel and merges their results. Creates events on
+  the first relay.
+
   Attributes:
     relays (sequence of str): relay hostnames
+    pool (RelayPool): connections to relays
   """
   DOMAIN = None
   BASE_URL = None
   NAME = 'Nostr'
 
-  def __init__(self, relays=(), privkey=None):
+  def __init__(self, relays=(), privkey=None, pool=None):
     """Constructor.
 
     Args:
       relays (sequence of str)
       privkey (str): optional bech32-encoded private key of the current user.
         Required by :meth:`create` in order to sign events.
+      pool (RelayPool): optional, defaults to the shared :data:`relay_pool`
     """
     for relay in relays:
       parsed = urllib.parse.urlparse(relay)
       if not parsed.hostname or parsed.username is not None:
         raise ValueError(f'Invalid relay URL: {relay}')
     self.relays = relays
+    self.pool = pool or relay_pool
+    self.MAX_CONCURRENCY = max(len(relays), 1)
 
     if privkey:
       assert is_bech32(privkey), privkey
@@ -972,30 +1395,28 @@ class Nostr(Source):
 
     id = uri_to_id(user_id)
 
-    # query for activities
-    logger.debug(f'connecting to {self.relays[0]}')
-    with websocket_connect(self.relays[0],
-                           open_timeout=HTTP_TIMEOUT,
-                           close_timeout=HTTP_TIMEOUT,
-                           ) as websocket:
-      events = self.query(websocket, {
-        'authors': [id],
-        'kinds': [KIND_PROFILE],
-      })
+    events = self._query_relays({
+      'authors': [id],
+      'kinds': [KIND_PROFILE],
+    })
 
     if events:
-      # will we ever get multiple here? if so, assume the last is the most recent?
-      return to_as1(events[-1])
+      # relays may have different versions. use the most recent. (sort is
+      # stable, so if they're tied, this uses the last one.)
+      return to_as1(sorted(events, key=lambda e: e.get('created_at') or 0)[-1])
 
   def get_activities_response(self, user_id=None, group_id=None, app_id=None,
                               activity_id=None, fetch_replies=False,
                               fetch_likes=False, fetch_shares=False,
                               include_shares=True, fetch_events=False,
                               fetch_mentions=False, search_query=None,
-                              start_index=None, count=None, cache=None, **kwargs):
+                              start_index=None, count=None, min_id=None,
+                              cache=None, **kwargs):
     """Fetches events and converts them to AS1 activities.
 
     See :meth:`Source.get_activities_response` for more information.
+    ``min_id`` is a Unix timestamp, int or str. Only events created after it
+    are fetched.
     """
     assert not start_index
     assert not cache
@@ -1020,109 +1441,81 @@ class Nostr(Source):
     if search_query:
       filter['search'] = search_query
 
-    events = []
+    if min_id is not None:
+      # NIP-01 since is inclusive
+      filter['since'] = int(min_id) + 1
 
     # query for activities
-    logger.debug(f'connecting to {self.relays[0]}')
-    with websocket_connect(self.relays[0],
-                           open_timeout=HTTP_TIMEOUT,
-                           close_timeout=HTTP_TIMEOUT,
-                           ) as websocket:
-      events = self.query(websocket, filter)
-      event_ids = [e['id'] for e in events]
-      # maps raw Nostr id to activity
-      activities = {uri_to_id(a['id']): a
-                    for a in [to_as1(e) for e in events]}
-      assert len(activities) == len(events)
-
-      # query for replies/shares
-      if event_ids and (fetch_replies or fetch_shares):
-        for event in self.query(websocket, {'#e': event_ids}):
-          obj = to_as1(event)
-          if in_reply_to := obj.get('inReplyTo'):
-            activity = activities.get(uri_to_id(in_reply_to))
-            if activity:
-              replies = activity.setdefault('replies', {
-                'items': [],
-                'totalItems': 0,
-              })
-              replies['items'].append(obj)
-              replies['totalItems'] += 1
-          elif obj.get('verb') == 'share':
-            activity = activities.get(uri_to_id(as1.get_object(obj).get('id')))
-            if activity:
-              activity.setdefault('tags', []).append(obj)
+    events = self._query_relays(filter)
+    event_ids = [e['id'] for e in events]
+    # maps raw Nostr id to activity
+    activities = {uri_to_id(a['id']): a
+                  for a in [to_as1(e) for e in events]}
+    assert len(activities) == len(events)
+
+    # query for replies/shares
+    if event_ids and (fetch_replies or fetch_shares):
+      for event in self._query_relays({'#e': event_ids}):
+        obj = to_as1(event)
+        if in_reply_to := obj.get('inReplyTo'):
+          activity = activities.get(uri_to_id(in_reply_to))
+          if activity:
+            replies = activity.setdefault('replies', {
+              'items': [],
+              'totalItems': 0,
+            })
+            replies['items'].append(obj)
+            replies['totalItems'] += 1
+        elif obj.get('verb') == 'share':
+          activity = activities.get(uri_to_id(as1.get_object(obj).get('id')))
+          if activity:
+            activity.setdefault('tags', []).append(obj)
 
     return self.make_activities_base_response(util.trim_nulls(activities.values()))
 
-  def query(self, websocket, filter):
-    """Runs a Nostr ``REQ`` query on an open websocket.
+  def _query_relays(self, filter):
+    """Runs a Nostr ``REQ`` query on all relays in parallel.
 
-    Sends the query, collects the responses, and closes the ``REQ`` subscription.
-    If ``limit`` is not set on the filter, it defaults to 20.
+    If there are multiple relays and some fail, logs the failures and returns
+    the results from the others.
 
     Args:
-      websocket (websockets.sync.client.ClientConnection)
       filter (dict):  NIP-01 ``REQ`` filter
-      limit (int)
 
     Returns:
-      list of dict: Nostr events
+      list of dict: Nostr events, deduplicated by id
     """
-    limit = filter.setdefault('limit', 20)
+    def query(url):
+      try:
+        return self.pool.get(url, privkey=self.privkey).query(dict(filter))
+      except Exception as e:
+        if len(self.relays) == 1:
+          raise
+        logger.warning(f'Querying {url} failed: {e}')
+        return []
 
-    subscription = secrets.token_urlsafe(16)
-    req = ['REQ', subscription, filter]
+    events = {}
+    for relay_events in self._concurrent_map(query, self.relays):
+      for event in relay_events:
+        events.setdefault(event['id'], event)
 
-    try:
-      logger.debug(f'{websocket.remote_address} <= {req}')
-      websocket.send(json_dumps(req))
-    except ConnectionClosedOK as err:
-      logger.warning(err)
-      return []
+    return list(events.values())
 
-    events = []
-    try:
-      while True:
-        msg = websocket.recv(timeout=HTTP_TIMEOUT)
-        logger.debug(f'{websocket.remote_address} => {msg}')
-
-        resp = json_loads(msg)
-        if resp[:3] == ['OK', subscription, False]:
-          break
-        elif resp[:2] == ['EVENT', subscription]:
-          event = resp[2]
-          try:
-            verify(event)
-            events.append(event)
-          except ValueError:
-            logger.warning(f'Invalid signature for event {event.get("id")}')
-        elif resp[0] == 'AUTH' and len(resp) >= 2:
-          if not self.privkey:
-            logger.info(f'No private key, ignoring `{resp}` from relay')
-            continue
-          auth = ['AUTH', id_and_sign({
-            'kind': KIND_AUTH,
-            'pubkey': self.hex_pubkey,
-            'content': '',
-            'tags': [
-              ['relay', f'wss://{websocket.remote_address[0]}/'],
-              ['challenge', resp[1]],
-            ],
-          }, self.privkey)]
-          logger.debug(f'{websocket.remote_address} <= {auth}')
-          websocket.send(json_dumps(auth))
-        elif len(events) >= limit or resp[:2] == ['EOSE', subscription]:
-          break
+  def query(self, websocket, filter):
+    """Runs a Nostr ``REQ`` query on an open websocket.
 
-      close = ['CLOSE', subscription]
-      logger.debug(f'{websocket.remote_address} <= {close}')
-      websocket.send(json_dumps(close))
+    Sends the query, collects the responses, and closes the ``REQ`` subscription.
+    If ``limit`` is not set on the filter, it defaults to 20. See
+    :meth:`Relay.query`.
 
-    except ConnectionClosedOK as err:
-      logger.warning(err)
+    Args:
+      websocket (websockets.sync.client.ClientConnection)
+      filter (dict):  NIP-01 ``REQ`` filter
 
-    return events
+    Returns:
+      list of dict: Nostr events
+    """
+    return Relay(None, privkey=self.privkey, websocket=websocket).query(filter)
 
   def create(self, obj, include_link=OMIT_LINK, ignore_formatting=False):
     """Creates a new object: a post, comment, like, repost, etc.
@@ -1151,22 +1544,10 @@ class Nostr(Source):
                - event.keys())
     assert not missing, f'missing {missing}'
 
-    logger.debug(f'connecting to {self.relays[0]}')
-    with websocket_connect(self.relays[0],
-                           open_timeout=HTTP_TIMEOUT,
-                           close_timeout=HTTP_TIMEOUT,
-                           ) as websocket:
-      create = ['EVENT', event]
-      logger.debug(f'{websocket.remote_address} <= {create}')
-      try:
-        websocket.send(json_dumps(create))
-        msg = websocket.recv(timeout=HTTP_TIMEOUT)
-      except ConnectionClosedOK as cc:
-        logger.warning(cc)
-        return
+    resp = self.pool.get(self.relays[0], privkey=self.privkey).publish(event)
+    if resp is None:
+      return
 
-    resp = json_loads(msg)
-    logger.debug(f'{websocket.remote_address} => {resp}')
     if resp[:3] == ['OK', event['id'], True]:
       return creation_result(event)
 
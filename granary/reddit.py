@@ -11,7 +11,9 @@ Reddit API docs:
 PRAW API docs:
 https://praw.readthedocs.io/
 """
+from contextlib import contextmanager
 import logging
+import queue
 import threading
 import urllib.parse
 
@@ -22,6 +24,7 @@ from prawcore.exceptions import NotFound
 from webutil import util
 
 from . import source
+from .cache import get_multi, set_multi
 
 logger = logging.getLogger(__name__)
 
@@ -38,15 +41,62 @@ class Reddit(source.Source):
   NAME = 'Reddit'
   OPTIMIZED_COMMENTS = True
 
-  def __init__(self, refresh_token):
-    self.api = praw.Reddit(
+  def __init__(self, refresh_token, max_concurrency=None,
+               replace_more_limit=None):
+    """Constructor.
+
+    Args:
+      refresh_token (str)
+      max_concurrency (int): optional, maximum number of comment trees to
+        fetch at once in :meth:`get_activities_response`. Overrides
+        :attr:`Source.MAX_CONCURRENCY`.
+      replace_more_limit (int): optional, maximum number of ``MoreComments``
+        to expand in each comment tree, each of which may take an extra API
+        call. Defaults to PRAW's default, 32. ``0`` expands none.
+    """
+    if max_concurrency is not None:
+      self.MAX_CONCURRENCY = max_concurrency
+    self.replace_more_limit = replace_more_limit
+
+    self.refresh_token = refresh_token
+    self.api = self._make_api()
+    # idle praw.Reddit instances for concurrent comment tree fetches, reused
+    # across calls so that each one only exchanges the refresh token once
+    self._api_pool = queue.SimpleQueue()
+
+  def _make_api(self):
+    """Returns a new read only :class:`praw.Reddit` for this user."""
+    api = praw.Reddit(
       client_id=reddit.REDDIT_APP_KEY,
       client_secret=reddit.REDDIT_APP_SECRET,
-      refresh_token=refresh_token,
+      refresh_token=self.refresh_token,
       user_agent=util.user_agent,
       # https://praw.readthedocs.io/en/stable/getting_started/configuration/options.html#basic-configuration-options
       check_for_updates=False)
-    self.api.read_only = True
+    api.read_only = True
+    return api
+
+  @contextmanager
+  def _pooled_api(self):
+    """Context manager that checks out a :class:`praw.Reddit` from the pool.
+
+    PRAW isn't thread safe, so threads that make API calls concurrently can't
+    share :attr:`api`. Instead, each one checks out an idle instance, or makes
+    a new one if none are idle, and returns it to the pool when it's done. The
+    pool grows to at most :attr:`MAX_CONCURRENCY` instances.
+
+    Yields:
+      praw.Reddit:
+    """
+    try:
+      api = self._api_pool.get_nowait()
+    except queue.Empty:
+      api = self._make_api()
+
+    try:
+      yield api
+    finally:
+      self._api_pool.put(api)
 
   @classmethod
   def post_id(self, url):
@@ -236,30 +286,73 @@ class Reddit(source.Source):
 
     Only includes top level comments!
 
+    For multiple activities, fetches all of their submissions' metadata,
+    including comment counts, in one ``info`` API call, then skips submissions
+    whose counts haven't changed since they were cached before fetching their
+    comments. Fetches comment trees concurrently, up to
+    :attr:`MAX_CONCURRENCY` at once, each thread with its own
+    :class:`praw.Reddit` instance from a pool that's reused across calls.
+
     Args:
       activities (list of dict)
-      cache (dict): cache as described in :meth:`Source.get_activities_response`
+      cache (dict or :class:`granary.cache.Cache`): cache as described in
+        :meth:`Source.get_activities_response`
     """
-    for activity in activities:
-      id = util.parse_tag_uri(activity.get('id'))[1]
-      subm = self.api.submission(id=id)
+    ids = [util.parse_tag_uri(activity.get('id'))[1] for activity in activities]
+    # read all cached counts at once
+    cached = (get_multi(cache, [f'ARR {id}' for id in ids])
+              if cache is not None else {})
+    updates = {}
+
+    if len(ids) > 1:
+      subms = {subm.id: subm for subm in
+               self.api.info(fullnames=[f't3_{id}' for id in ids])}
+    else:
+      subms = {id: self.api.submission(id=id) for id in ids}
+
+    to_fetch = []
+    for activity, id in zip(activities, ids):
+      subm = subms.get(id)
+      if subm is None:
+        continue
 
       cache_key = f'ARR {id}'
-      if cache and cache.get(cache_key) == subm.num_comments:
+      if cache is not None and cached.get(cache_key) == subm.num_comments:
         continue
 
+      to_fetch.append((activity, subm))
+      if cache is not None:
+        updates[cache_key] = subm.num_comments
+
+    # PRAW isn't thread safe, so when we fetch concurrently, each worker thread
+    # loads its submission with a praw.Reddit from the pool
+    concurrent = self.MAX_CONCURRENCY > 1 and len(to_fetch) > 1
+
+    def fetch(subm):
+      if concurrent:
+        with self._pooled_api() as api:
+          return fetch_comments(api.submission(id=subm.id))
+      return fetch_comments(subm)
+
+    def fetch_comments(subm):
       # for v0 we will use just the top level comments because threading is hard.
       # feature request: https://github.com/snarfed/bridgy/issues/1014
-      subm.comments.replace_more()
-      replies = [self.to_as1_activity(top_level_comment, 'comment')
-                 for top_level_comment in subm.comments]
-      items = [r.get('object') for r in replies]
+      if self.replace_more_limit is None:
+        subm.comments.replace_more()
+      else:
+        subm.comments.replace_more(limit=self.replace_more_limit)
+      return [self.to_as1_activity(top_level_comment, 'comment')
+              for top_level_comment in subm.comments]
+
+    replies = self._concurrent_map(fetch, [subm for _, subm in to_fetch])
+    for (activity, _), activity_replies in zip(to_fetch, replies):
+      items = [r.get('object') for r in activity_replies]
       activity['object']['replies'] = {
         'items': items,
         'totalItems': len(items),
       }
-      if cache is not None:
-        cache[cache_key] = subm.num_comments
+
+    set_multi(cache, updates)
 
   def get_activities_response(self, user_id=None, group_id=None, app_id=None,
                               activity_id=None, start_index=0, count=None,
@@ -269,15 +362,21 @@ class Reddit(source.Source):
                               fetch_mentions=False, search_query=None, **kwargs):
     """Fetches submissions and ActivityStreams activities.
 
-    Currently only implements ``activity_id``, ``search_query`` and
-    ``fetch_replies``.
+    Currently only implements ``activity_id``, ``search_query``, ``min_id``,
+    and ``fetch_replies``. ``min_id`` is a submission id. It's sent as the
+    listing's ``before`` fullname, so only newer submissions are fetched.
     """
+    listing_kwargs = {'limit': count}
+    if min_id is not None:
+      listing_kwargs['params'] = {'before': f't3_{min_id}'}
+
     if activity_id:
       submissions = [self.api.submission(id=activity_id)]
     elif search_query:
-      submissions = self.api.subreddit('all').search(search_query, sort='new', limit=count)
+      submissions = self.api.subreddit('all').search(search_query, sort='new',
+                                                     **listing_kwargs)
     else:
-      submissions = self._redditor(user_id).submissions.new(limit=count)
+      submissions = self._redditor(user_id).submissions.new(**listing_kwargs)
 
     activities = [self.to_as1_activity(s, 'submission') for s in submissions]
 
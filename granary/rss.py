@@ -15,17 +15,24 @@ Notably:
 * HTTP server that hosts assets and files should support range requests.
 """
 from datetime import datetime, time, timezone
+import email.utils
 import logging
 from itertools import zip_longest
 import mimetypes
+import re
+from xml.etree import ElementTree
 
 import dateutil.parser
+from feedgen.entry import FeedEntry
 from feedgen.feed import FeedGenerator
+from feedgen.util import formatRFC2822
 import feedparser
+from lxml import etree
 import mf2util
 from webutil import util
 
 from . import as1, microformats2
+from . import source
 from .source import Source
 
 logger = logging.getLogger(__name__)
@@ -33,6 +40,19 @@ logger = logging.getLogger(__name__)
 CONTENT_TYPE = 'application/rss+xml; charset=utf-8'
 CONTENT_TYPE_RDF = 'application/rdf+xml'
 
+# feedgen's namespaces for RSS feeds, in the same order, plus iTunes for podcasts
+ITUNES_NS = 'http://www.itunes.com/dtds/podcast-1.0.dtd'
+NAMESPACES = {
+  'atom': 'http://www.w3.org/2005/Atom',
+  'content': 'http://purl.org/rss/1.0/modules/content/',
+}
+# end of a pretty printed feed
+FOOTER = '  </channel>\n</rss>\n'
+# bytes to read at a time from file-like objects in to_as1_iter
+READ_SIZE = 64 * 1024
+RSS_1_NS = 'http://purl.org/rss/1.0/'
+LAST_BUILD_DATE_RE = re.compile(r'<lastBuildDate>([^<]*)</lastBuildDate>')
+
 
 def from_as1(activities, actor=None, title=None, feed_url=None,
              home_page_url=None, hfeed=None, multiple=False):
@@ -50,6 +70,26 @@ def from_as1(activities, actor=None, title=None, feed_url=None,
   Returns:
     str: RSS 2.0 XML
   """
+  return ''.join(from_as1_iter(
+    activities, actor=actor, title=title, feed_url=feed_url,
+    home_page_url=home_page_url, hfeed=hfeed))
+
+
+def from_as1_iter(activities, actor=None, title=None, feed_url=None,
+                  home_page_url=None, hfeed=None):
+  """Converts ActivityStreams activities to an RSS 2.0 feed, incrementally.
+
+  Generator. Yields the feed header, then one chunk per ``<item>``, then the
+  footer. Only one ``<item>`` is built in memory at a time. ``''.join()`` of the
+  chunks is identical to :func:`from_as1`'s output.
+
+  Args:
+    activities (sequence): of ActivityStreams activity dicts
+    actor, title, feed_url, home_page_url, hfeed: see :func:`from_as1`
+
+  Yields:
+    str: RSS 2.0 XML chunks
+  """
   try:
     iter(activities)
   except TypeError:
@@ -58,6 +98,12 @@ def from_as1(activities, actor=None, title=None, feed_url=None,
   if isinstance(activities, (dict, str)):
     raise TypeError('activities may not be a dict or string')
 
+  # the channel header depends on the items, so look at them all first. this
+  # only reads a few fields, it doesn't render anything.
+  objs = [obj for obj in map(_item_object, activities) if obj is not None]
+  latest = max(filter(None, map(_published, objs)), default=None)
+  podcast = any(_stream_enclosures(obj) for obj in objs)
+
   fg = FeedGenerator()
   fg.id(feed_url)
   assert feed_url
@@ -83,103 +129,14 @@ def from_as1(activities, actor=None, title=None, feed_url=None,
   fg.description(desc)  # required
   fg.title(title or util.ellipsize(desc))  # required
 
-  latest = None
-  feed_has_stream_enclosure = False
-  for activity in activities:
-    obj = activity
-
-    inner_obj = as1.get_object(activity)
-    if inner_obj and activity.get('verb', 'post') in ('create', 'post'):
-      obj = inner_obj
-
-    if activity.get('objectType') == 'person':
-      continue
-
-    item = fg.add_entry(order='append')
-    url = obj.get('url')
-    id = obj.get('id') or url
-    item.id(id)
-    item.link(href=url)
-    item.guid(url, permalink=True)
-
-    # title (required)
-    title = obj.get('title') or obj.get('displayName')
-    if title:
-      # strip HTML tags
-      item.title(util.parse_html(title).get_text('').strip())
-
-    content = microformats2.render_content(
-      obj, include_location=True, render_attachments=True, render_image=True)
-    if not content:
-      content = obj.get('summary') or ''
-    item.content(content, type='CDATA')
-
-    categories = [
-      {'term': t['displayName']} for t in obj.get('tags', [])
-      if t.get('displayName') and
-      t.get('verb') not in ('like', 'react', 'share') and
-      t.get('objectType') not in ('article', 'person', 'mention')]
-    item.category(categories)
-
-    as1_author = as1.get_object(obj, 'author')
-    rss_author = {
-      'name': (as1_author.get('displayName') or as1_author.get('username')
-               or as1_author.get('url') or as1_author.get('id')),
-      'uri': as1_author.get('url') or as1_author.get('id'),
-    }
-    if as1_author.get('email'):
-      rss_author['email'] = as1_author['email']
-    item.author(rss_author)
-
-    published = obj.get('published') or obj.get('updated')
-    if published and isinstance(published, str):
-      try:
-        dt = mf2util.parse_datetime(published)
-        if not isinstance(dt, datetime):
-          dt = datetime.combine(dt, time.min)
-        if not dt.tzinfo:
-          dt = dt.replace(tzinfo=timezone.utc)
-        item.published(dt)
-        if not latest or dt > latest:
-          latest = dt
-      except ValueError:  # bad datetime string
-        pass
-
-    item_has_stream_enclosure = False
-    for att in as1.get_objects(obj, 'attachments'):
-      stream = util.get_first(att, 'stream') or att
-      if not stream:
-        continue
-
-      url = stream.get('url') or ''
-      mime = mimetypes.guess_type(url, strict=False)[0] or ''
-      if (att.get('objectType') in ('audio', 'video') or
-          mime and mime.split('/')[0] in ('audio', 'video')):
-        if item_has_stream_enclosure:
-          logger.info(f'Warning: item {id} already has an RSS enclosure, skipping additional enclosure {url}')
-          continue
-
-        item_has_stream_enclosure = feed_has_stream_enclosure = True
-        item.enclosure(url=url, type=mime, length=str(stream.get('size', '')))
-        item.load_extension('podcast')
-        duration = stream.get('duration')
-        if duration:
-          item.podcast.itunes_duration(duration)
-
-    for img in as1.get_objects(obj, 'image'):
-      if url := img.get('url'):
-        mime = img.get('mimeType') or mimetypes.guess_type(url, strict=False)[0] or ''
-        length = img.get('size', 0)
-        item.enclosure(url, type=mime, length=length)
-
-  if feed_has_stream_enclosure:
+  if podcast:
     fg.load_extension('podcast')
     fg.podcast.itunes_author(actor.get('displayName') or actor.get('username'))
     if summary:
       fg.podcast.itunes_summary(summary)
     fg.podcast.itunes_explicit('no')
     fg.podcast.itunes_block(False)
-    name = rss_author.get('name')
+    name = _rss_author(objs[-1]).get('name')
     if name:
       fg.podcast.itunes_author(name)
     if image:
@@ -188,7 +145,192 @@ def from_as1(activities, actor=None, title=None, feed_url=None,
   if latest:
     fg.lastBuildDate(latest)
 
-  return fg.rss_str(pretty=True).decode('utf-8')
+  header = fg.rss_str(pretty=True).decode('utf-8')
+  assert header.endswith(FOOTER)
+  yield header.removesuffix(FOOTER)
+
+  for obj in objs:
+    yield _render_item(obj, podcast=podcast)
+
+  yield FOOTER
+
+
+def append_items(feed, activities):
+  """Adds items to the end of an RSS feed without re-rendering existing items.
+
+  Each new item is rendered exactly as :func:`from_as1` would render it. Also
+  updates ``<lastBuildDate>`` if any new item is newer. Other channel
+  elements are left as is.
+
+  Args:
+    feed (str): RSS 2.0 XML, from :func:`from_as1`
+    activities (sequence): of ActivityStreams activity dicts to add
+
+  Returns:
+    str: RSS 2.0 XML
+
+  Raises:
+    ValueError: if ``feed`` wasn't generated by :func:`from_as1`, or if a new
+      item has an audio or video enclosure and ``feed`` isn't a podcast feed. In
+      the latter case, the whole feed needs to be re-rendered with
+      :func:`from_as1`.
+  """
+  if not feed.endswith(FOOTER):
+    raise ValueError("feed doesn't look like it came from rss.from_as1")
+
+  objs = [obj for obj in map(_item_object, activities) if obj is not None]
+  podcast = f'xmlns:itunes="{ITUNES_NS}"' in feed.split('<channel>', 1)[0]
+  if not podcast and any(_stream_enclosures(obj) for obj in objs):
+    raise ValueError('new items have audio/video enclosures but feed is not a podcast feed; re-render it with from_as1')
+
+  latest = max(filter(None, map(_published, objs)), default=None)
+  if latest:
+    def update(match):
+      try:
+        current = email.utils.parsedate_to_datetime(match.group(1))
+      except (TypeError, ValueError):
+        current = None
+      if current and current >= latest:
+        return match.group(0)
+      return f'<lastBuildDate>{formatRFC2822(latest)}</lastBuildDate>'
+
+    head, channel_end, rest = feed.partition('<item>')
+    feed = LAST_BUILD_DATE_RE.sub(update, head, count=1) + channel_end + rest
+
+  return ''.join([feed.removesuffix(FOOTER)] +
+                 [_render_item(obj, podcast=podcast) for obj in objs] +
+                 [FOOTER])
+
+
+def _item_object(activity):
+  """Returns the object to render as an ``<item>`` for an activity, or None.
+  """
+  if activity.get('objectType') == 'person':
+    return None
+
+  inner_obj = as1.get_object(activity)
+  if inner_obj and activity.get('verb', 'post') in ('create', 'post'):
+    return inner_obj
+
+  return activity
+
+
+def _published(obj):
+  """Returns an object's published or updated time as a datetime, or None."""
+  published = obj.get('published') or obj.get('updated')
+  if published and isinstance(published, str):
+    try:
+      dt = mf2util.parse_datetime(published)
+    except ValueError:  # bad datetime string
+      return None
+    if not isinstance(dt, datetime):
+      dt = datetime.combine(dt, time.min)
+    if not dt.tzinfo:
+      dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def _stream_enclosures(obj):
+  """Returns an object's audio and video attachments as RSS enclosures.
+
+  Returns:
+    list of (str URL, str MIME type, dict stream) tuples
+  """
+  enclosures = []
+  for att in as1.get_objects(obj, 'attachments'):
+    stream = util.get_first(att, 'stream') or att
+    if not stream:
+      continue
+
+    url = stream.get('url') or ''
+    mime = mimetypes.guess_type(url, strict=False)[0] or ''
+    if (att.get('objectType') in ('audio', 'video') or
+        mime and mime.split('/')[0] in ('audio', 'video')):
+      enclosures.append((url, mime, stream))
+
+  return enclosures
+
+
+def _rss_author(obj):
+  """Returns a feedgen author dict for an object's author."""
+  as1_author = as1.get_object(obj, 'author')
+  rss_author = {
+    'name': (as1_author.get('displayName') or as1_author.get('username')
+             or as1_author.get('url') or as1_author.get('id')),
+    'uri': as1_author.get('url') or as1_author.get('id'),
+  }
+  if as1_author.get('email'):
+    rss_author['email'] = as1_author['email']
+  return rss_author
+
+
+def _render_item(obj, podcast=False):
+  """Renders an object as an RSS ``<item>``.
+
+  Args:
+    obj (dict): ActivityStreams object
+    podcast (bool): whether the feed has the iTunes podcast extension
+
+  Returns:
+    str: ``<item>`` XML, indented as it is inside a pretty printed feed
+  """
+  item = FeedEntry()
+  if podcast:
+    item.load_extension('podcast')
+
+  url = obj.get('url')
+  id = obj.get('id') or url
+  item.id(id)
+  item.link(href=url)
+  item.guid(url, permalink=True)
+
+  # title (required)
+  title = obj.get('title') or obj.get('displayName')
+  if title:
+    # strip HTML tags
+    item.title(util.parse_html(title).get_text('').strip())
+
+  content = microformats2.render_content(
+    obj, include_location=True, render_attachments=True, render_image=True)
+  if not content:
+    content = obj.get('summary') or ''
+  item.content(content, type='CDATA')
+
+  categories = [
+    {'term': t['displayName']} for t in obj.get('tags', [])
+    if t.get('displayName') and
+    t.get('verb') not in ('like', 'react', 'share') and
+    t.get('objectType') not in ('article', 'person', 'mention')]
+  item.category(categories)
+
+  item.author(_rss_author(obj))
+
+  if published := _published(obj):
+    item.published(published)
+
+  for i, (url, mime, stream) in enumerate(_stream_enclosures(obj)):
+    if i > 0:
+      logger.info(f'Warning: item {id} already has an RSS enclosure, skipping additional enclosure {url}')
+      continue
+    item.enclosure(url=url, type=mime, length=str(stream.get('size', '')))
+    duration = stream.get('duration')
+    if duration:
+      item.podcast.itunes_duration(duration)
+
+  for img in as1.get_objects(obj, 'image'):
+    if url := img.get('url'):
+      mime = img.get('mimeType') or mimetypes.guess_type(url, strict=False)[0] or ''
+      length = img.get('size', 0)
+      item.enclosure(url, type=mime, length=length)
+
+  # serialize the item inside an otherwise empty feed, with the same namespaces
+  # as the real feed, so that it's indented and namespaced the same way
+  nsmap = {'itunes': ITUNES_NS} if podcast else {}
+  nsmap.update(NAMESPACES)
+  root = etree.Element('rss', version='2.0', nsmap=nsmap)
+  etree.SubElement(root, 'channel').append(item.rss_entry())
+  xml = etree.tostring(root, pretty_print=True, encoding='unicode')
+  return xml[xml.index('<channel>\n') + len('<channel>\n'):-len(FOOTER)]
 
 
 from_activities = from_as1
@@ -205,16 +347,116 @@ def to_as1(rss):
     list of dict: ActivityStreams activity
   """
   parsed = feedparser.parse(rss)
-  activities = []
+  actor = _feed_to_as1_actor(parsed.get('feed', {}))
+  return [_entry_to_as1(entry, actor) for entry in parsed.get('entries', [])]
+
+
+def to_as1_iter(rss):
+  """Converts an RSS feed to ActivityStreams 1 activities, incrementally.
+
+  Generator. Parses the document incrementally and yields each activity as soon
+  as its ``<item>`` has been parsed, then discards that item, so memory use
+  doesn't grow with the number of items. Each item is converted by feedparser on
+  its own, so the output is the same as :func:`to_as1`.
+
+  Channel-level elements, eg ``<title>`` and ``<image>``, are used for the feed
+  author. Only the ones before the first ``<item>`` are used, which is where
+  they usually are.
+
+  Supports RSS 0.9x, 1.0 (RDF), and 2.0. Unlike :func:`to_as1`, doesn't
+  support Atom or other formats that feedparser handles.
+
+  Args:
+    rss (str, bytes, file-like object, or iterable of str or bytes): RSS
+      document. File-like objects are read in chunks of :const:`READ_SIZE`.
+      Iterables, eg :meth:`requests.Response.iter_content`, should yield chunks.
+
+  Yields:
+    dict: ActivityStreams activity
+
+  Raises:
+    ElementTree.ParseError: if the document isn't valid XML
+  """
+  parser = ElementTree.XMLPullParser(events=('start', 'end'))
+  stack = []
+  channel_elems = []
+  actor = None
+
+  def parse(elems):
+    """Runs feedparser on a skeleton feed with the given channel children."""
+    root = ElementTree.Element('rss', version='2.0')
+    ElementTree.SubElement(root, 'channel').extend(elems)
+    return feedparser.parse(ElementTree.tostring(root, encoding='utf-8'))
+
+  for chunk in source.iter_chunks(rss, READ_SIZE):
+    parser.feed(chunk)
+    for event, elem in parser.read_events():
+      if event == 'start':
+        stack.append(elem)
+        continue
 
-  feed = parsed.get('feed', {})
-  actor = {
+      stack.pop()
+      # RSS 0.9x and 2.0 items are inside <channel>, RSS 1.0 items are next to it
+      if (not stack or _local_name(stack[-1]) not in ('channel', 'RDF')
+          or _local_name(elem) == 'channel'):
+        continue
+
+      _strip_namespace(elem, RSS_1_NS)
+      if _local_name(elem) == 'item':
+        if actor is None:
+          actor = _feed_to_as1_actor(parse(channel_elems).get('feed', {}))
+        for entry in parse([elem]).get('entries', []):
+          yield _entry_to_as1(entry, actor)
+      elif actor is None:
+        channel_elems.append(elem)
+
+      # done with this element, free it
+      stack[-1].remove(elem)
+
+  parser.close()
+
+
+def _local_name(elem):
+  """Returns an ElementTree element's tag without its namespace."""
+  return elem.tag.split('}')[-1]
+
+
+def _strip_namespace(elem, uri):
+  """Removes a namespace from an element and its descendants, in place."""
+  prefix = f'{{{uri}}}'
+  for e in elem.iter():
+    if isinstance(e.tag, str) and e.tag.startswith(prefix):
+      e.tag = e.tag.removeprefix(prefix)
+
+
+def _feed_to_as1_actor(feed):
+  """Converts a feedparser feed to an ActivityStreams 1 actor.
+
+  Args:
+    feed (dict): feedparser feed
+
+  Returns:
+    dict: ActivityStreams actor
+  """
+  return {
     'displayName': feed.get('title'),
     'url': feed.get('link'),
     'summary': feed.get('info') or feed.get('description'),
     'image': [{'url': feed.get('image', {}).get('href') or feed.get('logo')}],
   }
 
+
+def _entry_to_as1(entry, actor):
+  """Converts a feedparser entry to an ActivityStreams 1 activity.
+
+  Args:
+    entry (dict): feedparser entry
+    actor (dict): ActivityStreams actor for the feed, used as the author if the
+      entry doesn't have one
+
+  Returns:
+    dict: ActivityStreams activity
+  """
   def iso_datetime(field):
     # check for existence because feedparser returns 'published' for 'updated'
     # when you [] or .get() it
@@ -227,89 +469,86 @@ def to_as1(rss):
   def as_int(val):
     return int(val) if util.is_int(val) else val
 
-  for entry in parsed.get('entries', []):
-    id = entry.get('id')
-    uri = entry.get('uri') or entry.get('link')
-    attachments = []
-    images = []
-
-    for e in entry.get('enclosures', []):
-      url = e.get('href')
-      if url:
-        mime = e.get('type') or mimetypes.guess_type(url, strict=False)[0] or ''
-        type = mime.split('/')[0]
-        if type in ('audio', 'video'):
-          attachments.append({
-            'stream': {
-              'url': url,
-              'size': as_int(e.get('length')),
-              'duration': as_int(entry.get('itunes_duration')),
-            },
-            'objectType': type,
-          })
-        elif type == 'image':
-          images.append({
+  id = entry.get('id')
+  uri = entry.get('uri') or entry.get('link')
+  attachments = []
+  images = []
+
+  for e in entry.get('enclosures', []):
+    url = e.get('href')
+    if url:
+      mime = e.get('type') or mimetypes.guess_type(url, strict=False)[0] or ''
+      type = mime.split('/')[0]
+      if type in ('audio', 'video'):
+        attachments.append({
+          'stream': {
             'url': url,
-            'mimeType': mime,
-          })
-
-    detail = entry.get('author_detail', {})
-    author = util.trim_nulls({
-      'displayName': detail.get('name') or entry.get('author'),
-      'url': detail.get('href'),
-      'email': detail.get('email'),
-    })
-    if not author:
-      author = actor
-
-    object_type = 'note'
-    content = (entry.get('summary')
-               or entry.get('content', [{}])[0].get('value')
-               or entry.get('description'))
-    title = entry.get('title')
-    if content and title:
-      if content.startswith(title.removesuffix('…').removesuffix('...')):
-        title = None
-      else:
-        object_type = 'article'
-
-    for media, alt in zip_longest(util.get_list(entry, 'media_content'),
-                                  util.get_list(entry, 'content'),
-                                  fillvalue={}):
-      if url := media.get('url'):
-        filesize = media.get('filesize')
+            'size': as_int(e.get('length')),
+            'duration': as_int(entry.get('itunes_duration')),
+          },
+          'objectType': type,
+        })
+      elif type == 'image':
         images.append({
           'url': url,
-          'mimeType': media.get('type'),
-          'length': int(filesize) if util.is_int(filesize) else None,
-          'displayName': alt.get('value'),
+          'mimeType': mime,
         })
 
-    activity = {
-      'objectType': 'activity',
-      'verb': 'post',
-      'id': id,
+  detail = entry.get('author_detail', {})
+  author = util.trim_nulls({
+    'displayName': detail.get('name') or entry.get('author'),
+    'url': detail.get('href'),
+    'email': detail.get('email'),
+  })
+  if not author:
+    author = actor
+
+  object_type = 'note'
+  content = (entry.get('summary')
+             or entry.get('content', [{}])[0].get('value')
+             or entry.get('description'))
+  title = entry.get('title')
+  if content and title:
+    if content.startswith(title.removesuffix('…').removesuffix('...')):
+      title = None
+    else:
+      object_type = 'article'
+
+  for media, alt in zip_longest(util.get_list(entry, 'media_content'),
+                                util.get_list(entry, 'content'),
+                                fillvalue={}):
+    if url := media.get('url'):
+      filesize = media.get('filesize')
+      images.append({
+        'url': url,
+        'mimeType': media.get('type'),
+        'length': int(filesize) if util.is_int(filesize) else None,
+        'displayName': alt.get('value'),
+      })
+
+  activity = {
+    'objectType': 'activity',
+    'verb': 'post',
+    'id': id,
+    'url': uri,
+    'actor': author,
+    'object': {
+      'objectType': object_type,
+      'id': id or uri,
       'url': uri,
-      'actor': author,
-      'object': {
-        'objectType': object_type,
-        'id': id or uri,
-        'url': uri,
-        'displayName': title,
-        'content': content,
-        'published': iso_datetime('published'),
-        'updated': iso_datetime('updated'),
-        'author': author,
-        'image': images,
-        'tags': [{'displayName': tag.get('term')} for tag in entry.get('tags', [])],
-        'attachments': attachments,
-        'stream': [a['stream'] for a in attachments],
-      },
-    }
-    as1.add_tags_for_html_content_links(activity)
-    activities.append(Source.postprocess_activity(activity))
-
-  return util.trim_nulls(activities)
+      'displayName': title,
+      'content': content,
+      'published': iso_datetime('published'),
+      'updated': iso_datetime('updated'),
+      'author': author,
+      'image': images,
+      'tags': [{'displayName': tag.get('term')} for tag in entry.get('tags', [])],
+      'attachments': attachments,
+      'stream': [a['stream'] for a in attachments],
+    },
+  }
+  as1.add_tags_for_html_content_links(activity)
+  return util.trim_nulls(Source.postprocess_activity(activity))
 
 
 to_activities = to_as1
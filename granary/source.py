@@ -9,10 +9,13 @@ activity's privacy settings. It's set to a group with alias ``@public`` or
 http://activitystrea.ms/specs/json/targeting/1.0/#anchor3
 """
 import collections
+import concurrent.futures
 import copy
+import email.utils
 from html import escape, unescape
 import logging
 import re
+import threading
 import urllib.parse
 
 import brevity
@@ -23,6 +26,7 @@ from webutil import util
 from webutil.util import json_dumps, json_loads
 
 from . import as1, microformats2
+from .cache import get_multi
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +45,10 @@ INCLUDE_LINK = 'include'
 INCLUDE_IF_TRUNCATED = 'if truncated'
 HTML_ENTITY_RE = re.compile(r'&#?[a-zA-Z0-9]+;')
 
+# cache key prefix for conditional request state, ie validators and activities,
+# per endpoint. See :meth:`Source._load_conditional`.
+CONDITIONAL_CACHE_PREFIX = 'ACR '
+
 # maps lower case string short name to Source subclass. populated by SourceMeta.
 sources = {}
 
@@ -126,6 +134,59 @@ def load_json(body, url):
     raise urllib.error.HTTPError(url, 502, msg, {}, None)
 
 
+def iter_chunks(input, size):
+  """Yields chunks of a str, bytes, file-like object, or iterable of chunks.
+
+  Used by the incremental feed parsers, :func:`atom.to_as1_iter` and
+  :func:`rss.to_as1_iter`.
+
+  Args:
+    input (str, bytes, file-like object, or iterable of str or bytes)
+    size (int): chunk size to read file-like objects in
+
+  Yields:
+    str or bytes:
+  """
+  if isinstance(input, (str, bytes)):
+    yield input
+  elif hasattr(input, 'read'):
+    while chunk := input.read(size):
+      yield chunk
+  else:
+    yield from input
+
+
+def conditional_headers(etag):
+  """Returns HTTP request headers for a conditional GET.
+
+  Args:
+    etag (str): validator from a previous response, either an ``ETag`` value,
+      eg ``"ABC123"`` or ``W/"ABC123"``, or a ``Last-Modified`` HTTP date
+
+  Returns:
+    dict: ``If-Modified-Since`` for HTTP dates, ``If-None-Match`` otherwise,
+    or empty if ``etag`` is empty
+  """
+  if not etag:
+    return {}
+  elif email.utils.parsedate(etag):
+    return {'If-Modified-Since': etag}
+  else:
+    return {'If-None-Match': etag}
+
+
+def response_validator(resp):
+  """Returns an HTTP response's ``ETag``, or ``Last-Modified`` if it has none.
+
+  Args:
+    resp (requests.Response)
+
+  Returns:
+    str or None:
+  """
+  return resp.headers.get('ETag') or resp.headers.get('Last-Modified')
+
+
 def creation_result(content=None, description=None, abort=False,
                     error_plain=None, error_html=None):
   """Creates a new :class:`CreationResult`."""
@@ -168,17 +229,100 @@ class Source(object, metaclass=SourceMeta):
     OPTIMIZED_COMMENTS (bool): whether :meth:`get_comment` is optimized and
       only fetches the requested comment. If False, :meth:`get_comment` fetches
       many or all of the post's comments to find the requested one.
+    MAX_CONCURRENCY (int): maximum number of API calls that this instance makes
+      at once in :meth:`_concurrent_map`, eg when fetching replies, likes, and
+      shares in :meth:`get_activities_response`. Shared by all threads that use
+      this instance. Defaults to 1, ie serial. Subclasses may allow overriding
+      it per instance, eg with a constructor kwarg.
   """
   POST_ID_RE = None
   HTML2TEXT_OPTIONS = {}
   TRUNCATE_TEXT_LENGTH = None
   TRUNCATE_URL_LENGTH = None
   OPTIMIZED_COMMENTS = False
+  MAX_CONCURRENCY = 1
+
+  _semaphore_lock = threading.Lock()
 
   def user_url(self, user_id):
     """Returns the URL for a user's profile."""
     raise NotImplementedError()
 
+  def _concurrent_map(self, fn, args):
+    """Calls a function on each of a list of args, concurrently.
+
+    Makes at most :attr:`MAX_CONCURRENCY` calls at once, across all threads
+    using this instance. If it's 1, calls ``fn`` serially in the current thread.
+
+    Generator. Yields results in the same order as ``args``, each one as soon as
+    it and all results before it are done. If a call raises an exception, it's
+    raised when its result would have been yielded.
+
+    Args:
+      fn (callable): takes one arg
+      args (sequence): arguments to pass to ``fn``
+
+    Yields:
+      return values of ``fn``
+    """
+    args = list(args)
+    if self.MAX_CONCURRENCY <= 1 or len(args) <= 1:
+      for arg in args:
+        yield fn(arg)
+      return
+
+    with self._semaphore_lock:
+      if getattr(self, '_semaphore', None) is None:
+        self._semaphore = threading.BoundedSemaphore(self.MAX_CONCURRENCY)
+
+    def call(arg):
+      with self._semaphore:
+        return fn(arg)
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(self.MAX_CONCURRENCY, len(args))) as executor:
+      futures = [executor.submit(call, arg) for arg in args]
+      try:
+        for future in futures:
+          yield future.result()
+      finally:
+        for future in futures:
+          future.cancel()
+
+  def _load_conditional(self, cache, key, etag=None):
+    """Loads conditional request state for a polling endpoint from a cache.
+
+    Subclasses that support conditional requests store the validator, eg
+    ``ETag``, and the resulting activities from each fetch of a polling
+    endpoint, eg a timeline, in ``cache`` under
+    :const:`CONDITIONAL_CACHE_PREFIX` + ``key``. On the next fetch, they send
+    the validator with :func:`conditional_headers`, and if the API responds
+    ``304 Not Modified``, they return the stored activities instead of
+    refetching and reconverting them.
+
+    Args:
+      cache (dict or :class:`granary.cache.Cache`): may be None
+      key (str): identifies the endpoint, eg its URL and query params, and the
+        user, if its results depend on who's asking
+      etag (str): optional, validator that the caller passed in. If it's
+        provided and doesn't match the stored validator, the stored activities
+        aren't used.
+
+    Returns:
+      (str etag, list of dict activities) tuple: the validator to send and the
+      activities to use if the API responds ``304 Not Modified``. Either may be
+      None.
+    """
+    if cache is None:
+      return etag, None
+
+    key = CONDITIONAL_CACHE_PREFIX + key
+    stored = get_multi(cache, [key]).get(key)
+    if not stored or (etag and etag != stored.get('etag')):
+      return etag, None
+
+    return stored.get('etag'), copy.deepcopy(stored.get('activities'))
+
   def get_actor(self, user_id=None):
     """Fetches and returns a user.
 
@@ -236,11 +380,20 @@ class Source(object, metaclass=SourceMeta):
       count (int): >= 0
       etag (str): optional ETag to send with the API request. Results will
         only be returned if the ETag has changed. Should include enclosing
-        double quotes, e.g. ``"ABC123"``
-      min_id (only): return activities with ids greater than this
-      cache (dict): optional, used to cache metadata like comment and like counts
-        per activity across calls. Used to skip expensive API calls that haven't
-        changed.
+        double quotes, e.g. ``"ABC123"``. Some sources also record validators
+        in ``cache`` and use them automatically; see
+        :meth:`_load_conditional`.
+      min_id (str): only return activities newer than this. Each source
+        interprets it as its own native "since" cursor, eg a Twitter or
+        Mastodon status id, a Reddit submission id, a Bluesky ``indexedAt``
+        timestamp, or a Nostr or Farcaster timestamp. Sources that support it
+        skip fetching or converting older items, so polls only pay for what's
+        new. Ignored by sources that don't support it.
+      cache (dict or :class:`granary.cache.Cache`): optional, used to cache
+        metadata like comment and like counts per activity across calls. Used
+        to skip expensive API calls that haven't changed. Sources read and
+        write it in bulk, once each per call, with :func:`granary.cache.get_multi`
+        and :func:`granary.cache.set_multi`.
       fetch_replies (bool): whether to fetch each activity's replies also
       fetch_likes (bool): whether to fetch each activity's likes also
       include_shares (bool): whether to include share activities
@@ -753,17 +906,17 @@ class Source(object, metaclass=SourceMeta):
 
     if (first_link_to_attachment and (content := obj.get('content'))
         and not obj.get('attachments') and as1.is_content_html(obj)):
-      links = util.parse_html(content).find_all('a')
-      if links and links[0].get('href'):
+      links = as1.analyze_content(content).links
+      if links and (href := links[0][1]):
         try:
-          if mf2 := util.fetch_mf2(links[0]['href'], metaformats=True):
+          if mf2 := util.fetch_mf2(href, metaformats=True):
             entry = mf2util.find_first_entry(mf2, ['h-entry', 'h-card'])
             obj['attachments'] = [{
               **microformats2.to_as1(entry),
               'objectType': 'link',
             }]
         except (AssertionError, ValueError, RequestException) as e:
-          logger.info(f"Couldn't generate preview embed for {links[0]['href']}: {e}")
+          logger.info(f"Couldn't generate preview embed for {href}: {e}")
           util.interpret_http_exception(e)
 
     return util.trim_nulls(obj)
@@ -854,7 +1007,7 @@ class Source(object, metaclass=SourceMeta):
     # TODO: abstract better, maybe with a new normalize_url or similar function
     # that determines if a URL is on this source? see eg Bluesky.base_object
 
-    obj = copy.deepcopy(obj)
+    obj = as1.copy_object(obj)
     id = obj.get('id')
     url = obj.get('url')
 
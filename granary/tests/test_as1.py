@@ -1,4 +1,5 @@
 """Unit tests for as1.py."""
+import collections
 import copy
 import re
 from unittest.mock import patch
@@ -772,6 +773,41 @@ class As1Test(testutil.TestCase):
       with self.subTest(obj=obj):
         self.assertEqual(expected, as1.get_objects(obj, 'f'))
 
+  def test_copy_object(self):
+    obj = {
+      'objectType': 'note',
+      'tags': [{'objectType': 'mention', 'url': 'http://a'}],
+      'author': {'id': 'b', 'urls': [{'value': 'c'}]},
+      'pair': ({'x': 'y'}, 'z'),
+      'counts': collections.defaultdict(int, {'likes': 3}),
+    }
+    orig = copy.deepcopy(obj)
+
+    got = as1.copy_object(obj)
+    self.assertEqual(obj, got)
+    self.assertIsNot(obj['tags'][0], got['tags'][0])
+    self.assertIsNot(obj['author']['urls'], got['author']['urls'])
+    self.assertIsNot(obj['pair'][0], got['pair'][0])
+    self.assertIsInstance(got['counts'], collections.defaultdict)
+
+    got['tags'][0]['startIndex'] = 0
+    got['author']['urls'].append({'value': 'd'})
+    got['pair'][0]['x'] = 'w'
+    got['counts']['likes'] = 4
+    self.assertEqual(orig, obj)
+
+  def test_copy_object_fields(self):
+    obj = {
+      'objectType': 'note',
+      'tags': [{'objectType': 'mention', 'url': 'http://a'}],
+      'author': {'id': 'b'},
+    }
+    got = as1.copy_object(obj, fields=('tags', 'unknown'))
+    self.assertEqual(obj, got)
+    self.assertIsNot(obj['tags'][0], got['tags'][0])
+    self.assertIs(obj['author'], got['author'])
+    self.assertNotIn('unknown', got)
+
   def test_get_owner(self):
     with self.assertRaises(ValueError):
       as1.get_owner('x')
@@ -1371,6 +1407,44 @@ class As1Test(testutil.TestCase):
       with self.subTest(obj=obj):
         self.assertFalse(as1.is_content_html(obj))
 
+  def test_analyze_content(self):
+    content = 'hi <a href="http://foo">@bar</a> <a>baz</a> &amp; <b>biff</b>'
+    got = as1.analyze_content(content)
+    self.assertIs(got, as1.analyze_content(content))
+    self.assertTrue(got.is_html)
+    self.assertEqual((('@bar', 'http://foo'), ('baz', None)), got.links)
+    self.assertEqual('hi @bar baz & **biff**', got.text)
+
+    got = as1.analyze_content('plain text')
+    self.assertFalse(got.is_html)
+    self.assertEqual((), got.links)
+
+  @patch.object(util, 'parse_html', wraps=util.parse_html)
+  def test_analyze_content_parses_once(self, mock_parse):
+    obj = {'content': '<p>a unique <a href="http://x/">link</a></p>'}
+    for _ in range(3):
+      self.assertTrue(as1.is_content_html(obj))
+      as1.add_tags_for_html_content_links(copy.deepcopy(obj))
+      as1.convert_html_content_to_text(copy.deepcopy(obj))
+
+    # once with html.parser for is_html, once with the default parser for
+    # links and placeholders
+    self.assertEqual(2, mock_parse.call_count)
+
+  def test_convert_html_content_to_text_doesnt_modify_cached_links(self):
+    content = '<p>hi <a href="http://foo">@bar</a> there</p>'
+    obj = {'content': content}
+    as1.convert_html_content_to_text(obj)
+    self.assertEqual('hi @bar there', obj['content'])
+    self.assertEqual((('@bar', 'http://foo'),),
+                     as1.analyze_content(content).links)
+
+    # link is in inReplyTo, so it's excluded
+    obj = {'content': content, 'inReplyTo': [{'id': 'http://foo'}]}
+    as1.convert_html_content_to_text(obj)
+    self.assertEqual('hi @bar there', obj['content'])
+    self.assertEqual([], obj['tags'])
+
   def test_add_tags_for_html_content_links_mentions(self):
     obj = {
       'objectType': 'note',
@@ -0,0 +1,98 @@
+"""Unit tests for async_source.py."""
+import asyncio
+import concurrent.futures
+import threading
+
+from webutil import testutil, util
+from webutil.testutil import requests_response
+
+from .. import mastodon
+from ..async_source import AsyncSource
+from ..source import Source
+from .test_mastodon import ACCOUNT, ACTIVITY, ACTOR, INSTANCE, STATUS
+
+
+class FakeSource(Source):
+  NAME = 'FakeAsync'
+  DOMAIN = 'fake.com'
+
+  def __init__(self, barrier=None):
+    self.barrier = barrier
+    self.threads = set()
+
+  def get_activities_response(self, **kwargs):
+    self.threads.add(threading.get_ident())
+    if self.barrier:
+      self.barrier.wait()
+    return self.make_activities_base_response([{'id': 'x', 'kwargs': kwargs}])
+
+  def get_actor(self, user_id=None):
+    return {'id': user_id}
+
+
+class AsyncSourceTest(testutil.TestCase):
+
+  def test_get_activities(self):
+    src = FakeSource()
+    got = asyncio.run(AsyncSource(src).get_activities(count=3))
+    self.assertEqual([{'id': 'x', 'kwargs': {'count': 3}}], got)
+    self.assertNotIn(threading.get_ident(), src.threads)
+
+  def test_delegates_attributes(self):
+    src = AsyncSource(FakeSource())
+    self.assertEqual('FakeAsync', src.NAME)
+    self.assertEqual('fake.com', src.DOMAIN)
+    self.assertEqual({'url': 'http://foo'},
+                     src.postprocess_object({'url': 'http://foo'}))
+
+  def test_concurrent(self):
+    # all three calls have to run at once to get past this
+    barrier = threading.Barrier(3, timeout=5)
+    sources = [AsyncSource(FakeSource(barrier=barrier)) for _ in range(3)]
+
+    async def poll():
+      return await asyncio.gather(*(src.get_activities() for src in sources))
+
+    self.assertEqual(3, len(asyncio.run(poll())))
+
+  def test_executor_and_max_concurrency(self):
+    lock = threading.Lock()
+    running = max_running = 0
+
+    class Slow(FakeSource):
+      def get_actor(self, user_id=None):
+        nonlocal running, max_running
+        with lock:
+          running += 1
+          max_running = max(running, max_running)
+        threading.Event().wait(.02)
+        with lock:
+          running -= 1
+        return super().get_actor(user_id=user_id)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
+      src = AsyncSource(Slow(), executor=executor, max_concurrency=2)
+
+      async def fetch():
+        return await asyncio.gather(*(src.get_actor(str(i)) for i in range(5)))
+
+      self.assertEqual([{'id': str(i)} for i in range(5)], asyncio.run(fetch()))
+
+    self.assertEqual(2, max_running)
+
+  def test_mastodon(self):
+    mock_get = self.start_patch(util.session, 'get')
+    mock_get.side_effect = [
+      requests_response([STATUS]),
+      requests_response(ACCOUNT),
+    ]
+
+    src = AsyncSource(mastodon.Mastodon(INSTANCE, user_id=ACCOUNT['id'],
+                                        access_token='towkin'))
+
+    async def fetch():
+      return await src.get_activities(), await src.get_actor()
+
+    activities, actor = asyncio.run(fetch())
+    self.assert_equals([ACTIVITY], activities)
+    self.assert_equals(ACTOR, actor)
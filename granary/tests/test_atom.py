@@ -1,6 +1,8 @@
 """Unit tests for atom.py."""
 import copy
+import io
 from unittest.mock import patch
+from xml.etree import ElementTree
 
 import requests
 from webutil import testutil, util
@@ -142,6 +144,39 @@ class AtomTest(testutil.TestCase):
           ),
           ignore_blanks=True)
 
+  def test_from_as1_iter(self):
+    activities = [copy.deepcopy(test_facebook.ACTIVITY),
+                  copy.deepcopy(test_twitter.ACTIVITY)]
+    expected = atom.from_as1(copy.deepcopy(activities), test_twitter.ACTOR)
+
+    chunks = list(atom.from_as1_iter(iter(activities), test_twitter.ACTOR))
+    self.assertEqual(3, len(chunks))
+    self.assertNotIn('<entry>', chunks[0])
+    for chunk in chunks[1:]:
+      self.assertEqual(1, chunk.count('<entry>'))
+    self.assertTrue(chunks[-1].endswith('</feed>'))
+    self.assertEqual(expected, ''.join(chunks))
+
+  def test_from_as1_iter_prepares_up_front(self):
+    activities = [copy.deepcopy(test_facebook.ACTIVITY),
+                  copy.deepcopy(test_twitter.ACTIVITY)]
+    chunks = atom.from_as1_iter(activities)
+    first = next(chunks)
+    self.assertNotIn('<entry>', first)
+    for activity in activities:
+      self.assertIn('rendered_content', activity['object'])
+
+  def test_from_as1_iter_bad_activity_raises_before_header(self):
+    chunks = atom.from_as1_iter([
+      copy.deepcopy(test_facebook.ACTIVITY),
+      {'objectType': 'note', 'attachments': ['not an object']},
+    ])
+    with self.assertRaises(AttributeError):
+      next(chunks)
+
+  def test_from_as1_iter_empty(self):
+    self.assertEqual(atom.from_as1([], {}), ''.join(atom.from_as1_iter([], {})))
+
   def test_from_as1_entry(self):
     self.assert_multiline_equals(
       INSTAGRAM_ENTRY,
@@ -369,6 +404,41 @@ class AtomTest(testutil.TestCase):
 </feed>
 """))
 
+  def test_to_as1_iter(self):
+    feed = atom.from_as1([copy.deepcopy(test_facebook.ACTIVITY),
+                          copy.deepcopy(test_twitter.ACTIVITY)],
+                         {'id': 'id:ryan', 'url': 'http://ryan'})
+    expected = atom.to_as1(feed)
+    self.assertEqual(2, len(expected))
+
+    data = feed.encode()
+    for input in (feed, data, io.BytesIO(data),
+                  [data[i:i + 10] for i in range(0, len(data), 10)]):
+      with self.subTest(input=type(input)):
+        self.assert_equals(expected, list(atom.to_as1_iter(input)))
+
+  def test_to_as1_iter_entry(self):
+    self.assert_equals([INSTAGRAM_ACTIVITY],
+                       list(atom.to_as1_iter(INSTAGRAM_ENTRY)))
+
+  def test_to_as1_iter_yields_each_entry_when_parsed(self):
+    def chunks():
+      yield INSTAGRAM_FEED.split('</entry>')[0] + '</entry>'
+      self.assertEqual(1, len(got))
+      yield INSTAGRAM_FEED.split('</entry>')[1]
+
+    got = []
+    for activity in atom.to_as1_iter(chunks()):
+      got.append(activity)
+    self.assert_equals([INSTAGRAM_ACTIVITY], got)
+
+  def test_to_as1_iter_not_atom(self):
+    with self.assertRaises(ValueError):
+      list(atom.to_as1_iter('<rss></rss>'))
+
+    with self.assertRaises(ElementTree.ParseError):
+      list(atom.to_as1_iter('not xml'))
+
   def test_title(self):
     self.assert_multiline_in(
       '\n<title>my title</title>',
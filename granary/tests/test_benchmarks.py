@@ -0,0 +1,100 @@
+"""Unit tests for benchmarks/."""
+import os
+import tempfile
+
+from webutil import testutil
+
+from .. import benchmarks
+
+NOTE = {
+  'objectType': 'note',
+  'id': 'tag:example.com:note',
+  'url': 'https://example.com/note',
+  'content': 'hello #world',
+  'tags': [{'objectType': 'hashtag', 'displayName': 'world'}],
+}
+RESULT = {
+  'inputs': 1,
+  'ops': 10,
+  'ops_per_sec': 1000,
+  'p50_us': 900,
+  'p99_us': 1100,
+  'alloc_kb': 10,
+}
+
+
+class BenchmarksTest(testutil.TestCase):
+
+  def test_load_corpus(self):
+    corpus = benchmarks.load_corpus()
+    self.assertGreater(len(corpus), 50)
+
+    names = [name for name, _ in corpus]
+    self.assertIn('note.as.json', names)
+    self.assertIn('actor.as.json', names)
+    # has invalid JSON
+    self.assertNotIn('event_with_rsvps.as.json', names)
+
+    for _, obj in corpus:
+      self.assertIsInstance(obj, dict)
+
+  def test_benchmarks_names(self):
+    got = benchmarks.benchmarks([('note.as.json', NOTE)],
+                                names=['as2', 'jsonfeed.to_as1'])
+    self.assertCountEqual(
+      ['as2.from_as1', 'as2.to_as1', 'as2.render_content', 'jsonfeed.to_as1'],
+      got.keys())
+
+    fn, inputs = got['as2.from_as1']
+    self.assertEqual([NOTE], inputs)
+    # to_as1 inputs are from_as1 outputs
+    fn, inputs = got['as2.to_as1']
+    self.assertEqual('Note', inputs[0]['type'])
+
+  def test_benchmarks_skips_unsupported_inputs(self):
+    bookmark = {'objectType': 'bookmark', 'id': 'tag:example.com:bookmark'}
+    got = benchmarks.benchmarks([('a', NOTE), ('b', bookmark)], names=['nostr'])
+    self.assertEqual([NOTE], got['nostr.from_as1'][1])
+
+  def test_run_one(self):
+    got = benchmarks.run_one(lambda obj: [obj] * 1000, [NOTE, NOTE], iterations=3)
+    self.assertEqual(6, got['ops'])
+    self.assertGreater(got['ops_per_sec'], 0)
+    self.assertLessEqual(got['p50_us'], got['p99_us'])
+    self.assertGreater(got['alloc_kb'], 7)
+
+  def test_run(self):
+    got = benchmarks.run(names=['as2.from_as1'], iterations=1,
+                         corpus=[('note.as.json', NOTE)])
+    self.assertEqual(['as2.from_as1'], list(got.keys()))
+    self.assertEqual(1, got['as2.from_as1']['inputs'])
+    self.assertEqual(1, got['as2.from_as1']['ops'])
+
+  def test_compare(self):
+    baseline = {'x': RESULT, 'y': RESULT}
+    self.assertEqual([], benchmarks.compare({'x': RESULT}, baseline))
+    self.assertEqual([], benchmarks.compare({'z': RESULT}, baseline))
+    self.assertEqual([], benchmarks.compare({
+      'x': {**RESULT, 'ops_per_sec': 800, 'alloc_kb': 12},
+    }, baseline))
+
+    self.assertEqual([
+      'x: 700 ops/sec, baseline 1000',
+      'y: 13 KB allocated/op, baseline 10',
+    ], benchmarks.compare({
+      'x': {**RESULT, 'ops_per_sec': 700},
+      'y': {**RESULT, 'alloc_kb': 13},
+    }, baseline))
+
+  def test_save_load_baseline(self):
+    with tempfile.TemporaryDirectory() as dir:
+      filename = os.path.join(dir, 'baseline.json')
+      self.assertEqual({}, benchmarks.load_baseline(filename))
+      benchmarks.save_baseline({'x': RESULT}, filename)
+      self.assertEqual({'x': RESULT}, benchmarks.load_baseline(filename))
+
+  def test_format_results(self):
+    got = benchmarks.format_results({'x': RESULT},
+                                    baseline={'x': {**RESULT, 'ops_per_sec': 800}})
+    self.assertIn('ops/sec', got)
+    self.assertIn('+25%', got.splitlines()[1])
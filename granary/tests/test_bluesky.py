@@ -4,6 +4,7 @@ Most tests are via files in testdata/.
 """
 import copy
 import os
+import threading
 from io import BytesIO
 from unittest import skip
 from unittest.mock import ANY, MagicMock, patch
@@ -38,6 +39,10 @@ from ..bluesky import (
   LEXRPC,
   BOT_LABEL,
   NO_UNAUTHENTICATED_LABEL,
+  prefetch_handles,
+  prefetch_strong_refs,
+  resolve_handle,
+  resolve_handles,
   to_as1,
   to_external_embed,
   url_to_did_web,
@@ -666,6 +671,9 @@ class BlueskyTest(testutil.TestCase):
     super().setUp()
     self.bs = Bluesky(handle='handull', did='did:dy:d', access_token='towkin')
     util.now = lambda **kwargs: testutil.NOW
+    bluesky.handle_cache.clear()
+    bluesky.strong_ref_cache.clear()
+    bluesky.blob_cache.clear()
 
   def assert_equals(self, expected, actual, **kwargs):
     return super().assert_equals(expected, actual, in_order=True, **kwargs)
@@ -926,6 +934,89 @@ class BlueskyTest(testutil.TestCase):
                      'com.atproto.repo.getRecord'
                      '?repo=did%3Aal%3Aice&collection=app.bsky.feed.post&rkey=bar')
 
+  @patch.object(util.session, 'get', return_value=requests_response({
+    'uri': 'at://did:fo:o/x.y.z/a',
+    'cid': 'sydddddd',
+    'value': {'foo': 'bar'},
+  }))
+  def test_from_as1_to_strong_ref_cache(self, mock_get):
+    for _ in range(2):
+      self.assertEqual({
+        'uri': 'at://did:fo:o/x.y.z/a',
+        'cid': 'sydddddd',
+        'value': {'foo': 'bar'},
+      }, from_as1_to_strong_ref({'id': 'at://did:fo:o/x.y.z/a'},
+                                client=self.bs._client, value=True))
+
+    self.assertEqual({
+      'uri': 'at://did:fo:o/x.y.z/a',
+      'cid': 'sydddddd',
+    }, from_as1_to_strong_ref('at://did:fo:o/x.y.z/a', client=self.bs._client))
+
+    mock_get.assert_called_once()
+
+  @patch.object(util.session, 'get')
+  def test_prefetch_strong_refs(self, mock_get):
+    self.bs._client._validate = False
+    def get(url, **kwargs):
+      if 'resolveHandle' in url:
+        return requests_response({'did': 'did:al:ice'})
+      elif 'getPosts' in url:
+        return requests_response({'posts': [{
+          'uri': f'at://did:al:ice/app.bsky.feed.post/{i}',
+          'cid': f'cid{i}',
+          'record': {'text': str(i)},
+        } for i in (1, 2)]})
+      elif 'getRecord' in url:
+        return requests_response({
+          'uri': 'at://did:al:ice/app.bsky.feed.generator/gen',
+          'cid': 'cidgen',
+          'value': {},
+        })
+      raise AssertionError(url)
+
+    mock_get.side_effect = get
+
+    got = prefetch_strong_refs([{
+      'objectType': 'note',
+      'inReplyTo': 'at://did:al:ice/app.bsky.feed.post/1',
+    }, {
+      'objectType': 'activity',
+      'verb': 'like',
+      'object': 'at://did:al:ice/app.bsky.feed.generator/gen',
+    }, {
+      'objectType': 'activity',
+      'verb': 'post',
+      'object': {
+        'objectType': 'note',
+        'attachments': [{
+          'objectType': 'note',
+          'url': 'https://bsky.app/profile/alice.com/post/2',
+        }],
+      },
+    }], self.bs._client)
+
+    self.assertEqual({
+      'at://did:al:ice/app.bsky.feed.post/1': 'cid1',
+      'at://alice.com/app.bsky.feed.post/2': 'cid2',
+      'at://did:al:ice/app.bsky.feed.generator/gen': 'cidgen',
+    }, {uri: record['cid'] for uri, record in got.items()})
+
+    self.assert_call(mock_get, 'com.atproto.identity.resolveHandle?handle=alice.com')
+    self.assertEqual(1, len([c for c in mock_get.call_args_list
+                             if 'getPosts' in c.args[0]]))
+    self.assert_call(mock_get, 'com.atproto.repo.getRecord?repo=did%3Aal%3Aice'
+                     '&collection=app.bsky.feed.generator&rkey=gen')
+
+    # now they're cached
+    mock_get.reset_mock()
+    self.assertEqual({
+      'uri': 'at://did:al:ice/app.bsky.feed.post/2',
+      'cid': 'cid2',
+    }, from_as1_to_strong_ref('https://bsky.app/profile/alice.com/post/2',
+                              client=self.bs._client))
+    mock_get.assert_not_called()
+
   @patch.object(util.session, 'get', return_value=requests_response(status=404))
   def test_from_as1_to_strong_ref_raise(self, mock_get):
     with self.assertRaises(ValueError):
@@ -936,6 +1027,97 @@ class BlueskyTest(testutil.TestCase):
       from_as1_to_strong_ref({'id': 'at://did:fo:o/x.y.z/a'},
                              client=self.bs._client, raise_=True)
 
+  @patch.object(util.session, 'get')
+  def test_resolve_handle_cache(self, mock_get):
+    mock_get.side_effect = [
+      requests_response({'did': 'did:al:ice'}),
+      requests_response({'error': 'InvalidRequest'}, status=400),
+    ]
+
+    for _ in range(2):
+      self.assertEqual('did:al:ice', resolve_handle('alice.com', self.bs._client))
+      self.assertEqual('did:al:ice', resolve_handle('Alice.com', self.bs._client))
+      self.assertIsNone(resolve_handle('nope.com', self.bs._client))
+
+    self.assertEqual(2, mock_get.call_count)
+    self.assert_call(mock_get, 'com.atproto.identity.resolveHandle?handle=alice.com')
+    self.assert_call(mock_get, 'com.atproto.identity.resolveHandle?handle=nope.com')
+
+  @patch.object(util.session, 'get', return_value=requests_response(status=503))
+  def test_resolve_handle_server_error_not_cached(self, mock_get):
+    for _ in range(2):
+      with self.assertRaises(requests.HTTPError):
+        resolve_handle('alice.com', self.bs._client)
+
+    self.assertEqual(2, mock_get.call_count)
+    self.assertEqual({}, resolve_handles(['alice.com'], self.bs._client))
+
+  @patch.object(util.session, 'get')
+  def test_prefetch_handles(self, mock_get):
+    def get(url, **kwargs):
+      handle = url.split('handle=')[1]
+      if handle == 'nope.com':
+        return requests_response(status=400)
+      return requests_response({'did': f'did:plc:{handle.split(".")[0]}'})
+
+    mock_get.side_effect = get
+
+    self.assertEqual({
+      'alice.com': 'did:plc:alice',
+      'bob.com': 'did:plc:bob',
+      'eve.com': 'did:plc:eve',
+      'nope.com': None,
+    }, prefetch_handles({
+      'objectType': 'note',
+      'content': 'hi',
+      'inReplyTo': 'at://alice.com/app.bsky.feed.post/123',
+      'tags': [{
+        'objectType': 'mention',
+        'displayName': '@bob.com',
+      }, {
+        'objectType': 'mention',
+        'url': 'https://bsky.app/profile/eve.com',
+      }, {
+        'objectType': 'mention',
+        'url': 'did:plc:already',
+      }, {
+        'objectType': 'mention',
+        'displayName': '@nope.com',
+      }],
+      'attachments': [{
+        'objectType': 'note',
+        'url': 'https://bsky.app/profile/alice.com/post/456',
+      }],
+    }, self.bs._client))
+    self.assertEqual(4, mock_get.call_count)
+
+    # now they're all cached
+    mock_get.reset_mock()
+    self.assertEqual('did:plc:bob', resolve_handle('bob.com', self.bs._client))
+    self.assertIsNone(resolve_handle('nope.com', self.bs._client))
+    mock_get.assert_not_called()
+
+  @patch.object(util.session, 'get')
+  def test_from_as1_multiple_mentions_resolved_once(self, mock_get):
+    mock_get.side_effect = lambda url, **kwargs: requests_response({
+      'did': f'did:plc:{url.split("handle=")[1].split(".")[0]}',
+    })
+
+    obj = {
+      'objectType': 'note',
+      'content': 'hi @alice.com and @bob.com',
+      'tags': [{
+        'objectType': 'mention',
+        'displayName': f'@{handle}',
+      } for handle in ('alice.com', 'bob.com')],
+    }
+    for _ in range(2):
+      got = from_as1(obj, client=self.bs)
+      self.assertEqual(['did:plc:alice', 'did:plc:bob'],
+                       sorted(f['features'][0]['did'] for f in got['facets']))
+
+    self.assertEqual(2, mock_get.call_count)
+
   def test_from_as1_missing_objectType_or_verb(self):
     for obj in [
         {'content': 'foo'},
@@ -4578,6 +4760,43 @@ class BlueskyTest(testutil.TestCase):
 
     self.assert_call(mock_get, 'app.bsky.feed.getTimeline')
 
+  @patch.object(util.session, 'get')
+  def test_get_activities_min_id(self, mock_get):
+    self.bs._client._validate = False
+    repost = copy.deepcopy(REPOST_BSKY_FEED_VIEW_POST)
+    repost['reason']['indexedAt'] = '2022-02-03T00:00:00.000Z'
+    mock_get.return_value = requests_response({
+      'cursor': 'timestamp::cid',
+      'feed': [POST_FEED_VIEW_BSKY, repost],
+    })
+
+    expected_repost = copy.deepcopy(REPOST_AS)
+    expected_repost['actor']['username'] = 'bob.com'
+    self.assert_equals([expected_repost], self.bs.get_activities(
+      group_id=FRIENDS, min_id='2022-01-02T03:04:05.000Z'))
+
+  @patch.object(util.session, 'get')
+  def test_get_activities_min_id_different_formats(self, mock_get):
+    self.bs._client._validate = False
+    post = copy.deepcopy(POST_FEED_VIEW_BSKY)
+    post['post']['indexedAt'] = '2022-01-02T03:04:05Z'
+    repost = copy.deepcopy(REPOST_BSKY_FEED_VIEW_POST)
+    repost['reason']['indexedAt'] = '2022-02-03T00:00:00.000Z'
+
+    expected_repost = copy.deepcopy(REPOST_AS)
+    expected_repost['actor']['username'] = 'bob.com'
+
+    # all the same instant as the post's indexedAt, so it's skipped
+    for min_id in ('2022-01-02T03:04:05.000Z', '2022-01-02T03:04:05+00:00',
+                   '2022-01-02T04:04:05+01:00'):
+      with self.subTest(min_id=min_id):
+        mock_get.return_value = requests_response({
+          'cursor': 'timestamp::cid',
+          'feed': [copy.deepcopy(post), copy.deepcopy(repost)],
+        })
+        self.assert_equals([expected_repost], self.bs.get_activities(
+          group_id=FRIENDS, min_id=min_id))
+
   @patch.object(util.session, 'get')
   def test_get_activities_activity_id(self, mock_get):
     self.bs._client._validate = False
@@ -4666,6 +4885,78 @@ class BlueskyTest(testutil.TestCase):
         'app.bsky.feed.getRepostedBy?uri=at%3A%2F%2Fdid%3Aal%3Aice%2Fapp.bsky.feed.post%2Ftid')
     self.assert_equals(1, cache.get('ABRP at://did:al:ice/app.bsky.feed.post/tid'))
 
+  @patch.object(util.session, 'get')
+  def test_get_activities_likes_pagination(self, mock_get):
+    bob_like = {
+      **GET_LIKES_LIKE_BSKY,
+      'actor': {**ACTOR_PROFILE_VIEW_BSKY, 'did': 'did:bo:b', 'handle': 'bob.com'},
+    }
+    mock_get.side_effect = [
+      requests_response({
+        'feed': [POST_FEED_VIEW_WITH_LIKES_BSKY],
+      }),
+      requests_response({
+        'cursor': 'kursor',
+        'uri': 'at://did:al:ice/app.bsky.feed.post/tid',
+        'likes': [GET_LIKES_LIKE_BSKY],
+      }),
+      requests_response({
+        'cursor': 'not-followed',
+        'uri': 'at://did:al:ice/app.bsky.feed.post/tid',
+        'likes': [bob_like],
+      }),
+    ]
+
+    bs = Bluesky(handle='handull', did='did:dy:d', access_token='towkin',
+                 max_pages=2)
+    bs._client._validate = False
+    got = bs.get_activities(fetch_likes=True)
+
+    self.assertEqual(
+      ['tag:bsky.app:did:web:alice.com', 'tag:bsky.app:did:bo:b'],
+      [tag['author']['id'] for tag in got[0]['object']['tags']])
+    self.assertEqual(3, mock_get.call_count)
+    self.assertIn('cursor=kursor', mock_get.call_args_list[2].args[0])
+
+  @patch.object(util.session, 'get')
+  def test_get_activities_fetches_likes_concurrently(self, mock_get):
+    post_2 = copy.deepcopy(POST_FEED_VIEW_WITH_LIKES_BSKY)
+    post_2['post']['uri'] = 'at://did:al:ice/app.bsky.feed.post/tid2'
+
+    # both getLikes calls have to be in flight at once to get past this
+    barrier = threading.Barrier(2, timeout=5)
+
+    def get(url, **kwargs):
+      if 'getTimeline' in url:
+        return requests_response({
+          'feed': [POST_FEED_VIEW_WITH_LIKES_BSKY, post_2],
+        })
+      assert 'getLikes' in url, url
+      barrier.wait()
+      return requests_response({'likes': [GET_LIKES_LIKE_BSKY]})
+
+    mock_get.side_effect = get
+
+    bs = Bluesky(handle='handull', did='did:dy:d', access_token='towkin',
+                 max_concurrency=2)
+    bs._client._validate = False
+    got = bs.get_activities(fetch_likes=True)
+    self.assertEqual([1, 1], [len(a['object']['tags']) for a in got])
+
+  @patch.object(util.session, 'get')
+  def test_get_activities_activity_id_fetch_replies_reuses_thread(self, mock_get):
+    self.bs._client._validate = False
+    thread = copy.deepcopy(THREAD_BSKY)
+    thread['post']['replyCount'] = 2
+    mock_get.return_value = requests_response({'thread': thread})
+
+    got = self.bs.get_activities(activity_id='at://i.d', fetch_replies=True)
+    self.assertEqual([r['id'] for r in THREAD_AS['object']['replies']['items']],
+                     [r['id'] for r in got[0]['object']['replies']['items']])
+
+    mock_get.assert_called_once()
+    self.assert_call(mock_get, 'app.bsky.feed.getPostThread?uri=at%3A%2F%2Fi.d')
+
   @patch.object(util.session, 'get')
   def test_get_activities_include_shares(self, mock_get):
     self.bs._client._validate = False
@@ -4780,6 +5071,38 @@ class BlueskyTest(testutil.TestCase):
     }
     self.assert_equals([expected], self.bs.get_activities(fetch_replies=True))
 
+  def test_walk_replies(self):
+    def reply(name, created, replies=()):
+      return {
+        'post': {'uri': name, 'record': {'createdAt': created}},
+        'replies': list(replies),
+      }
+
+    thread = reply('root', '2022-01-01', [
+      reply('b', '2022-01-03', [reply('b1', '2022-01-04')]),
+      reply('a', '2022-01-02', [
+        reply('a1', '2022-01-05', [reply('a1x', '2022-01-06')]),
+      ]),
+    ])
+
+    def walk(**kwargs):
+      return [r['post']['uri'] for r in self.bs._walk_replies(thread, **kwargs)]
+
+    self.assertEqual(['a', 'b', 'b1', 'a1', 'a1x'], walk())
+    self.assertEqual(['a', 'b'], walk(max_depth=1))
+    self.assertEqual(['a', 'b', 'b1', 'a1'], walk(max_depth=2))
+    self.assertEqual(['a', 'b', 'b1'], walk(max_count=3))
+
+  def test_walk_replies_deep_thread(self):
+    thread = leaf = {'post': {'record': {'createdAt': '2022'}}, 'replies': []}
+    for _ in range(5000):
+      child = {'post': {'record': {'createdAt': '2022'}}, 'replies': []}
+      leaf['replies'].append(child)
+      leaf = child
+
+    self.assertEqual(5000, len(list(self.bs._walk_replies(thread, max_depth=5000))))
+    self.assertEqual(Bluesky.MAX_REPLY_DEPTH, len(list(self.bs._walk_replies(thread))))
+
   @patch.object(util.session, 'get')
   def test_get_activities_skip_unknown_type(self, mock_get):
     self.bs._client._validate = False
@@ -5034,6 +5357,7 @@ class BlueskyTest(testutil.TestCase):
   @patch.object(util.session, 'post')
   @patch.object(util.session, 'get')
   def test_create_reply(self, mock_get, mock_post):
+    self.bs._client._validate = False
     post_at_uri = 'at://did:al:ice/app.bsky.feed.post/parent-tid'
     for in_reply_to in [post_at_uri,
                         'https://bsky.app/profile/did:al:ice/post/parent-tid']:
@@ -5068,6 +5392,45 @@ class BlueskyTest(testutil.TestCase):
           'record': reply_bsky,
         })
 
+  @patch.object(util.session, 'post')
+  @patch.object(util.session, 'get')
+  def test_create_reply_with_quote_fetches_strong_refs_together(
+      self, mock_get, mock_post):
+    self.bs._client._validate = False
+    def get(url, **kwargs):
+      if 'getPosts' in url:
+        return requests_response({'posts': [{
+          'uri': 'at://did:al:ice/app.bsky.feed.post/parent-tid',
+          'cid': 'reply+syd',
+          'record': {},
+        }, {
+          'uri': 'at://did:bo:b/app.bsky.feed.post/quoted',
+          'cid': 'quote+syd',
+          'record': {},
+        }]})
+      raise AssertionError(url)
+
+    mock_get.side_effect = get
+    mock_post.return_value = requests_response({
+      'uri': 'at://did:plc:me/app.bsky.feed.post/abc123',
+      'cid': 'sydddddd',
+    })
+
+    self.bs.create({
+      **REPLY_AS['object'],
+      'attachments': [{
+        'objectType': 'note',
+        'id': 'at://did:bo:b/app.bsky.feed.post/quoted',
+      }],
+    })
+
+    mock_get.assert_called_once()
+    self.assertIn('getPosts', mock_get.call_args.args[0])
+
+    record = mock_post.call_args.kwargs['json']['record']
+    self.assertEqual('reply+syd', record['reply']['parent']['cid'])
+    self.assertEqual('quote+syd', record['embed']['record']['cid'])
+
   def test_create_reply_to_non_bluesky_error(self):
     resp = self.bs.create({
       **REPLY_AS['object'],
@@ -5584,6 +5947,46 @@ class BlueskyTest(testutil.TestCase):
       'record': expected,
     })
 
+  @patch.object(util.session, 'post')
+  @patch.object(util.session, 'get')
+  def test_upload_media_cache(self, mock_get, mock_post):
+    mock_get.side_effect = lambda *args, **kwargs: requests_response(
+      b'something', headers={'Content-Type': 'video/mpeg'})
+    mock_post.return_value = requests_response({'blob': NEW_BLOB})
+
+    media = [{'url': NEW_BLOB_URL}, {'url': NEW_BLOB_URL}]
+    expected = ({NEW_BLOB_URL: NEW_BLOB}, {})
+    self.assertEqual(expected, self.bs.upload_media(media))
+    self.assertEqual(expected, self.bs.upload_media(media))
+    self.assertEqual(1, mock_get.call_count)
+    self.assertEqual(1, mock_post.call_count)
+
+    # blobs belong to the account that uploaded them
+    other = Bluesky(handle='other', did='did:ot:her', access_token='towkin')
+    self.assertEqual(expected, other.upload_media(media))
+    self.assertEqual(2, mock_get.call_count)
+    self.assertEqual(2, mock_post.call_count)
+
+  @patch.object(util.session, 'post')
+  @patch.object(util.session, 'get')
+  def test_upload_media_concurrently(self, mock_get, mock_post):
+    # both downloads have to be in flight at once to get past this
+    barrier = threading.Barrier(2, timeout=5)
+
+    def get(url, **kwargs):
+      barrier.wait()
+      return requests_response(url.encode(), headers={'Content-Type': 'video/mpeg'})
+
+    mock_get.side_effect = get
+    mock_post.return_value = requests_response({'blob': NEW_BLOB})
+
+    bs = Bluesky(handle='handull', did='did:dy:d', access_token='towkin',
+                 max_concurrency=2)
+    self.assertEqual(({'http://pic/1': NEW_BLOB, 'http://pic/2': NEW_BLOB}, {}),
+                     bs.upload_media([{'url': 'http://pic/1'},
+                                      {'url': 'http://pic/2'}]))
+    self.assertEqual(2, mock_post.call_count)
+
   @patch.object(util.session, 'post')
   def test_preview_with_too_many_media(self, mock_post):
     max_images = LEXRPC.defs['app.bsky.embed.images']['properties']['images']['maxLength']
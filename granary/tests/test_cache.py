@@ -0,0 +1,152 @@
+"""Unit tests for cache.py."""
+import multiprocessing
+import os
+import tempfile
+import time
+
+from webutil import testutil, util
+from webutil.testutil import requests_response
+
+from .. import cache
+from ..cache import MemoryCache, SharedMemoryCache, SqliteCache
+from .. import mastodon, source
+from .test_mastodon import ACCOUNT, INSTANCE, STATUS_WITH_COUNTS
+
+
+class CountingCache(MemoryCache):
+  """Records get_multi and set_multi calls."""
+  def __init__(self, **kwargs):
+    super().__init__(**kwargs)
+    self.calls = []
+
+  def get_multi(self, keys):
+    keys = list(keys)
+    self.calls.append(('get_multi', keys))
+    return super().get_multi(keys)
+
+  def set_multi(self, values):
+    self.calls.append(('set_multi', values))
+    super().set_multi(values)
+
+
+def _shared_worker(shared, i):
+  shared.set_multi({f'k{i}': i})
+  return shared.get_multi(['k0', f'k{i}'])
+
+
+class CacheTest(testutil.TestCase):
+
+  def check_mapping(self, c):
+    self.assertEqual(0, len(c))
+    self.assertNotIn('a', c)
+    with self.assertRaises(KeyError):
+      c['a']
+
+    c['a'] = 1
+    c.set_multi({'b': {'x': [2]}, 'c': 3})
+    self.assertEqual(1, c['a'])
+    self.assertEqual({'x': [2]}, c.get('b'))
+    self.assertEqual(3, len(c))
+    self.assertCountEqual(['a', 'b', 'c'], list(c))
+    self.assertEqual({'a': 1, 'c': 3}, c.get_multi(['a', 'c', 'd']))
+
+    del c['a']
+    self.assertNotIn('a', c)
+    with self.assertRaises(KeyError):
+      del c['a']
+
+  def test_get_set_multi_dict(self):
+    d = {'a': 1}
+    self.assertEqual({'a': 1}, cache.get_multi(d, ['a', 'b']))
+    cache.set_multi(d, {'b': 2})
+    self.assertEqual({'a': 1, 'b': 2}, d)
+
+  def test_memory(self):
+    self.check_mapping(MemoryCache())
+
+  def test_memory_lru(self):
+    c = MemoryCache(maxsize=2)
+    c.set_multi({'a': 1, 'b': 2})
+    c['a']
+    c['c'] = 3
+    self.assertEqual({'a': 1, 'c': 3}, c.get_multi(['a', 'b', 'c']))
+
+  def test_memory_ttl(self):
+    c = MemoryCache(ttl=.05)
+    c['a'] = 1
+    self.assertEqual(1, c['a'])
+    time.sleep(.1)
+    self.assertNotIn('a', c)
+
+  def test_sqlite(self):
+    self.check_mapping(SqliteCache(':memory:'))
+
+  def test_sqlite_persists(self):
+    with tempfile.TemporaryDirectory() as dir:
+      path = os.path.join(dir, 'cache.db')
+      c = SqliteCache(path)
+      c.set_multi({'a': 1, 'b': 2})
+      c.close()
+
+      c = SqliteCache(path)
+      self.assertEqual({'a': 1, 'b': 2}, c.get_multi(['a', 'b']))
+      c.close()
+
+  def test_sqlite_ttl(self):
+    c = SqliteCache(':memory:', ttl=10)
+    c['a'] = 1
+    self.assertEqual(1, c['a'])
+
+    now = time.time()
+    self.start_patch(time, 'time').return_value = now + 11
+    self.assertNotIn('a', c)
+    self.assertEqual(0, len(c))
+    self.assertEqual({}, c.get_multi(['a']))
+
+  def test_sqlite_get_multi_many_keys(self):
+    c = SqliteCache(':memory:')
+    values = {str(i): i for i in range(cache.SQLITE_MAX_VARS * 2 + 1)}
+    c.set_multi(values)
+    self.assertEqual(values, c.get_multi(values.keys()))
+
+  def test_shared_memory(self):
+    c = SharedMemoryCache()
+    self.addCleanup(c.shutdown)
+    self.check_mapping(c)
+
+  def test_shared_memory_across_processes(self):
+    c = SharedMemoryCache()
+    self.addCleanup(c.shutdown)
+    c['k0'] = 0
+
+    with multiprocessing.get_context('spawn').Pool(2) as pool:
+      got = pool.starmap(_shared_worker, [(c, 1), (c, 2)])
+
+    self.assertEqual([{'k0': 0, 'k1': 1}, {'k0': 0, 'k2': 2}], got)
+    self.assertEqual({'k0': 0, 'k1': 1, 'k2': 2}, dict(c))
+
+  def test_mastodon_get_activities_bulk_reads_and_writes(self):
+    self.start_patch(util.session, 'get').side_effect = [
+      requests_response([STATUS_WITH_COUNTS]),
+      requests_response({'descendants': []}),
+      requests_response([]),
+    ]
+
+    c = CountingCache()
+    c['AMRB 123'] = 3
+
+    mastodon.Mastodon(INSTANCE, user_id=ACCOUNT['id'], access_token='towkin'
+                      ).get_activities(fetch_replies=True, fetch_likes=True,
+                                       fetch_shares=True, cache=c)
+
+    # the conditional request state is a separate read because it has to
+    # happen before the API call, and the count keys depend on its response
+    method, keys = c.calls[0]
+    self.assertEqual('get_multi', method)
+    self.assertEqual(1, len(keys))
+    self.assertTrue(keys[0].startswith(source.CONDITIONAL_CACHE_PREFIX))
+
+    self.assertEqual([
+      ('get_multi', ['AMRE 123', 'AMF 123', 'AMRB 123']),
+      ('set_multi', {'AMRE 123': 1, 'AMF 123': 2}),
+    ], c.calls[1:])
@@ -0,0 +1,97 @@
+"""Unit tests for convert.py."""
+from unittest.mock import Mock, patch
+
+from webutil import testutil
+
+from .. import as2, convert
+
+NOTE = {
+  'objectType': 'note',
+  'id': 'http://example.com/note',
+  'content': 'hello',
+}
+NOTE_AS2 = {
+  '@context': 'https://www.w3.org/ns/activitystreams',
+  'type': 'Note',
+  'id': 'http://example.com/note',
+  'content': 'hello',
+}
+
+
+class ConvertTest(testutil.TestCase):
+
+  def test_convert_many_unsupported_format(self):
+    for from_format, to_format in ('atom', 'as1'), ('as1', 'rss'), ('x', 'y'):
+      with self.subTest(from_format=from_format, to_format=to_format), \
+           self.assertRaises(ValueError):
+        convert.convert_many([NOTE], from_format, to_format)
+
+  def test_convert_many_empty(self):
+    self.assertEqual([], convert.convert_many([], 'as1', 'as2'))
+
+  def test_convert_many_as1_to_as1(self):
+    self.assertEqual([NOTE], convert.convert_many([NOTE], 'as1', 'as1'))
+
+  def test_convert_many_from_as1(self):
+    other = {**NOTE, 'id': 'http://example.com/other'}
+    self.assert_equals([as2.from_as1(NOTE), as2.from_as1(other)],
+                       convert.convert_many([NOTE, other], 'as1', 'as2'))
+
+  def test_convert_many_to_as1(self):
+    self.assert_equals([as2.to_as1(NOTE_AS2)],
+                       convert.convert_many([NOTE_AS2], 'as2', 'as1'))
+
+  def test_convert_many_via_as1(self):
+    got = convert.convert_many([NOTE_AS2], 'as2', 'mf2-json')
+    self.assert_equals([{
+      'type': ['h-entry'],
+      'properties': {
+        'uid': ['http://example.com/note'],
+        'content': ['hello'],
+      },
+    }], got)
+
+  def test_convert_many_kwargs(self):
+    got = convert.convert_many([NOTE], 'as1', 'as2', context=None)
+    self.assertNotIn('@context', got[0])
+
+  def test_convert_many_dedupes(self):
+    from_as1 = Mock(side_effect=lambda obj: {'content': obj['content']})
+    with patch.dict(convert.FORMATS, {'fake': (None, from_as1)}):
+      got = convert.convert_many([NOTE, {**NOTE}, NOTE], 'as1', 'fake')
+
+    from_as1.assert_called_once_with(NOTE)
+    self.assertEqual(3, len(got))
+    self.assertEqual(got[0], got[1])
+    self.assertEqual(got[0], got[2])
+
+    # duplicates get their own copies
+    self.assertIsNot(got[0], got[1])
+    got[1]['content'] = 'changed'
+    self.assertEqual('hello', got[0]['content'])
+
+  def test_convert_many_same_id_different_content(self):
+    changed = {**NOTE, 'content': 'changed'}
+    got = convert.convert_many([NOTE, changed, {**NOTE}], 'as1', 'as2')
+    self.assertEqual(['hello', 'changed', 'hello'], [o['content'] for o in got])
+
+  def test_convert_many_no_id_not_deduped(self):
+    no_id = {'objectType': 'note', 'content': 'hello'}
+    from_as1 = Mock(side_effect=lambda obj: {'content': obj['content']})
+    with patch.dict(convert.FORMATS, {'fake': (None, from_as1)}):
+      got = convert.convert_many([no_id, {**no_id}], 'as1', 'fake')
+
+    self.assertEqual(2, from_as1.call_count)
+    self.assertEqual([{'content': 'hello'}] * 2, got)
+
+  @patch.object(convert, '_key')
+  def test_convert_many_single_object_no_key(self, mock_key):
+    convert.convert_many([NOTE], 'as1', 'as2')
+    mock_key.assert_not_called()
+
+  def test_convert_many_process_pool(self):
+    notes = [{**NOTE, 'id': f'http://example.com/{i}', 'content': str(i)}
+             for i in range(convert.MIN_PROCESS_POOL_BATCH)]
+    got = convert.convert_many(notes, 'as1', 'nostr', processes=2)
+    self.assertEqual([str(i) for i in range(len(notes))],
+                     [event['content'] for event in got])
@@ -12,6 +12,7 @@ from webutil import testutil, util
 
 from ..farcaster import (
   BLAKE3_HASH_LENGTH_BYTES,
+  channels,
   Farcaster,
   farcaster_uri_to_web_url,
   FARCASTER_EPOCH,
@@ -63,6 +64,15 @@ data {{
   return msg
 
 
+class FakeFuture:
+  """Fake of :class:`grpc.Future`. ``result`` calls ``fn`` and returns its value."""
+  def __init__(self, fn):
+    self.fn = fn
+
+  def result(self, timeout=None):
+    return self.fn()
+
+
 def user_data_message(fid, user_data_type, value):
   escaped = (value.replace('\\', '\\\\').replace('"', '\\"')
              .replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t'))
@@ -978,6 +988,10 @@ class FarcasterClientTest(testutil.TestCase):
   anything extra, since we're faking the server response either way.
   """
 
+  def setUp(self):
+    super().setUp()
+    channels.clear()
+
   def test_user_url(self, _):
     self.assertEqual('https://farcaster.xyz/~/profiles/123', Farcaster.user_url(123))
 
@@ -1009,8 +1023,52 @@ class FarcasterClientTest(testutil.TestCase):
     mock_stub.return_value.GetUserDataByFid.assert_called_once_with(
       FidRequest(fid=456))
 
+  @patch('grpc.secure_channel')
+  def test_shared_channel(self, mock_channel, mock_stub):
+    Farcaster('snap.chain')
+    Farcaster('snap.chain')
+    mock_channel.assert_called_once()
+    self.assertEqual('snap.chain:3383', mock_channel.call_args.args[0])
+
+    Farcaster('other.chain')
+    self.assertEqual(2, mock_channel.call_count)
+
+  def test_get_actors(self, mock_stub):
+    futures = {
+      456: user_data_message(456, 'USER_DATA_TYPE_USERNAME', 'alice'),
+      789: user_data_message(789, 'USER_DATA_TYPE_USERNAME', 'bob'),
+    }
+    started = []
+
+    def future(req):
+      started.append(req.fid)
+      return FakeFuture(lambda: self.assertEqual([456, 789], started)
+                        or MessagesResponse(messages=[futures[req.fid]]))
+
+    mock_stub.return_value.GetUserDataByFid.future.side_effect = future
+
+    actors = Farcaster().get_actors([456, 789, 456])
+    self.assertEqual({456: 'alice', 789: 'bob'},
+                     {fid: a['username'] for fid, a in actors.items()})
+    self.assertEqual([456, 789], started)
+    mock_stub.return_value.GetUserDataByFid.assert_not_called()
+
+  def test_get_actors_rpc_error(self, mock_stub):
+    def result(fid):
+      if fid == 789:
+        raise grpc.RpcError('boom')
+      return MessagesResponse(messages=[
+        user_data_message(fid, 'USER_DATA_TYPE_USERNAME', 'alice')])
+
+    mock_stub.return_value.GetUserDataByFid.future.side_effect = \
+      lambda req: FakeFuture(lambda: result(req.fid))
+
+    actors = Farcaster().get_actors([456, 789])
+    self.assertEqual({456: 'alice'},
+                     {fid: a['username'] for fid, a in actors.items()})
+
   def test_to_as1_cast_with_mentions_client(self, mock_stub):
-    mock_stub.return_value.GetUserDataByFid.return_value = \
+    mock_stub.return_value.GetUserDataByFid.future.return_value.result.return_value = \
       MessagesResponse(messages=[
         user_data_message(456, 'USER_DATA_TYPE_USERNAME', 'alice'),
       ])
@@ -1039,7 +1097,7 @@ cast_add_body {
       }],
     }, to_as1(msg, client=Farcaster()))
 
-    mock_stub.return_value.GetUserDataByFid.assert_called_once_with(
+    mock_stub.return_value.GetUserDataByFid.future.assert_called_once_with(
       FidRequest(fid=456))
 
   def test_get_fid(self, mock_stub):
@@ -1074,7 +1132,7 @@ cast_add_body {
 type: MESSAGE_TYPE_CAST_ADD
 cast_add_body { text: "Hello!" }
 """)
-    mock_stub.return_value.GetCastsByFid.return_value = \
+    mock_stub.return_value.GetCastsByFid.future.return_value.result.return_value = \
       MessagesResponse(messages=[cast])
 
     fc = Farcaster()
@@ -1102,21 +1160,33 @@ cast_add_body { text: "Hello!" }
         },
       }],
     }, resp)
-    mock_stub.return_value.GetCastsByFid.assert_called_once_with(
+    mock_stub.return_value.GetCastsByFid.future.assert_called_once_with(
       FidRequest(fid=123, reverse=True))
 
+  def test_get_activities_response_min_id(self, mock_stub):
+    old = message('type: MESSAGE_TYPE_CAST_ADD cast_add_body { text: "old" }')
+    new = message('type: MESSAGE_TYPE_CAST_ADD cast_add_body { text: "new" }')
+    new.data.timestamp += 10
+    mock_stub.return_value.GetCastsByFid.future.return_value.result.return_value = \
+      MessagesResponse(messages=[new, old])
+
+    fc = Farcaster()
+    activities = fc.get_activities(user_id='123',
+                                   min_id=str(old.data.timestamp))
+    self.assertEqual(['new'], [a['object']['content'] for a in activities])
+
   def test_get_activities_response_count(self, mock_stub):
-    mock_stub.return_value.GetCastsByFid.return_value = \
+    mock_stub.return_value.GetCastsByFid.future.return_value.result.return_value = \
       MessagesResponse()
 
     fc = Farcaster()
     fc.get_activities_response(user_id='123', count=10)
 
-    mock_stub.return_value.GetCastsByFid.assert_called_once_with(
+    mock_stub.return_value.GetCastsByFid.future.assert_called_once_with(
       FidRequest(fid=123, page_size=10, reverse=True))
 
   def test_get_activities_response_fetch_likes(self, mock_stub):
-    mock_stub.return_value.GetCastsByFid.return_value = \
+    mock_stub.return_value.GetCastsByFid.future.return_value.result.return_value = \
       MessagesResponse()
     like = message("""
 type: MESSAGE_TYPE_REACTION_ADD
@@ -1125,7 +1195,7 @@ reaction_body {
   target_cast_id { fid: 456  hash: "\\xab\\xcd" }
 }
 """)
-    mock_stub.return_value.GetReactionsByFid.return_value = \
+    mock_stub.return_value.GetReactionsByFid.future.return_value.result.return_value = \
       MessagesResponse(messages=[like])
 
     fc = Farcaster('snap.chain')
@@ -1142,17 +1212,44 @@ reaction_body {
       },
       'published': '2022-01-02T03:04:05+00:00',
     }], resp['items'])
-    mock_stub.return_value.GetReactionsByFid.assert_called_once_with(
+    mock_stub.return_value.GetReactionsByFid.future.assert_called_once_with(
       ReactionsByFidRequest(fid=123, reaction_type=REACTION_TYPE_LIKE, reverse=True))
 
+  def test_get_activities_response_issues_rpcs_concurrently(self, mock_stub):
+    started = []
+
+    def future(name, resp):
+      def issue(req):
+        started.append(name)
+        # every RPC is issued before we wait on any of them
+        return FakeFuture(lambda: self.assertEqual(3, len(started)) or resp)
+      return issue
+
+    cast = message('type: MESSAGE_TYPE_CAST_ADD cast_add_body { text: "post" }')
+    mention = message('type: MESSAGE_TYPE_CAST_ADD cast_add_body { text: "mention" }',
+                      fid=456)
+    hub = mock_stub.return_value
+    hub.GetCastsByFid.future.side_effect = future(
+      'casts', MessagesResponse(messages=[cast]))
+    hub.GetCastsByMention.future.side_effect = future(
+      'mentions', MessagesResponse(messages=[mention]))
+    hub.GetReactionsByFid.future.side_effect = future(
+      'likes', MessagesResponse())
+
+    activities = Farcaster().get_activities(
+      user_id='123', fetch_mentions=True, fetch_likes=True)
+    self.assertEqual(['post', 'mention'],
+                     [a['object']['content'] for a in activities])
+    self.assertEqual(['casts', 'mentions', 'likes'], started)
+
   def test_get_activities_response_fetch_mentions(self, mock_stub):
     mention = message("""
 type: MESSAGE_TYPE_CAST_ADD
 cast_add_body { text: "Hey !"  mentions: 123  mentions_positions: 4 }
 """)
-    mock_stub.return_value.GetCastsByFid.return_value = \
+    mock_stub.return_value.GetCastsByFid.future.return_value.result.return_value = \
       MessagesResponse()
-    mock_stub.return_value.GetCastsByMention.return_value = \
+    mock_stub.return_value.GetCastsByMention.future.return_value.result.return_value = \
       MessagesResponse(messages=[mention])
 
     fc = Farcaster()
@@ -1160,5 +1257,5 @@ cast_add_body { text: "Hey !"  mentions: 123  mentions_positions: 4 }
 
     self.assertEqual(1, len(resp['items']))
     self.assertEqual('Hey @123!', resp['items'][0]['object']['content'])
-    mock_stub.return_value.GetCastsByMention.assert_called_once_with(
+    mock_stub.return_value.GetCastsByMention.future.assert_called_once_with(
       FidRequest(fid=123, reverse=True))
@@ -675,6 +675,67 @@ class FlickrTest(testutil.TestCase):
       ('flickr.photos.getInfo', {'photo_id': '5227922370'}),
       ('flickr.photos.getFavorites', {'photo_id': '5227922370'}))
 
+  def test_get_activities_use_activity_feed(self):
+    self.mock_urlopen.side_effect = [
+      api_result(json_dumps(CONTACTS_PHOTOS)),
+      api_result(json_dumps({'items': {'page': 1, 'pages': 2, 'item': [{
+        'type': 'photo',
+        'id': '1234',
+        'activity': {'event': [{
+          'type': 'comment',
+          'commentid': '4942564-1234-72157625845945286',
+          'user': '36398523@N00',
+          'username': 'if winter ends',
+          'dateadded': '1295288643',
+          '_content': 'Love this!',
+        }, {
+          'type': 'fave',
+          'user': '95922884@N00',
+          'username': 'absentmindedprof',
+          'dateadded': '1295288700',
+        }]},
+      }]}})),
+      api_result(json_dumps({'items': {'page': 2, 'pages': 2, 'item': [{
+        'type': 'photo',
+        'id': '999',  # not in this page of photos
+        'activity': {'event': [{'type': 'fave', 'user': '1@N00'}]},
+      }]}})),
+    ]
+
+    first, second = self.flickr.get_activities(
+      group_id=source.SELF, fetch_replies=True, fetch_likes=True,
+      use_activity_feed=True)
+
+    self.assert_equals([{
+      'objectType': 'comment',
+      'id': tag_uri('4942564-1234-72157625845945286'),
+      'url': 'https://www.flickr.com/photos/5555/1234/#comment72157625845945286',
+      'inReplyTo': [{'id': tag_uri('1234')}],
+      'content': 'Love this!',
+      'published': '2011-01-17T18:24:03+00:00',
+      'updated': '2011-01-17T18:24:03+00:00',
+      'author': {
+        'objectType': 'person',
+        'id': tag_uri('36398523@N00'),
+        'displayName': 'if winter ends',
+        'username': 'if winter ends',
+        'url': 'https://www.flickr.com/people/36398523@N00/',
+      },
+    }], first['object']['replies']['items'], ignore=['image'])
+    self.assertEqual([tag_uri('1234_liked_by_95922884@N00')], [
+      t['id'] for t in first['object']['tags'] if t.get('verb') == 'like'])
+    self.assertFalse(second['object'].get('replies', {}).get('items'))
+
+    per_page = {'timeframe': '30d', 'per_page': 50}
+    self.assert_api_calls(
+      ('flickr.people.getPhotos', {
+        'extras': flickr.Flickr.API_EXTRAS,
+        'per_page': 0,
+        'user_id': 'me',
+      }),
+      ('flickr.activity.userPhotos', {**per_page, 'page': 1}),
+      ('flickr.activity.userPhotos', {**per_page, 'page': 2}))
+
   def test_favorite_without_display_name(self):
     """Make sure faves fall back to the username if the user did not
     supply a real name.
@@ -1,5 +1,6 @@
 """Unit tests for github.py."""
 import copy
+import threading
 from unittest import skip
 from unittest.mock import patch
 
@@ -498,6 +499,32 @@ class GitHubTest(testutil.TestCase):
     self.assert_get(REST_REACTIONS % ('foo', 'bar', 444))
     self.assert_get(REST_REACTIONS % ('foo', 'bar', 333))
 
+  def test_get_activities_fetch_likes_concurrently(self):
+    self.gh = github.GitHub('a-towkin', max_concurrency=2)
+
+    # both issue fetches, then both reaction fetches, have to be in flight at
+    # once to get past this
+    barrier = threading.Barrier(2, timeout=5)
+    responses = {
+      REST_NOTIFICATIONS: [NOTIFICATION_PULL_REST, NOTIFICATION_ISSUE_REST],
+      NOTIFICATION_PULL_REST['subject']['url']: PULL_REST,
+      NOTIFICATION_ISSUE_REST['subject']['url']: ISSUE_REST,
+      REST_REACTIONS % ('foo', 'bar', 444): [],
+      REST_REACTIONS % ('foo', 'bar', 333): [REACTION_REST, REACTION_REST],
+    }
+    def get(url, **kwargs):
+      if url != REST_NOTIFICATIONS:
+        barrier.wait()
+      return requests_response(responses[url])
+
+    self.mock_get.side_effect = get
+
+    pull_obj = copy.deepcopy(PULL_OBJ)
+    pull_obj['to'] = [{'objectType': 'group', 'alias': '@private'}]
+    self.assert_equals([pull_obj, ISSUE_OBJ_WITH_REACTIONS],
+                       self.gh.get_activities(fetch_likes=True))
+    self.assertEqual(5, self.mock_get.call_count)
+
   def test_get_activities_self_empty(self):
     self.mock_get.return_value = requests_response([])
     self.assert_equals([], self.gh.get_activities(count=12))
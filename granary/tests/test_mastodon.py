@@ -1,5 +1,6 @@
 """Unit tests for mastodon.py."""
 import copy
+import threading
 from unittest.mock import patch
 from urllib.parse import quote, unquote
 
@@ -452,6 +453,34 @@ class MastodonTest(testutil.TestCase):
     self.assert_get(API_TIMELINE)
     self.assert_get(API_REBLOGGED_BY % STATUS['id'])
 
+  def test_get_activities_fetch_replies_likes_shares_concurrently(self):
+    self.mastodon = mastodon.Mastodon(INSTANCE, user_id=ACCOUNT['id'],
+                                      access_token='towkin', max_concurrency=3)
+
+    # all three extra calls have to be in flight at once to get past this
+    barrier = threading.Barrier(3, timeout=5)
+    def get(url, **kwargs):
+      if url == INSTANCE + API_TIMELINE:
+        return requests_response([STATUS_WITH_COUNTS])
+      barrier.wait()
+      if url == INSTANCE + API_CONTEXT % STATUS['id']:
+        return requests_response({'descendants': [REPLY_STATUS]})
+      elif url == INSTANCE + API_FAVORITED_BY % STATUS['id']:
+        return requests_response([ACCOUNT])
+      elif url == INSTANCE + API_REBLOGGED_BY % STATUS['id']:
+        return requests_response([ACCOUNT_REMOTE])
+      assert False, url
+
+    self.mock_get.side_effect = get
+
+    expected = copy.deepcopy(ACTIVITY)
+    expected['object']['replies'] = {'items': [REPLY_ACTIVITY]}
+    expected['object']['tags'].extend([LIKE, SHARE_BY_REMOTE])
+    cache = {}
+    self.assert_equals([expected], self.mastodon.get_activities(
+      fetch_replies=True, fetch_likes=True, fetch_shares=True, cache=cache))
+    self.assert_equals({'AMRE 123': 1, 'AMF 123': 2, 'AMRB 123': 3}, cache)
+
   def test_get_activities_fetch_replies_likes_shares_counts_zero(self):
     self.mock_get.return_value = requests_response([STATUS])
     self.assert_equals([ACTIVITY], self.mastodon.get_activities(
@@ -479,6 +508,78 @@ class MastodonTest(testutil.TestCase):
     ]
     self.assert_equals([], self.mastodon.get_activities(fetch_mentions=True))
 
+  def test_get_activities_etag_not_modified(self):
+    self.mock_get.side_effect = [
+      requests_response([STATUS_WITH_COUNTS], headers={'ETag': '"abc"'}),
+      requests_response([ACCOUNT, ACCOUNT]),
+      requests_response('', status=304),
+    ]
+
+    with_likes = copy.deepcopy(ACTIVITY)
+    with_likes['object']['tags'].extend([LIKE, LIKE])
+
+    cache = {}
+    resp = self.mastodon.get_activities_response(fetch_likes=True, cache=cache)
+    self.assert_equals([with_likes], resp['items'])
+    self.assertEqual('"abc"', resp['etag'])
+    self.assertNotIn('If-None-Match', self.mock_get.call_args_list[0].kwargs['headers'])
+
+    # second poll sends the stored ETag, gets a 304, and returns the stored
+    # activities without fetching likes again
+    resp = self.mastodon.get_activities_response(fetch_likes=True, cache=cache)
+    self.assert_equals([with_likes], resp['items'])
+    self.assertEqual('"abc"', resp['etag'])
+    self.assertEqual(3, self.mock_get.call_count)
+    self.assertEqual('"abc"',
+                     self.mock_get.call_args.kwargs['headers']['If-None-Match'])
+
+  def test_get_activities_conditional_key_includes_options(self):
+    self.mock_get.side_effect = [
+      requests_response([STATUS_WITH_COUNTS], headers={'ETag': '"abc"'}),
+      requests_response([STATUS_WITH_COUNTS], headers={'ETag': '"abc"'}),
+    ]
+
+    # different options don't share stored activities or validators, so the
+    # second poll doesn't send the first's ETag or get its 304
+    cache = {}
+    self.mastodon.get_activities_response(cache=cache)
+    self.mastodon.get_activities_response(include_shares=False, cache=cache)
+    self.assertEqual(2, self.mock_get.call_count)
+    self.assertNotIn('If-None-Match', self.mock_get.call_args.kwargs['headers'])
+    self.assertEqual(2, len([key for key in cache
+                             if key.startswith(source.CONDITIONAL_CACHE_PREFIX)]))
+
+  def test_get_activities_min_id(self):
+    self.mock_get.return_value = requests_response([REPLY_STATUS])
+    self.assert_equals([REPLY_ACTIVITY], self.mastodon.get_activities(
+      group_id=source.SELF, min_id='123'))
+    self.assert_get(API_ACCOUNT_STATUSES % ACCOUNT['id'],
+                    params={'since_id': '123'})
+
+  def test_get_activities_etag_kwarg_not_modified(self):
+    self.mock_get.return_value = requests_response('', status=304)
+    resp = self.mastodon.get_activities_response(
+      group_id=source.SELF, etag='Tue, 01 Oct 2024 00:00:00 GMT')
+    self.assertEqual([], resp['items'])
+    self.assertEqual('Tue, 01 Oct 2024 00:00:00 GMT', resp['etag'])
+    self.assertEqual('Tue, 01 Oct 2024 00:00:00 GMT',
+                     self.mock_get.call_args.kwargs['headers']['If-Modified-Since'])
+
+  def test_get_activities_etag_changed(self):
+    self.mock_get.side_effect = [
+      requests_response([STATUS], headers={'ETag': '"abc"'}),
+      requests_response([REPLY_STATUS], headers={'ETag': '"def"'}),
+    ]
+
+    cache = {}
+    self.mastodon.get_activities(cache=cache)
+    resp = self.mastodon.get_activities_response(cache=cache)
+    self.assert_equals([REPLY_ACTIVITY], resp['items'])
+    self.assertEqual('"def"', resp['etag'])
+    self.assert_equals([REPLY_ACTIVITY], [
+      val['activities'] for key, val in cache.items()
+      if key.startswith(source.CONDITIONAL_CACHE_PREFIX)][0])
+
   def test_get_activities_activity_id(self):
     self.mock_get.return_value = requests_response(STATUS)
     self.assert_equals([ACTIVITY], self.mastodon.get_activities(activity_id=123))
@@ -1249,6 +1350,33 @@ class MastodonTest(testutil.TestCase):
     self.assertEqual(
       b'pic 1', self.mock_post.call_args_list[1].kwargs['files']['file'].read())
 
+  def test_create_with_media_concurrently(self):
+    self.mastodon = mastodon.Mastodon(INSTANCE, user_id=ACCOUNT['id'],
+                                      access_token='towkin', max_concurrency=2)
+
+    # both downloads have to be in flight at once to get past this
+    barrier = threading.Barrier(2, timeout=5)
+    def get(url, **kwargs):
+      barrier.wait()
+      return requests_response(url)
+
+    def post(url, **kwargs):
+      if url == INSTANCE + API_STATUSES:
+        return requests_response(STATUS)
+      # media id is the file's contents, ie its URL
+      return requests_response({'id': kwargs['files']['file'].read().decode()})
+
+    self.mock_get.side_effect = get
+    self.mock_post.side_effect = post
+
+    result = self.mastodon.create(MEDIA_OBJECT)
+    self.assert_equals(STATUS, result.content, result)
+    # media ids are in the original order, regardless of which upload finished first
+    self.assert_post(API_STATUSES, json={
+      'status': 'foo ☕ bar',
+      'media_ids': ['http://foo.com/video.mp4', 'http://foo.com/image.jpg'],
+    })
+
   def test_create_with_too_many_media(self):
     image_urls = [f'http://my/picture/{i}' for i in range(mastodon.MAX_MEDIA)]
     obj = {
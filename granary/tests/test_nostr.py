@@ -4,13 +4,14 @@ import copy
 from datetime import timedelta
 import logging
 import secrets
-from threading import Semaphore
+from threading import Event, Semaphore, Thread
 from unittest.mock import patch
 from urllib.parse import urlparse
 
 import requests
 from secp256k1 import PrivateKey, PublicKey
 from websockets.exceptions import ConnectionClosedOK, ConnectionClosedError
+from websockets.protocol import State
 from webutil import testutil, util
 from webutil.testutil import requests_response
 from webutil.util import HTTP_TIMEOUT, json_dumps, json_loads
@@ -39,6 +40,7 @@ from ..nostr import (
   URI_RE,
   uri_to_id,
   verify,
+  verify_many,
 )
 
 NOW_TS = int(testutil.NOW.timestamp())
@@ -148,6 +150,36 @@ def fake_connect(uri, open_timeout=None, close_timeout=None, **kwargs):
   yield FakeConnection
 
 
+class FakeRelayConnection:
+  """Fake relay connection that answers each ``REQ`` with stored events.
+
+  Unlike :class:`FakeConnection`, there's one per relay URL.
+  """
+  def __init__(self, uri, events=(), challenge=None):
+    self.remote_address = (urlparse(uri).netloc, 'port')
+    self.events = events
+    self.challenge = challenge
+    self.sent = []
+    self.to_receive = []
+    self.recv_err = None
+
+  def send(self, msg):
+    msg = json_loads(msg)
+    self.sent.append(msg)
+    if msg[0] == 'REQ':
+      if self.challenge:
+        self.to_receive.append(['AUTH', self.challenge])
+      self.to_receive.extend([['EVENT', msg[1], e] for e in self.events] +
+                             [['EOSE', msg[1]]])
+
+  def recv(self, timeout=None):
+    if self.recv_err:
+      raise self.recv_err
+    elif not self.to_receive:
+      raise ConnectionClosedOK(None, None)
+    return json_dumps(self.to_receive.pop(0))
+
+
 class NostrTest(testutil.TestCase):
 
   def setUp(self):
@@ -232,6 +264,38 @@ class NostrTest(testutil.TestCase):
 
     nostr.verify(NOTE_NOSTR)  # shouldn't raise
 
+  def test_verify_many(self):
+    other = nostr.id_and_sign({
+      **NOTE_NOSTR,
+      'content': 'Something else',
+      'id': None,
+      'sig': None,
+    }, NSEC_URI)
+    bad_sig = {**other, 'sig': SIG}
+    no_id = {**NOTE_NOSTR, 'id': None}
+
+    list_sig = {**other, 'sig': [SIG]}
+
+    with patch.object(nostr, '_verify_sig', wraps=nostr._verify_sig) as mock_sig:
+      self.assertEqual([NOTE_NOSTR, other, NOTE_NOSTR], verify_many(
+        [NOTE_NOSTR, bad_sig, other, no_id, list_sig, NOTE_NOSTR]))
+
+    # each distinct signature is only checked once
+    self.assertEqual(3, mock_sig.call_count)
+
+  def test_verify_many_process_pool(self):
+    events = [nostr.id_and_sign({
+      **NOTE_NOSTR,
+      'content': str(i),
+      'id': None,
+      'sig': None,
+    }, NSEC_URI) for i in range(nostr.MIN_PROCESS_POOL_BATCH)]
+    events[5]['content'] = 'changed'
+
+    got = verify_many(events, processes=2)
+    self.assertEqual([str(i) for i in range(len(events)) if i != 5],
+                     [event['content'] for event in got])
+
   def test_pubkey_from_privkey(self):
     self.assertEqual(PUBKEY, nostr.pubkey_from_privkey(PRIVKEY))
 
@@ -584,6 +648,25 @@ class NostrTest(testutil.TestCase):
     }
     self.assert_equals(expected, from_as1(note), ignore=['id', 'sig'])
 
+  def test_from_as1_doesnt_modify_input(self):
+    note = {
+      'objectType': 'note',
+      'author': PUBKEY_URI,
+      'content': '<p>Hello <a href="https://example.com">@alice</a>!</p>',
+      'tags': [{
+        'objectType': 'mention',
+        'url': PUBKEY_URI_2,
+        'displayName': '@alice',
+        'startIndex': 20,
+        'length': 6,
+      }],
+    }
+    post = {'objectType': 'activity', 'verb': 'post', 'object': note}
+    orig = copy.deepcopy(post)
+
+    from_as1(post)
+    self.assertEqual(orig, post)
+
   def test_to_as1_note_with_nip27_mentions(self):
     content = f'Hey {NPUB_URI} and {URI_NPROFILE} and {URI_NEVENT} and {NPUB} ok'
     note = {
@@ -1332,9 +1415,22 @@ class ClientTest(testutil.TestCase):
     FakeConnection.reset()
 
     nostr.websocket_connect = fake_connect
+    nostr.relay_pool.close_all()
 
     self.nostr = nostr.Nostr(['ws://relay'], privkey=NSEC_URI)
 
+  def fake_relays(self, **conns):
+    """Makes one :class:`FakeRelayConnection` per relay, keyed by host."""
+    connects = []
+
+    @contextmanager
+    def connect(uri, open_timeout=None, close_timeout=None, **kwargs):
+      connects.append(uri)
+      yield conns[urlparse(uri).hostname]
+
+    nostr.websocket_connect = connect
+    return connects
+
   def test_constructor_without_privkey(self):
     nostr.Nostr(['ws://relay'])  # just check that we don't crash
 
@@ -1383,6 +1479,17 @@ class ClientTest(testutil.TestCase):
     ], FakeConnection.sent)
     self.assertEqual([], FakeConnection.to_receive)
 
+  def test_min_id(self):
+    FakeConnection.to_receive = \
+      [['EVENT', 'towkin 1', NOTE_NOSTR]] + [['EOSE', 'towkin 1']]
+
+    self.assert_equals([NOTE_AS1], self.nostr.get_activities(
+      user_id='ab12', min_id='1700000000'))
+    self.assert_equals([
+      ['REQ', 'towkin 1', {'authors': ['ab12'], 'since': 1700000001, 'limit': 20}],
+      ['CLOSE', 'towkin 1'],
+    ], FakeConnection.sent)
+
   def test_search(self):
     FakeConnection.to_receive = \
       [['EVENT', 'towkin 1', NOTE_NOSTR]] + [['EOSE', 'towkin 1']]
@@ -1422,7 +1529,8 @@ class ClientTest(testutil.TestCase):
     ]
 
     self.assert_equals([
-      {**NOTE_AS1, 'replies': {'totalItems': 2, 'items': [reply_as1] * 2}},
+      # the duplicate reply is deduped by id
+      {**NOTE_AS1, 'replies': {'totalItems': 1, 'items': [reply_as1]}},
     ], self.nostr.get_activities(user_id=PUBKEY, fetch_replies=True))
 
     self.assertEqual(['ws://relay'], FakeConnection.relays)
@@ -1460,7 +1568,8 @@ class ClientTest(testutil.TestCase):
     ]
 
     self.assert_equals([
-      {**NOTE_AS1, 'tags': [repost_as1, repost_as1]},
+      # the duplicate repost is deduped by id
+      {**NOTE_AS1, 'tags': [repost_as1]},
     ], self.nostr.get_activities(user_id=PUBKEY, fetch_shares=True))
 
     self.assertEqual(['ws://relay'], FakeConnection.relays)
@@ -1471,6 +1580,178 @@ class ClientTest(testutil.TestCase):
       ['CLOSE', 'towkin 2'],
     ], FakeConnection.sent)
 
+  def test_multiple_relays_merge_and_dedupe(self):
+    other = nostr.id_and_sign({
+      **NOTE_NOSTR,
+      'content': 'Something else',
+      'id': None,
+      'sig': None,
+    }, NSEC_URI)
+    a = FakeRelayConnection('ws://a', events=[NOTE_NOSTR])
+    b = FakeRelayConnection('ws://b', events=[NOTE_NOSTR, other])
+    self.fake_relays(a=a, b=b)
+
+    client = nostr.Nostr(['ws://a', 'ws://b'], privkey=NSEC_URI)
+    got = client.get_activities(user_id=PUBKEY)
+    self.assert_equals([NOTE_NOSTR['id'], other['id']],
+                       [uri_to_id(a['id']) for a in got])
+
+    for conn in a, b:
+      self.assertEqual([
+        ['REQ', conn.sent[0][1], {'authors': [PUBKEY], 'limit': 20}],
+        ['CLOSE', conn.sent[0][1]],
+      ], conn.sent)
+
+  def test_multiple_relays_skip_failure(self):
+    a = FakeRelayConnection('ws://a', events=[NOTE_NOSTR])
+    b = FakeRelayConnection('ws://b')
+    b.recv_err = ConnectionClosedError(None, None)
+    self.fake_relays(a=a, b=b)
+
+    client = nostr.Nostr(['ws://a', 'ws://b'])
+    self.assert_equals([NOTE_AS1], client.get_activities(user_id=PUBKEY))
+
+  def test_reuses_connections(self):
+    conn = FakeRelayConnection('ws://a', events=[NOTE_NOSTR])
+    connects = self.fake_relays(a=conn)
+
+    client = nostr.Nostr(['ws://a'], privkey=NSEC_URI)
+    self.assert_equals([NOTE_AS1], client.get_activities(user_id=PUBKEY))
+    self.assert_equals([NOTE_AS1], client.get_activities(user_id=PUBKEY))
+    self.assert_equals([NOTE_AS1], nostr.Nostr(['ws://a'], privkey=NSEC_URI)
+                                   .get_activities(user_id=PUBKEY))
+    self.assertEqual(['ws://a'], connects)
+    self.assertEqual(['REQ', 'CLOSE'] * 3, [msg[0] for msg in conn.sent])
+
+    # a closed connection is replaced
+    nostr.relay_pool.get('ws://a', privkey=NSEC_URI).close()
+    client.get_activities(user_id=PUBKEY)
+    self.assertEqual(['ws://a', 'ws://a'], connects)
+
+  def test_send_failure_replaces_pooled_connection(self):
+    conn = FakeRelayConnection('ws://a', events=[NOTE_NOSTR])
+    connects = self.fake_relays(a=conn)
+
+    client = nostr.Nostr(['ws://a'])
+    self.assert_equals([NOTE_AS1], client.get_activities(user_id=PUBKEY))
+    relay = nostr.relay_pool.get('ws://a')
+
+    # the relay dropped the idle connection
+    with patch.object(conn, 'send', side_effect=ConnectionClosedError(None, None)):
+      with self.assertRaises(ConnectionClosedError):
+        client.get_activities(user_id=PUBKEY)
+
+    self.assertTrue(relay.closed)
+    self.assertIsNot(relay, nostr.relay_pool.get('ws://a'))
+    self.assert_equals([NOTE_AS1], client.get_activities(user_id=PUBKEY))
+    self.assertEqual(['ws://a', 'ws://a'], connects)
+
+  def test_pool_replaces_connection_that_closed_underneath(self):
+    conn = FakeRelayConnection('ws://a', events=[NOTE_NOSTR])
+    connects = self.fake_relays(a=conn)
+
+    client = nostr.Nostr(['ws://a'])
+    self.assert_equals([NOTE_AS1], client.get_activities(user_id=PUBKEY))
+    relay = nostr.relay_pool.get('ws://a')
+    self.assertIs(relay, nostr.relay_pool.get('ws://a'))
+
+    conn.state = State.CLOSED
+    self.assertIsNot(relay, nostr.relay_pool.get('ws://a'))
+    self.assertTrue(relay.closed)
+
+    conn.state = State.OPEN
+    self.assert_equals([NOTE_AS1], client.get_activities(user_id=PUBKEY))
+    self.assertEqual(['ws://a', 'ws://a'], connects)
+
+  def test_relay_query_limit_counts_only_valid_events(self):
+    other = nostr.id_and_sign({
+      **NOTE_NOSTR,
+      'content': 'Something else',
+      'id': None,
+      'sig': None,
+    }, NSEC_URI)
+    bad_sig = {**other, 'sig': SIG}
+
+    class Conn(FakeRelayConnection):
+      def send(self, msg):
+        msg = json_loads(msg)
+        self.sent.append(msg)
+        if msg[0] == 'REQ':
+          sub = msg[1]
+          self.to_receive = [
+            ['EVENT', sub, bad_sig],
+            ['EVENT', sub, NOTE_NOSTR],
+            ['OK', sub, True],
+            ['EVENT', sub, other],
+            ['EOSE', sub],
+          ]
+
+    self.fake_relays(a=Conn('ws://a'))
+    got = nostr.relay_pool.get('ws://a').query({'limit': 2})
+    self.assertEqual([NOTE_NOSTR, other], got)
+
+  def test_auth_once_per_connection(self):
+    conn = FakeRelayConnection('ws://a', events=[NOTE_NOSTR],
+                               challenge='chall-lunge')
+    self.fake_relays(a=conn)
+
+    client = nostr.Nostr(['ws://a'], privkey=NSEC_URI)
+    self.assert_equals([NOTE_AS1], client.get_activities(user_id=PUBKEY))
+    self.assert_equals([NOTE_AS1], client.get_activities(user_id=PUBKEY))
+    self.assertEqual(['REQ', 'AUTH', 'CLOSE', 'REQ', 'CLOSE'],
+                     [msg[0] for msg in conn.sent])
+
+  def test_relay_multiplexes_subscriptions(self):
+    other = nostr.id_and_sign({
+      **NOTE_NOSTR,
+      'content': 'Something else',
+      'id': None,
+      'sig': None,
+    }, NSEC_URI)
+    events = {'x': NOTE_NOSTR, 'y': other}
+
+    conn = FakeRelayConnection('ws://a')
+    both_sent = Event()
+
+    def send(msg):
+      msg = json_loads(msg)
+      conn.sent.append(msg)
+      reqs = [m for m in conn.sent if m[0] == 'REQ']
+      if len(reqs) == 2:
+        # answer the second subscription first, interleaved with the first
+        (_, sub_1, filter_1), (_, sub_2, filter_2) = reqs
+        conn.to_receive = [
+          ['EVENT', sub_2, events[filter_2['ids'][0]]],
+          ['EVENT', sub_1, events[filter_1['ids'][0]]],
+          ['EOSE', sub_2],
+          ['EOSE', sub_1],
+        ]
+        both_sent.set()
+
+    def recv(timeout=None):
+      both_sent.wait(5)
+      if not conn.to_receive:
+        raise ConnectionClosedOK(None, None)
+      return json_dumps(conn.to_receive.pop(0))
+
+    conn.send = send
+    conn.recv = recv
+    relay = nostr.Relay('ws://a', websocket=conn)
+
+    results = {}
+    def query(id):
+      results[id] = relay.query({'ids': [id]})
+
+    threads = [Thread(target=query, args=(id,)) for id in ('x', 'y')]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join(5)
+
+    self.assertEqual({'x': [NOTE_NOSTR], 'y': [other]}, results)
+    self.assertEqual(['CLOSE', 'CLOSE', 'REQ', 'REQ'],
+                     sorted(msg[0] for msg in conn.sent))
+
   def test_ok_false_closes_query(self):
     FakeConnection.to_receive = [
       ['OK', 'towkin 1', False],
@@ -1,7 +1,7 @@
 """Unit tests for reddit.py."""
 import copy
 
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 from oauth_dropins import reddit as oauth_reddit
 from webutil import testutil, util
 
@@ -252,6 +252,16 @@ class RedditTest(testutil.TestCase):
                        self.reddit.get_activities())
     self.redditor.submissions.new.assert_called_once_with(limit=None)
 
+  def test_get_activities_min_id(self):
+    self.api.redditor.return_value = self.redditor
+    self.redditor.submissions = MagicMock(spec=SubListing)
+    self.redditor.submissions.new.return_value = [self.submission_link]
+
+    self.assert_equals([ACTIVITY_WITH_LINK], self.reddit.get_activities(
+      user_id='plfff', min_id='abc'))
+    self.redditor.submissions.new.assert_called_once_with(
+      limit=None, params={'before': 't3_abc'})
+
   def test_get_activities_activity_id(self):
     self.api.submission.return_value = self.submission_selftext
 
@@ -310,6 +320,78 @@ class RedditTest(testutil.TestCase):
         self.reddit.get_activities(activity_id='ezv3f2', fetch_replies=True, cache=cache))
       self.assert_equals(num_comments, cache['ARR ezv3f2'])
 
+  def test_get_activities_fetch_replies_batch(self):
+    self.reddit = reddit.Reddit('token-here', max_concurrency=2,
+                                replace_more_limit=3)
+    self.reddit.api = self.api
+
+    self.submission_selftext.num_comments = 1
+    self.submission_link.id = 'abc123'
+    self.submission_link.num_comments = 5
+    for subm in self.submission_selftext, self.submission_link:
+      subm.comments = CommentForest(subm, comments=[self.comment])
+      subm.comments.replace_more = MagicMock()
+
+    self.api.redditor.return_value = self.redditor
+    self.redditor.submissions = MagicMock(spec=SubListing)
+    self.redditor.submissions.new.return_value = [
+      self.submission_selftext, self.submission_link]
+    self.api.info.return_value = iter([
+      self.submission_link, self.submission_selftext])
+
+    cache = {'ARR ezv3f2': 1, 'ARR abc123': 4}
+    selftext, link = self.reddit.get_activities(
+      user_id='plfff', fetch_replies=True, cache=cache)
+
+    self.api.info.assert_called_once_with(fullnames=['t3_ezv3f2', 't3_abc123'])
+    self.api.submission.assert_not_called()
+
+    # selftext's comment count is cached and unchanged, so it's skipped
+    self.assertNotIn('replies', selftext['object'])
+    self.submission_selftext.comments.replace_more.assert_not_called()
+
+    self.assert_equals([COMMENT_OBJECT], link['object']['replies']['items'])
+    self.submission_link.comments.replace_more.assert_called_once_with(limit=3)
+    self.assert_equals({'ARR ezv3f2': 1, 'ARR abc123': 5}, cache)
+
+  def test_get_activities_fetch_replies_concurrently_separate_apis(self):
+    self.reddit = reddit.Reddit('token-here', max_concurrency=2)
+    self.reddit.api = self.api
+
+    self.submission_link.id = 'abc123'
+    for subm in self.submission_selftext, self.submission_link:
+      subm.comments = CommentForest(subm, comments=[self.comment])
+      subm.comments.replace_more = MagicMock()
+    subms = {subm.id: subm for subm in (self.submission_selftext,
+                                        self.submission_link)}
+
+    self.api.redditor.return_value = self.redditor
+    self.redditor.submissions = MagicMock(spec=SubListing)
+    self.redditor.submissions.new.return_value = list(subms.values())
+    self.api.info.side_effect = lambda **kwargs: iter(subms.values())
+
+    # each worker thread gets its own praw.Reddit from the pool
+    thread_apis = []
+    def make_api(**kwargs):
+      api = MagicMock()
+      api.submission.side_effect = lambda id: subms[id]
+      thread_apis.append(api)
+      return api
+
+    with patch.object(reddit.praw, 'Reddit', side_effect=make_api):
+      for _ in range(2):
+        got = self.reddit.get_activities(user_id='plfff', fetch_replies=True)
+        for activity in got:
+          self.assert_equals([COMMENT_OBJECT],
+                             activity['object']['replies']['items'])
+
+    # the second poll reuses the first poll's instances
+    self.assertIn(len(thread_apis), (1, 2))
+    self.assertEqual(['abc123', 'abc123', 'ezv3f2', 'ezv3f2'], sorted(
+      call.kwargs['id'] for api in thread_apis
+      for call in api.submission.call_args_list))
+    self.api.submission.assert_not_called()
+
   def test_get_comment(self):
     self.api.comment.return_value = self.comment
     self.assert_equals(COMMENT_OBJECT, self.reddit.get_comment('xyz'))
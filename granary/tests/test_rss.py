@@ -1,6 +1,13 @@
 """Unit tests for rss.py."""
+import glob
+import io
+import os
+from xml.etree import ElementTree
+
 from .. import rss
-from webutil import testutil
+from webutil import testutil, util
+
+TESTDATA_DIR = os.path.join(os.path.dirname(__file__), 'testdata')
 
 
 class RssTest(testutil.TestCase):
@@ -238,6 +245,126 @@ The original post]]></description>
     self.assertLess(got.find('<description><![CDATA[first]]></description>'),
                     got.find('<description><![CDATA[second]]></description>'))
 
+  def test_from_as1_iter(self):
+    activities = [
+      {'content': 'first', 'published': '2012-12-04T00:00:00+00:00'},
+      {'objectType': 'person', 'displayName': 'skipped'},
+      {'content': 'second', 'published': '2012-12-05T00:00:00+00:00'},
+    ]
+    chunks = list(rss.from_as1_iter(activities, feed_url='http://this'))
+    self.assertEqual(4, len(chunks))
+    self.assertNotIn('<item>', chunks[0])
+    self.assertIn('<lastBuildDate>Wed, 05 Dec 2012 00:00:00 +0000</lastBuildDate>',
+                  chunks[0])
+    self.assertIn('<![CDATA[first]]>', chunks[1])
+    self.assertIn('<![CDATA[second]]>', chunks[2])
+    self.assertEqual(rss.FOOTER, chunks[3])
+    self.assertEqual(rss.from_as1(activities, feed_url='http://this'),
+                     ''.join(chunks))
+
+  def test_append_items(self):
+    first = {'content': 'first', 'published': '2012-12-04T00:00:00+00:00'}
+    second = {'content': 'second', 'published': '2012-12-05T00:00:00+00:00'}
+    third = {'content': 'third', 'published': '2012-12-03T00:00:00+00:00'}
+
+    feed = rss.from_as1([first], feed_url='http://this')
+    feed = rss.append_items(feed, [second, third])
+    self.assertEqual(rss.from_as1([first, second, third], feed_url='http://this'),
+                     feed)
+
+  def test_append_items_older(self):
+    first = {'content': 'first', 'published': '2012-12-04T00:00:00+00:00'}
+    feed = rss.from_as1([first], feed_url='http://this')
+    got = rss.append_items(feed, [{'content': 'old', 'published': '2001-01-01'}])
+    self.assertIn('<lastBuildDate>Tue, 04 Dec 2012 00:00:00 +0000</lastBuildDate>',
+                  got)
+    self.assertIn('<![CDATA[old]]>', got)
+
+  def test_append_items_podcast(self):
+    audio = {
+      'content': 'listen',
+      'attachments': [{
+        'objectType': 'audio',
+        'stream': {'url': 'http://a/podcast.mp3', 'duration': 328},
+      }],
+    }
+    feed = rss.from_as1([audio], feed_url='http://this')
+    self.assertEqual(rss.from_as1([audio, audio], feed_url='http://this'),
+                     rss.append_items(feed, [audio]))
+
+    not_podcast = rss.from_as1([{'content': 'foo'}], feed_url='http://this')
+    with self.assertRaises(ValueError):
+      rss.append_items(not_podcast, [audio])
+
+  def test_append_items_not_rss(self):
+    with self.assertRaises(ValueError):
+      rss.append_items('<html></html>', [{'content': 'foo'}])
+
+  def test_to_as1_iter(self):
+    for filename in glob.glob(os.path.join(TESTDATA_DIR, '*.rss.xml')):
+      feed = util.read(filename)
+      expected = rss.to_as1(feed)
+      self.assertTrue(expected)
+
+      data = feed.encode()
+      for input in (feed, data, io.BytesIO(data),
+                    [data[i:i + 10] for i in range(0, len(data), 10)]):
+        with self.subTest(filename=filename, input=type(input)):
+          self.assert_equals(expected, list(rss.to_as1_iter(input)))
+
+  def test_to_as1_iter_rss_1(self):
+    feed = """\
+<?xml version="1.0"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+         xmlns="http://purl.org/rss/1.0/"
+         xmlns:dc="http://purl.org/dc/elements/1.1/">
+  <channel rdf:about="http://site/">
+    <title>My Site</title>
+    <link>http://site/</link>
+    <description>stuff</description>
+  </channel>
+  <item rdf:about="http://site/a">
+    <title>A post</title>
+    <link>http://site/a</link>
+    <description>Some text</description>
+    <dc:date>2012-12-05T00:58:26+07:00</dc:date>
+  </item>
+</rdf:RDF>
+"""
+    got = list(rss.to_as1_iter(feed))
+    self.assert_equals(rss.to_as1(feed), got)
+    self.assert_equals({
+      'objectType': 'article',
+      'id': 'http://site/a',
+      'url': 'http://site/a',
+      'displayName': 'A post',
+      'content': 'Some text',
+      'updated': '2012-12-05T00:58:26+07:00',
+      'author': {
+        'displayName': 'My Site',
+        'url': 'http://site/',
+        'summary': 'stuff',
+      },
+    }, got[0]['object'])
+
+  def test_to_as1_iter_yields_each_item_when_parsed(self):
+    feed = util.read(os.path.join(TESTDATA_DIR, 'feed_with_note.rss.xml'))
+    first, rest = feed.split('</item>', 1)
+
+    got = []
+    def chunks():
+      yield first + '</item>'
+      self.assertEqual(1, len(got))
+      yield rest
+
+    for activity in rss.to_as1_iter(chunks()):
+      got.append(activity)
+    self.assert_equals(rss.to_as1(feed), got)
+
+  def test_to_as1_iter_parse_error(self):
+    with self.assertRaises(ElementTree.ParseError):
+      list(rss.to_as1_iter('not valid xml'))
+
   def test_to_as1_title_object_type_article(self):
     self.assert_equals({
       'objectType': 'article',
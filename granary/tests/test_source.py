@@ -1,6 +1,8 @@
 """Unit tests for source.py."""
 import copy
 import re
+import threading
+import time
 from unittest.mock import patch
 
 from webutil import testutil, util
@@ -49,6 +51,75 @@ class SourceTest(testutil.TestCase):
     super(SourceTest, self).setUp()
     self.source = FakeSource()
 
+  def test_concurrent_map_serial(self):
+    threads = set()
+    def fn(x):
+      threads.add(threading.get_ident())
+      return x * 2
+
+    self.assertEqual([2, 4, 6], list(self.source._concurrent_map(fn, [1, 2, 3])))
+    self.assertEqual({threading.get_ident()}, threads)
+
+  def test_concurrent_map(self):
+    self.source.MAX_CONCURRENCY = 2
+    lock = threading.Lock()
+    running = max_running = 0
+    # the first two calls have to run at the same time to get past this
+    barrier = threading.Barrier(2, timeout=5)
+
+    def fn(x):
+      nonlocal running, max_running
+      with lock:
+        running += 1
+        max_running = max(running, max_running)
+      if x < 2:
+        barrier.wait()
+      time.sleep(.01)
+      with lock:
+        running -= 1
+      return x * 2
+
+    self.assertEqual([0, 2, 4, 6, 8],
+                     list(self.source._concurrent_map(fn, range(5))))
+    self.assertEqual(2, max_running)
+
+  def test_concurrent_map_exception(self):
+    self.source.MAX_CONCURRENCY = 3
+    def fn(x):
+      if x == 1:
+        raise ValueError('nope')
+      return x
+
+    results = self.source._concurrent_map(fn, [0, 1, 2])
+    self.assertEqual(0, next(results))
+    with self.assertRaises(ValueError):
+      next(results)
+
+  def test_conditional_headers(self):
+    self.assertEqual({}, source.conditional_headers(None))
+    self.assertEqual({'If-None-Match': '"abc"'},
+                     source.conditional_headers('"abc"'))
+    self.assertEqual({'If-None-Match': 'W/"abc"'},
+                     source.conditional_headers('W/"abc"'))
+    self.assertEqual({'If-Modified-Since': 'Tue, 01 Oct 2024 00:00:00 GMT'},
+                     source.conditional_headers('Tue, 01 Oct 2024 00:00:00 GMT'))
+
+  def test_load_conditional(self):
+    self.assertEqual(('"x"', None),
+                     self.source._load_conditional(None, 'key', etag='"x"'))
+    self.assertEqual((None, None), self.source._load_conditional({}, 'key'))
+
+    cache = {'ACR key': {'etag': '"abc"', 'activities': [ACTIVITY]}}
+    etag, activities = self.source._load_conditional(cache, 'key')
+    self.assertEqual('"abc"', etag)
+    self.assertEqual([ACTIVITY], activities)
+    self.assertIsNot(ACTIVITY, activities[0])
+
+    self.assertEqual(('"abc"', [ACTIVITY]),
+                     self.source._load_conditional(cache, 'key', etag='"abc"'))
+    self.assertEqual(('"def"', None),
+                     self.source._load_conditional(cache, 'key', etag='"def"'))
+
   @patch.object(FakeSource, 'get_activities', return_value=[ACTIVITY])
   def test_get_like(self, mock_get_activities):
     self.assert_equals(LIKES[1], self.source.get_like('author', 'activity', '6'))
@@ -0,0 +1,134 @@
+"""Unit tests for transport.py."""
+import threading
+from unittest.mock import call, patch
+import urllib.request
+
+from webutil import testutil, util
+
+from .. import transport
+
+
+class TransportTest(testutil.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    transport.clear_host_limits()
+    self.mock_sleep = self.start_patch(transport, 'sleep_fn')
+
+  def tearDown(self):
+    transport.clear_host_limits()
+    super().tearDown()
+
+  def test_host_limit_no_limits(self):
+    with transport.host_limit('https://foo.com/bar'):
+      pass
+    self.mock_sleep.assert_not_called()
+
+  def test_host_limit_max_concurrency(self):
+    transport.set_host_limits('Foo.com', max_concurrency=1)
+
+    entered = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def first():
+      with transport.host_limit('https://foo.com/a'):
+        order.append('first start')
+        entered.set()
+        release.wait(5)
+        order.append('first end')
+
+    def second():
+      with transport.host_limit(urllib.request.Request('https://FOO.com/b')):
+        order.append('second')
+
+    t1 = threading.Thread(target=first)
+    t1.start()
+    entered.wait(5)
+
+    t2 = threading.Thread(target=second)
+    t2.start()
+    t2.join(.1)
+    self.assertTrue(t2.is_alive())
+
+    # other hosts aren't limited
+    with transport.host_limit('https://bar.com/'):
+      pass
+
+    release.set()
+    t1.join(5)
+    t2.join(5)
+    self.assertEqual(['first start', 'first end', 'second'], order)
+
+  @patch('time.monotonic', return_value=100)
+  def test_host_limit_min_interval(self, _):
+    transport.set_host_limits('foo.com', min_interval=2)
+
+    for _ in range(3):
+      with transport.host_limit('https://foo.com/'):
+        pass
+
+    self.assertEqual([call(2), call(4)], self.mock_sleep.call_args_list)
+
+  def test_set_host_limits_none_removes(self):
+    transport.set_host_limits('foo.com', max_concurrency=1)
+    transport.set_host_limits('foo.com')
+    self.assertEqual({}, transport._limiters)
+
+  def test_configure_pools(self):
+    originals = {}
+    for prefix in 'http://', 'https://':
+      a = util.session.get_adapter(prefix)
+      originals[prefix] = (a, a._pool_connections, a._pool_maxsize, a._pool_block)
+
+    def restore():
+      for prefix, (adapter, connections, maxsize, block) in originals.items():
+        adapter.init_poolmanager(connections, maxsize, block=block)
+        util.session.mount(prefix, adapter)
+
+    self.addCleanup(restore)
+
+    transport.configure_pools(maxsize=25)
+    for prefix, (adapter, connections, _, _) in originals.items():
+      # resizes the existing adapter, eg webutil's IPFilterAdapter in prod
+      got = util.session.get_adapter(f'{prefix}foo.com/')
+      self.assertIs(adapter, got)
+      self.assertEqual(25, got._pool_maxsize)
+      self.assertEqual(connections, got._pool_connections)
+
+  def test_retry(self):
+    results = [ValueError('x'), ValueError('y'), 'ok']
+
+    def fn():
+      result = results.pop(0)
+      if isinstance(result, Exception):
+        raise result
+      return result
+
+    self.assertEqual('ok', transport.retry(
+      fn, lambda e: isinstance(e, ValueError), retries=3, backoff=1))
+    self.assertEqual([call(1), call(2)], self.mock_sleep.call_args_list)
+
+  def test_retry_gives_up(self):
+    def fn():
+      raise ValueError('x')
+
+    with self.assertRaises(ValueError):
+      transport.retry(fn, lambda e: True, retries=2)
+    self.assertEqual(2, self.mock_sleep.call_count)
+
+  def test_retry_should_not_retry(self):
+    def fn():
+      raise KeyError('x')
+
+    with self.assertRaises(KeyError):
+      transport.retry(fn, lambda e: isinstance(e, ValueError))
+    self.mock_sleep.assert_not_called()
+
+  def test_retry_doesnt_retry_keyboard_interrupt(self):
+    def fn():
+      raise KeyboardInterrupt()
+
+    with self.assertRaises(KeyboardInterrupt):
+      transport.retry(fn, lambda e: True)
+    self.mock_sleep.assert_not_called()
@@ -18,6 +18,7 @@ from webutil.util import json_dumps, json_loads
 
 from .. import microformats2
 from .. import source
+from .. import transport
 from .. import twitter
 from ..twitter import (
   API_BLOCK_IDS,
@@ -693,6 +694,7 @@ class TwitterTest(testutil.TestCase):
     twitter_auth.TWITTER_APP_SECRET = 'fake'
     self.twitter = twitter.Twitter('key', 'secret')
     self.mock_urlopen = self.start_patch(util.urllib.request, 'urlopen')
+    twitter.mention_search_cache.clear()
     self.mock_get = self.start_patch(util.session, 'get')
     self.mock_post = self.start_patch(util.session, 'post')
 
@@ -850,15 +852,111 @@ class TwitterTest(testutil.TestCase):
       UrlopenResult(200, [TWEET]),
       UrlopenResult(200, REPLIES_TO_SNARFED),
       UrlopenResult(200, REPLIES_TO_ALICE),
-      UrlopenResult(200, REPLIES_TO_BOB),
     ]
     self.assert_equals([ACTIVITY_WITH_REPLIES],
                        self.twitter.get_activities(fetch_replies=True, min_id='567'))
     search = API_SEARCH + '&since_id=567'
     self.assert_urlopen(TIMELINE)
     self.assert_urlopen(search % {'q': '%40snarfed_org', 'count': 100})
-    self.assert_urlopen(search % {'q': '%40alice', 'count': 100})
-    self.assert_urlopen(search % {'q': '%40bob', 'count': 100})
+    self.assert_urlopen(search % {'q': '%40alice+OR+%40bob', 'count': 100})
+    self.assertEqual(3, self.mock_urlopen.call_count)
+
+  @patch.object(twitter, 'REPLY_SEARCH_BATCH_SIZE', 2)
+  def test_fetch_replies_batches_and_caches_searches(self):
+    self.mock_urlopen.side_effect = [
+      UrlopenResult(200, {'statuses': [
+        {'id_str': '200', 'user': {'screen_name': 'alice'},
+         'in_reply_to_status_id_str': '100'},
+        {'id_str': '300', 'user': {'screen_name': 'bob'},
+         'in_reply_to_status_id_str': '100'},
+        {'id_str': '400', 'user': {'screen_name': 'eve'},
+         'in_reply_to_status_id_str': '100'},
+      ]}),
+      UrlopenResult(200, {'statuses': [
+        {'id_str': '500', 'user': {'screen_name': 'bob'},
+         'text': '@Alice yes', 'in_reply_to_status_id_str': '200'},
+      ]}),
+      UrlopenResult(200, {'statuses': []}),
+    ]
+
+    activity = self.twitter.tweet_to_activity(TWEET)
+    self.twitter.fetch_replies([activity])
+    self.assert_equals(['200', '300', '400', '500'], [
+      util.parse_tag_uri(r['id'])[1]
+      for r in activity['object']['replies']['items']])
+
+    self.assert_urlopen(API_SEARCH % {'q': '%40snarfed_org', 'count': 100})
+    self.assert_urlopen(API_SEARCH % {'q': '%40alice+OR+%40bob', 'count': 100})
+    self.assert_urlopen(API_SEARCH % {'q': '%40eve', 'count': 100})
+    self.assertEqual(3, self.mock_urlopen.call_count)
+
+    # searches are cached across calls, and attributed to the users that
+    # combined searches' results mention
+    self.assertEqual(['500'], [t['id_str'] for t in
+                               twitter.mention_search_cache[('key', 'alice', None)]])
+    self.assertEqual([], twitter.mention_search_cache[('key', 'bob', None)])
+
+    activity = self.twitter.tweet_to_activity(TWEET)
+    self.twitter.fetch_replies([activity])
+    self.assertEqual(4, activity['object']['replies']['totalItems'])
+    self.assertEqual(3, self.mock_urlopen.call_count)
+
+  @patch.object(twitter, 'REPLY_SEARCH_COUNT', 2)
+  def test_fetch_replies_pages_searches(self):
+    self.mock_urlopen.side_effect = [
+      UrlopenResult(200, {'statuses': [
+        {'id_str': '300', 'user': {'screen_name': 'alice'},
+         'in_reply_to_status_id_str': '100'},
+        {'id_str': '200', 'user': {'screen_name': 'bob'},
+         'in_reply_to_status_id_str': '100'},
+      ]}),
+      UrlopenResult(200, {'statuses': [
+        {'id_str': '150', 'user': {'screen_name': 'eve'},
+         'in_reply_to_status_id_str': '100'},
+      ]}),
+      UrlopenResult(200, {'statuses': []}),
+    ]
+
+    activity = self.twitter.tweet_to_activity(TWEET)
+    self.twitter.fetch_replies([activity])
+    self.assert_equals(['300', '200', '150'], [
+      util.parse_tag_uri(r['id'])[1]
+      for r in activity['object']['replies']['items']])
+
+    search = API_SEARCH % {'q': '%40snarfed_org', 'count': 2}
+    self.assert_urlopen(search)
+    self.assert_urlopen(search + '&max_id=199')
+    self.assertIn(('key', 'snarfed_org', None), twitter.mention_search_cache)
+
+  @patch.object(twitter, 'REPLY_SEARCH_MAX_PAGES', 1)
+  @patch.object(twitter, 'REPLY_SEARCH_COUNT', 1)
+  def test_fetch_replies_doesnt_cache_incomplete_search(self):
+    self.mock_urlopen.side_effect = [
+      UrlopenResult(200, {'statuses': [
+        {'id_str': '200', 'user': {'screen_name': 'alice'},
+         'in_reply_to_status_id_str': '100'},
+      ]}),
+      UrlopenResult(200, {'statuses': []}),
+    ]
+
+    activity = self.twitter.tweet_to_activity(TWEET)
+    self.twitter.fetch_replies([activity])
+    self.assertEqual(1, activity['object']['replies']['totalItems'])
+    self.assertNotIn(('key', 'snarfed_org', None), twitter.mention_search_cache)
+
+  def test_mention_search_cache_per_account(self):
+    twitter.mention_search_cache[('other', 'snarfed_org', None)] = [
+      {'id_str': '200', 'user': {'screen_name': 'alice'},
+       'in_reply_to_status_id_str': '100'},
+    ]
+    self.mock_urlopen.side_effect = [
+      UrlopenResult(200, {'statuses': []}),
+    ]
+
+    activity = self.twitter.tweet_to_activity(TWEET)
+    self.twitter.fetch_replies([activity])
+    self.assertEqual(0, activity['object']['replies']['totalItems'])
+    self.assertEqual(1, self.mock_urlopen.call_count)
 
   def test_get_activities_fetch_mentions(self):
     self.mock_urlopen.side_effect = [
@@ -1113,7 +1211,8 @@ class TwitterTest(testutil.TestCase):
     self.twitter.get_activities_response(min_id=135)
     self.assert_urlopen(TIMELINE)
 
-  def test_get_activities_retries(self):
+  @patch.object(transport, 'sleep_fn')
+  def test_get_activities_retries(self, _):
     for exc in (http.client.HTTPException('Deadline exceeded: foo'),
                 socket.timeout('asdf'),
                 urllib.error.HTTPError('url', 501, 'msg', {}, None)):
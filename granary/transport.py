@@ -0,0 +1,184 @@
+"""Shared HTTP transport settings for sources: connection pools, per-host limits, retries.
+
+Most sources make HTTP requests with :func:`webutil.util.requests_get` and
+friends, which share one process-wide :class:`requests.Session`,
+``webutil.util.session``, so they already reuse keep-alive connections to each
+host across calls and across :class:`Source` instances. This module adds:
+
+* :func:`configure_pools`: sizes that session's per-host connection pools, eg to
+  match :attr:`Source.MAX_CONCURRENCY`, so that concurrent calls don't open and
+  then discard extra connections.
+* :func:`set_host_limits`: optional per-host concurrency and rate limits, shared
+  by all sources and threads in the process.
+* :func:`host_limit`: context manager that sources wrap around each API call
+  to respect those limits.
+* :func:`retry`: retries with exponential backoff, for transient errors.
+
+Usage::
+
+    from granary import transport
+    transport.configure_pools(maxsize=20)
+    transport.set_host_limits('api.twitter.com', max_concurrency=4,
+                              min_interval=.1)
+"""
+from contextlib import contextmanager
+import logging
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+from webutil import util
+
+logger = logging.getLogger(__name__)
+
+RETRIES = 3
+# seconds before the first retry. doubles after each one.
+BACKOFF = .5
+
+# overridden in tests
+sleep_fn = time.sleep
+
+
+class HostLimiter:
+  """Concurrency and rate limits for one host. Thread safe.
+
+  Attributes:
+    max_concurrency (int): maximum number of calls in flight at once, or None
+      for no limit
+    min_interval (float): minimum number of seconds between the starts of
+      consecutive calls, or None for no limit
+  """
+  def __init__(self, max_concurrency=None, min_interval=None):
+    self.max_concurrency = max_concurrency
+    self.min_interval = min_interval
+    self._semaphore = (threading.BoundedSemaphore(max_concurrency)
+                       if max_concurrency else None)
+    self._lock = threading.Lock()
+    self._next_start = 0
+
+  @contextmanager
+  def slot(self):
+    """Context manager that waits until a call to this host is allowed."""
+    if self._semaphore:
+      self._semaphore.acquire()
+
+    try:
+      if self.min_interval:
+        with self._lock:
+          now = time.monotonic()
+          start = max(now, self._next_start)
+          self._next_start = start + self.min_interval
+        if start > now:
+          sleep_fn(start - now)
+      yield
+    finally:
+      if self._semaphore:
+        self._semaphore.release()
+
+
+# maps str lower case host to HostLimiter
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def set_host_limits(host, max_concurrency=None, min_interval=None):
+  """Sets the concurrency and rate limits for a host.
+
+  Replaces any existing limits for the host. Calls already in flight aren't
+  affected. If both limits are None, removes the host's limits.
+
+  Args:
+    host (str): domain, eg ``api.twitter.com``
+    max_concurrency (int): maximum number of calls in flight at once
+    min_interval (float): minimum number of seconds between the starts of
+      consecutive calls
+  """
+  host = host.lower()
+  with _limiters_lock:
+    if max_concurrency or min_interval:
+      _limiters[host] = HostLimiter(max_concurrency=max_concurrency,
+                                    min_interval=min_interval)
+    else:
+      _limiters.pop(host, None)
+
+
+def clear_host_limits():
+  """Removes all hosts' limits."""
+  with _limiters_lock:
+    _limiters.clear()
+
+
+@contextmanager
+def host_limit(url):
+  """Context manager that waits for a host's limits, if any, before a call.
+
+  Args:
+    url (str or urllib.request.Request): the call's URL
+  """
+  if isinstance(url, urllib.request.Request):
+    url = url.get_full_url()
+
+  limiter = (_limiters.get((urllib.parse.urlparse(url).hostname or '').lower())
+             if _limiters else None)
+  if limiter:
+    with limiter.slot():
+      yield
+  else:
+    yield
+
+
+def configure_pools(maxsize, connections=None):
+  """Resizes the shared :class:`requests.Session`'s connection pools.
+
+  Resizes the adapters that are already mounted on ``webutil.util.session``
+  in place, so that they keep their class and settings, eg
+  :class:`requests_hardened.IPFilterAdapter`'s blocking of private and
+  loopback IPs in production. Callers that make more concurrent calls to one
+  host than the adapters' current ``maxsize`` should raise it.
+
+  Args:
+    maxsize (int): maximum number of keep-alive connections to keep per host
+    connections (int): maximum number of hosts to keep pools for. Defaults to
+      each adapter's current number.
+  """
+  for prefix in 'http://', 'https://':
+    adapter = util.session.get_adapter(prefix)
+    adapter.poolmanager.clear()
+    adapter.init_poolmanager(connections or adapter._pool_connections, maxsize,
+                             block=adapter._pool_block)
+
+
+def retry(fn, should_retry, retries=RETRIES, backoff=BACKOFF):
+  """Calls a function, retrying with exponential backoff if it fails.
+
+  Args:
+    fn (callable): takes no args
+    should_retry (callable): takes an exception raised by ``fn``, returns True
+      if it's transient and the call should be retried, False otherwise
+    retries (int): maximum number of retries. ``fn`` is called up to
+      ``retries + 1`` times.
+    backoff (float): seconds to wait before the first retry. Doubles after
+      each retry.
+
+  Returns:
+    ``fn``'s return value
+
+  Raises:
+    the last exception raised by ``fn``, or any exception that ``should_retry``
+    rejects. :class:`BaseException` subclasses that aren't :class:`Exception`
+    subclasses, eg :class:`KeyboardInterrupt` and :class:`SystemExit`, are never
+    retried.
+  """
+  delay = backoff
+  for attempt in range(retries + 1):
+    try:
+      return fn()
+    except Exception as e:
+      if attempt >= retries or not should_retry(e):
+        raise
+      logger.info(f'Call failed with {e.__class__.__name__} {e}, retrying in {delay}s')
+
+    if delay:
+      sleep_fn(delay)
+    delay *= 2
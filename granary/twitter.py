@@ -15,9 +15,11 @@ import logging
 import mimetypes
 import re
 import socket
+import threading
 import time
 import urllib.parse, urllib.request
 
+from cachetools import TTLCache
 from oauth_dropins import twitter_auth
 from requests import RequestException
 from webutil import util
@@ -25,6 +27,8 @@ from webutil.util import json_dumps, json_loads
 
 from . import as1
 from . import source
+from . import transport
+from .cache import get_multi, set_multi
 
 logger = logging.getLogger(__name__)
 
@@ -69,6 +73,24 @@ RETWEET_LIMIT = 15
 # Number of IDs to search for at a time
 QUOTE_SEARCH_BATCH_SIZE = 20
 
+# Number of usernames to search for @-mentions of at a time in fetch_replies.
+# Keeps each query under the search guideline of 10 keywords and operators.
+# https://dev.twitter.com/rest/public/search
+REPLY_SEARCH_BATCH_SIZE = 5
+# Results per page of those searches, and the maximum number of pages to fetch
+# for each one. The users in a batch share each page, so we follow max_id until
+# a page isn't full.
+REPLY_SEARCH_COUNT = 100
+REPLY_SEARCH_MAX_PAGES = 5
+
+# Caches @-mention searches in fetch_replies across calls. Maps
+# (access token key, lower case username, min_id) to list of Twitter API tweet
+# objects. Searches that hit REPLY_SEARCH_MAX_PAGES aren't cached, since their
+# results may be incomplete.
+MENTION_SEARCH_CACHE_TIME = 5 * 60  # 5 minute expiration, in seconds
+mention_search_cache = TTLCache(1000, MENTION_SEARCH_CACHE_TIME)
+mention_search_cache_lock = threading.RLock()
+
 # For read requests only.
 RETRIES = 3
 
@@ -339,6 +361,11 @@ class Twitter(source.Source):
       # for convenience, throwaway object just for this method
       cache = {}
 
+    # read all cached counts at once
+    cached = get_multi(cache, [f'{prefix} {tweet["id_str"]}' for tweet in tweets
+                               for prefix in ('ATR', 'ATF')])
+    updates = {}
+
     if fetch_shares:
       retweet_calls = 0
       for tweet in tweets:
@@ -365,7 +392,7 @@ class Twitter(source.Source):
         # returns the original tweets, not the retweets or their authors.
         id = tweet['id_str']
         count = tweet.get('retweet_count')
-        if count and count != cache.get('ATR ' + id):
+        if count and count != cached.get('ATR ' + id):
           url = API_RETWEETS % id
           if min_id is not None:
             url = util.add_query_params(url, {'since_id': min_id})
@@ -384,7 +411,7 @@ class Twitter(source.Source):
               raise
 
           retweet_calls += 1
-          cache['ATR ' + id] = count
+          updates['ATR ' + id] = count
 
     if not include_shares:
       tweets = [t for t in tweets if not t.get('retweeted_status')]
@@ -405,7 +432,7 @@ class Twitter(source.Source):
       for tweet, activity in zip(tweets, tweet_activities):
         id = tweet['id_str']
         count = tweet.get('favorite_count')
-        if as1.is_public(activity) and count and count != cache.get('ATF ' + id):
+        if as1.is_public(activity) and count and count != cached.get('ATF ' + id):
           try:
             resp = util.requests_get(SCRAPE_LIKES_URL % id,
                                      headers=self.scrape_headers)
@@ -417,8 +444,9 @@ class Twitter(source.Source):
           likes = [self._make_like(tweet, author) for author in
                    resp.json().get('globalObjects', {}).get('users', {}).values()]
           activity['object'].setdefault('tags', []).extend(likes)
-          cache['ATF ' + id] = count
+          updates['ATF ' + id] = count
 
+    set_multi(cache, updates)
     activities += tweet_activities
     response = self.make_activities_base_response(activities)
     response.update({'total_count': total_count, 'etag': etag})
@@ -429,63 +457,154 @@ class Twitter(source.Source):
 
     Includes indirect replies ie reply chains, not just direct replies. Searches
     for @-mentions, matches them to the original tweets with
-    ``in_reply_to_status_id_str``, and recurses until it's walked the entire
+    ``in_reply_to_status_id_str``, and repeats until it's walked the entire
     tree.
 
+    Searches happen in rounds. Each round searches for mentions of every reply
+    author across all activities that hasn't been searched yet, batched into
+    ``OR`` queries of :const:`REPLY_SEARCH_BATCH_SIZE` usernames each. All
+    results go into one pool that's shared by all activities, and per-user
+    results are also cached across calls in :data:`mention_search_cache`.
+
     Args:
       activities (list of dict)
-
-    Returns:
-      list of dict: same activities
+      min_id (str): only search for replies with ids greater than this
     """
-
-    # cache searches for @-mentions for individual users. maps username to dict
-    # mapping tweet id to ActivityStreams reply object dict.
-    mentions = {}
-
-    # find replies
+    # all tweets found by searches so far, across all activities. maps id to
+    # Twitter API tweet object.
+    pool = {}
+    searched = set()
+
+    # per activity lists of ActivityStreams reply activities and sets of seen
+    # tweet ids. seed with the original tweet; we'll filter it out later.
+    states = []
     for activity in activities:
-      # list of ActivityStreams reply object dict and set of seen activity ids
-      # (tag URIs). seed with the original tweet; we'll filter it out later.
-      replies = [activity]
       _, id = util.parse_tag_uri(activity['id'])
-      seen_ids = set([id])
+      states.append((activity, [activity], set([id])))
 
-      for reply in replies:
-        # get mentions of this tweet's author so we can search them for replies to
-        # this tweet. can't use statuses/mentions_timeline because i'd need to
-        # auth as the user being mentioned.
-        # https://dev.twitter.com/docs/api/1.1/get/statuses/mentions_timeline
-        #
-        # note that these HTTP requests are synchronous. you can make async
-        # requests by using urlfetch.fetch() directly, but not with urllib2.
-        # https://developers.google.com/appengine/docs/python/urlfetch/asynchronousrequests
-        author = reply['actor']['username']
-        if author not in mentions:
-          url = API_SEARCH % {
-            'q': urllib.parse.quote_plus('@' + author),
-            'count': 100,
-          }
-          if min_id is not None:
-            url = util.add_query_params(url, {'since_id': min_id})
-          mentions[author] = self.urlopen(url)['statuses']
-
-        # look for replies. add any we find to the end of replies. this makes us
-        # recursively follow reply chains to their end. (python supports
-        # appending to a sequence while you're iterating over it.)
-        for mention in mentions[author]:
-          id = mention['id_str']
-          if (mention.get('in_reply_to_status_id_str') in seen_ids and
-              id not in seen_ids):
-            replies.append(self.tweet_to_activity(mention))
-            seen_ids.add(id)
+    while True:
+      # look for replies. add any we find to the end of replies, and repeat
+      # until we don't find any more. this follows reply chains to their end.
+      for _, replies, seen_ids in states:
+        found = True
+        while found:
+          found = False
+          for id, tweet in pool.items():
+            if (tweet.get('in_reply_to_status_id_str') in seen_ids and
+                id not in seen_ids):
+              replies.append(self.tweet_to_activity(tweet))
+              seen_ids.add(id)
+              found = True
+
+      # get mentions of reply authors we haven't searched for yet so we can
+      # search them for replies. can't use statuses/mentions_timeline because
+      # i'd need to auth as the user being mentioned.
+      # https://dev.twitter.com/docs/api/1.1/get/statuses/mentions_timeline
+      authors = []
+      for _, replies, _ in states:
+        for reply in replies:
+          author = reply['actor']['username']
+          if author not in searched and author not in authors:
+            authors.append(author)
+
+      if not authors:
+        break
+
+      for tweet in self._search_mentions(authors, min_id=min_id):
+        pool.setdefault(tweet['id_str'], tweet)
+      searched.update(authors)
 
+    for activity, replies, _ in states:
       items = [r['object'] for r in replies[1:]]  # filter out seed activity
       activity['object']['replies'] = {
         'items': items,
         'totalItems': len(items),
       }
 
+  def _search_mentions(self, usernames, min_id=None):
+    """Searches for tweets that @-mention any of a set of users.
+
+    Uses :data:`mention_search_cache` for users that this account searched
+    recently, and batches the rest into ``OR`` queries of up to
+    :const:`REPLY_SEARCH_BATCH_SIZE` usernames each. Follows each query's
+    ``max_id`` for up to :const:`REPLY_SEARCH_MAX_PAGES` pages.
+
+    Args:
+      usernames (sequence of str)
+      min_id (str): only return tweets with ids greater than this
+
+    Returns:
+      list of dict: Twitter API tweet objects. May contain duplicates.
+    """
+    tweets = []
+    to_search = []
+    with mention_search_cache_lock:
+      for username in usernames:
+        cached = mention_search_cache.get(
+          (self.access_token_key, username.lower(), min_id))
+        if cached is None:
+          to_search.append(username)
+        else:
+          tweets.extend(cached)
+
+    for i in range(0, len(to_search), REPLY_SEARCH_BATCH_SIZE):
+      batch = to_search[i:i + REPLY_SEARCH_BATCH_SIZE]
+      url = API_SEARCH % {
+        'q': urllib.parse.quote_plus(' OR '.join('@' + u for u in batch)),
+        'count': REPLY_SEARCH_COUNT,
+      }
+      if min_id is not None:
+        url = util.add_query_params(url, {'since_id': min_id})
+
+      results = []
+      complete = False
+      page_url = url
+      for _ in range(REPLY_SEARCH_MAX_PAGES):
+        page = self.urlopen(page_url)['statuses']
+        results.extend(page)
+        if len(page) < REPLY_SEARCH_COUNT:
+          complete = True
+          break
+        max_id = min(int(t['id_str']) for t in page) - 1
+        page_url = util.add_query_params(url, {'max_id': max_id})
+
+      tweets.extend(results)
+      if not complete:
+        logger.info(f'Mention search for {batch} hit {REPLY_SEARCH_MAX_PAGES} pages, not caching')
+        continue
+
+      # attribute results to the users they mention so that we can cache them
+      # per user. a single user's results don't need it.
+      per_user = {u.lower(): [] for u in batch}
+      for tweet in results:
+        for username, user_tweets in per_user.items():
+          if len(batch) == 1 or self._mentions(tweet, username):
+            user_tweets.append(tweet)
+
+      with mention_search_cache_lock:
+        for username, user_tweets in per_user.items():
+          mention_search_cache[(self.access_token_key, username, min_id)] = user_tweets
+
+    return tweets
+
+  @staticmethod
+  def _mentions(tweet, username):
+    """Returns True if a tweet @-mentions a user, False otherwise.
+
+    Args:
+      tweet (dict): Twitter API tweet object
+      username (str): lower case
+    """
+    if (tweet.get('in_reply_to_screen_name') or '').lower() == username:
+      return True
+
+    mentions = tweet.get('entities', {}).get('user_mentions', [])
+    if username in ((m.get('screen_name') or '').lower() for m in mentions):
+      return True
+
+    text = (tweet.get('full_text') or tweet.get('text') or '').lower()
+    return re.search(rf'@{re.escape(username)}\b', text) is not None
+
   def fetch_mentions(self, username, tweets, min_id=None):
     """Fetches a user's @-mentions and returns them as ActivityStreams.
 
@@ -1084,29 +1203,25 @@ class Twitter(source.Source):
       url = API_BASE + url
 
     def request():
-      resp = twitter_auth.signed_urlopen(
-        url, self.access_token_key, self.access_token_secret, **kwargs)
-      return source.load_json(resp.read(), url) if parse_response else resp
+      with transport.host_limit(url):
+        resp = twitter_auth.signed_urlopen(
+          url, self.access_token_key, self.access_token_secret, **kwargs)
+        return source.load_json(resp.read(), url) if parse_response else resp
 
-    if ('data' not in kwargs and not
+    if ('data' in kwargs or
         (isinstance(url, urllib.request.Request) and url.get_method() == 'POST')):
-      # this is a GET. retry up to 3x if we deadline.
-      for _ in range(RETRIES):
-        try:
-          return request()
-        except http.client.HTTPException as e:
-          if not str(e).startswith('Deadline exceeded'):
-            raise
-        except socket.timeout:
-          pass
-        except urllib.error.HTTPError as e:
-          code, body = util.interpret_http_exception(e)
-          if code is None or int(code) not in (500, 501, 502):
-            raise
-        logger.info('Twitter API call failed! Retrying...')
-
-    # last try. if it deadlines, let the exception bubble up.
-    return request()
+      return request()
+
+    # this is a GET. retry up to 3x if we deadline.
+    def should_retry(e):
+      if isinstance(e, urllib.error.HTTPError):
+        code, body = util.interpret_http_exception(e)
+        return code is not None and int(code) in (500, 501, 502)
+      elif isinstance(e, http.client.HTTPException):
+        return str(e).startswith('Deadline exceeded')
+      return isinstance(e, socket.timeout)
+
+    return transport.retry(request, should_retry, retries=RETRIES)
 
   def base_object(self, obj):
     """Returns the "base" silo object that an object operates on.
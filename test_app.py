@@ -2,18 +2,19 @@
 import copy
 from io import BytesIO
 import os.path
+import pickle
 import socket
 import urllib.parse
 from urllib.parse import quote
 
-from granary import as2
+from granary import as2, atom
 from granary.tests import test_bluesky, test_instagram, test_nostr
 from webutil import testutil, util
 from webutil.testutil import requests_response
 from webutil.util import json_dumps, json_loads
 import requests
 
-from app import app
+from app import app, StreamingResponse
 
 client = app.test_client()
 
@@ -641,6 +642,39 @@ not RSS!
     self.assertIn('<title>2toPonder</title>', resp.get_data(as_text=True))
     self.assertIn('<logo>https://foo/art.jpg</logo>', resp.get_data(as_text=True))
 
+  def test_url_as1_to_atom_streams(self):
+    self.mock_get.return_value = requests_response(AS1)
+
+    resp = client.get('/url?url=http://my/posts.as&input=as1&output=atom')
+    self.assertTrue(resp.is_streamed)
+    self.assert_equals(200, resp.status_code)
+    self.assert_equals(atom.CONTENT_TYPE, resp.headers['Content-Type'])
+
+    got = resp.get_data(as_text=True)
+    self.assertEqual(2, got.count('<entry>'))
+    self.assertIn('foo ☕ bar', got)
+    self.assertIn('baz baj', got)
+    self.assertTrue(got.endswith('</feed>'), got[-100:])
+
+  def test_url_as1_to_atom_bad_activity(self):
+    # the second entry fails to render, after the feed header and first entry
+    self.mock_get.return_value = requests_response(AS1 + [{
+      'objectType': 'note',
+      'attachments': ['not an object'],
+    }])
+
+    for cache in 'true', 'false':
+      resp = client.get(
+        f'/url?url=http://my/posts.as&input=as1&output=atom&cache={cache}')
+      self.assert_equals(400, resp.status_code)
+      self.assertIn('Could not convert to atom', resp.get_data(as_text=True))
+
+  def test_streaming_response_pickle(self):
+    resp = StreamingResponse(iter(['foo', 'bar']))
+    self.assertTrue(resp.is_streamed)
+    self.assertEqual(b'foobar', pickle.loads(pickle.dumps(resp)).get_data())
+    self.assertEqual(b'foobar', resp.get_data())
+
   def test_url_as1_to_bluesky(self):
     self.mock_get.return_value = requests_response([
       test_bluesky.POST_AS,